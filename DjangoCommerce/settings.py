@@ -59,12 +59,14 @@ INSTALLED_APPS = [
     'products.apps.ProductsConfig',
     'cart.apps.CartConfig',
     'orders.apps.OrdersConfig',
+    'promotions.apps.PromotionsConfig',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'drf_spectacular',
     'django_filters',
+    'graphene_django',
     'whitenoise.runserver_nostatic',
 ]
 
@@ -286,6 +288,53 @@ CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    # Buffered product view and search counters -> aggregate tables
+    'flush-product-analytics': {
+        'task': 'products.tasks.flush_analytics',
+        'schedule': 60.0,
+    },
+    # Write-behind of carts held in Redis -> Cart/CartItem
+    'persist-carts': {
+        'task': 'cart.tasks.persist_carts',
+        'schedule': 30.0,
+    },
+    # Hot products' stock counters (products.stock) <-> Product.stock
+    'reconcile-hot-stock': {
+        'task': 'products.tasks.reconcile_stock',
+        'schedule': 10.0,
+    },
+}
+
+# Session key of guest carts, merged into the account's cart at login
+CART_SESSION_ID = 'cart'
+# Carts live in the database unless CART_STORAGE_BACKEND is
+# 'cart.storage.RedisCartStorage', which needs the django_redis cache.
+CART_STORAGE_BACKEND = os.getenv('CART_STORAGE_BACKEND', 'cart.storage.DatabaseCartStorage')
+# 'write_behind' persists Redis carts from the task above and at checkout,
+# 'write_through' after every change as well.
+CART_STORAGE_DURABILITY = os.getenv('CART_STORAGE_DURABILITY', 'write_behind')
+# Stock of products flagged `hot` is reserved from a counter outside the
+# database when STOCK_COUNTER_BACKEND is set; use
+# 'products.stock.RedisStockCounter', which needs the django_redis cache.
+STOCK_COUNTER_BACKEND = os.getenv('STOCK_COUNTER_BACKEND') or None
+
+# GraphQL
+GRAPHENE = {
+    'SCHEMA': 'products.schema.schema',
+    'MIDDLEWARE': ['graphql_jwt.middleware.JSONWebTokenMiddleware'],
+}
+# Anonymous query responses are cached this long; 0 disables the cache
+GRAPHQL_RESPONSE_CACHE_TIMEOUT = 60 * 5
+# Root fields on the async endpoint each query from their own worker thread
+GRAPHQL_CONCURRENT_RESOLVERS = True
+# Estimated cost (objects returned, connections times page size) and
+# nesting depth each kind of caller may request in one operation
+GRAPHQL_QUERY_BUDGETS = {
+    'anonymous': {'max_cost': 1000, 'max_depth': 8},
+    'authenticated': {'max_cost': 5000, 'max_depth': 10},
+    'staff': {'max_cost': 20000, 'max_depth': 12},
+}
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True 
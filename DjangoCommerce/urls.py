@@ -1,13 +1,21 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.contrib.auth import views as auth_views
-from products.views import home_view
+from products.views import (
+    home_view,
+    sitemap_index_view,
+    product_sitemap_view,
+    category_sitemap_view,
+)
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView  
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from products.graphql_views import AsyncGraphQLView, PersistedQueryGraphQLView
+from products.schema import async_schema
 
 def health_check(request):
     return JsonResponse({"status": "ok"})
@@ -19,6 +27,11 @@ urlpatterns = [
     # Admin
     path('admin/', admin.site.urls),
 
+    # Sitemaps
+    path('sitemap.xml', sitemap_index_view, name='sitemap-index'),
+    path('sitemaps/products-<int:chunk>.xml', product_sitemap_view, name='sitemap-products'),
+    path('sitemaps/categories-<int:chunk>.xml', category_sitemap_view, name='sitemap-categories'),
+
     # API Endpoints
     path('accounts/', include('accounts.urls')),
     path('products/', include('products.urls')),
@@ -26,6 +39,10 @@ urlpatterns = [
     path('orders/', include('orders.urls')),
     
 
+    # GraphQL
+    path('graphql/', csrf_exempt(PersistedQueryGraphQLView.as_view(graphiql=settings.DEBUG)), name='graphql'),
+    path('graphql/async/', csrf_exempt(AsyncGraphQLView.as_view(schema=async_schema)), name='graphql-async'),
+
     # DRF authentication
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
 
@@ -0,0 +1,22 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+
+class AccountAPITests(APITestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', password='pass1234')
+            for i in range(5)
+        ]
+        self.client.force_authenticate(user=self.users[0])
+
+    def test_accounts_are_paged_by_signup_date(self):
+        response = self.client.get(reverse('accounts-list'), {'page_size': 2, 'sort': 'oldest'})
+        emails = [user['email'] for user in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            emails += [user['email'] for user in response.data['results']]
+        self.assertEqual(emails, [user.email for user in self.users])
@@ -11,6 +11,7 @@ from .serializers import RegisterSerializer, UserSerializer, CustomTokenObtainPa
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.decorators import api_view
 from django.contrib.auth import get_user_model
+from products.pagination import KeysetPagination
 
 User = get_user_model()
 
@@ -84,6 +85,14 @@ class AuthTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
+class AccountPagination(KeysetPagination):
+    """Account cursors by signup date, served by the date_joined index"""
+    orderings = {
+        'newest': ('-date_joined', '-id'),
+        'oldest': ('date_joined', 'id'),
+    }
+
+
 class AccountViewSet(viewsets.ModelViewSet):
     """
     A viewset for viewing and editing user accounts.
@@ -91,6 +100,7 @@ class AccountViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AccountPagination
 
     @swagger_auto_schema(tags=['Accounts'])
     def list(self, request, *args, **kwargs):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem
+from .models import Cart, CartItem, WishlistItem
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
@@ -10,4 +10,11 @@ class CartAdmin(admin.ModelAdmin):
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ('cart', 'product', 'quantity', 'subtotal')
-    list_select_related = ('cart', 'product')
\ No newline at end of file
+    list_select_related = ('cart', 'product')
+
+@admin.register(WishlistItem)
+class WishlistItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'product', 'added_at')
+    list_select_related = ('user', 'product')
+    search_fields = ('user__email', 'product__name')
+    raw_id_fields = ('user', 'product')
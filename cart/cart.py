@@ -1,13 +1,25 @@
 from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from products.models import Product
+
+from .storage import get_cart_storage, new_line
+
 
 class Cart:
+    """
+    A guest's cart, kept in the session as {product id: {'quantity': n}}
+    until login merges it into the account's cart.
+    """
+
     def __init__(self, request):
         self.session = request.session
         cart = self.session.get(settings.CART_SESSION_ID)
         if not cart:
             cart = self.session[settings.CART_SESSION_ID] = {}
         self.cart = cart
-    
+
     def add(self, product, quantity=1):
         product_id = str(product.id)
         if product_id not in self.cart:
@@ -15,6 +27,78 @@ class Cart:
         else:
             self.cart[product_id]['quantity'] += quantity
         self.save()
-    
+
+    def remove(self, product):
+        if self.cart.pop(str(product.id), None) is not None:
+            self.save()
+
+    def quantities(self):
+        return {
+            int(product_id): item['quantity']
+            for product_id, item in self.cart.items()
+        }
+
+    def clear(self):
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.modified = True
+
     def save(self):
-        self.session.modified = True
\ No newline at end of file
+        self.session.modified = True
+
+
+def merge_quantities(user_id, quantities):
+    """
+    Add {product_id: quantity} to the user's cart as one storage update.
+
+    Quantities are summed with what is already in the cart and clamped to
+    stock, from a single product fetch. Returns the resulting lines and
+    {product_id: quantity actually in the cart} for every product that
+    could not be added in full (0 when unavailable).
+    """
+    quantities = {
+        product_id: quantity
+        for product_id, quantity in quantities.items() if quantity > 0
+    }
+    if not quantities:
+        return get_cart_storage().lines(user_id), {}
+    products = Product.objects.filter(available=True).only(
+        'id', 'price', 'stock'
+    ).in_bulk(list(quantities))
+    adjusted = {}
+
+    def merge(lines):
+        adjusted.clear()
+        changes = {}
+        for product_id, quantity in quantities.items():
+            line = lines.get(product_id)
+            in_cart = line.quantity if line else 0
+            product = products.get(product_id)
+            if product is None:
+                adjusted[product_id] = in_cart
+                continue
+            total = min(in_cart + quantity, product.stock)
+            if total < in_cart + quantity:
+                adjusted[product_id] = max(total, in_cart)
+            if total > in_cart:
+                price = line.price if line else product.price
+                changes[product_id] = new_line(total, price, line)
+        return changes
+
+    lines = get_cart_storage().update(user_id, merge)
+    return lines, adjusted
+
+
+def merge_guest_cart(request, user):
+    """Move the session's guest cart into the user's cart"""
+    if not request.session.get(settings.CART_SESSION_ID):
+        return None
+    guest_cart = Cart(request)
+    merged = merge_quantities(user.pk, guest_cart.quantities())
+    guest_cart.clear()
+    return merged
+
+
+@receiver(user_logged_in)
+def merge_on_login(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        merge_guest_cart(request, user)
@@ -18,6 +18,13 @@ class Cart(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     expires_at = models.DateTimeField(default=get_default_expiry)
     is_active = models.BooleanField(default=True, db_index=True)
+    applied_coupon = models.ForeignKey(
+        'promotions.Coupon',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='carts'
+    )
 
     class Meta:
         indexes = [
@@ -30,27 +37,21 @@ class Cart(models.Model):
             ),
         ]
 
+    def summary(self, lines=None):
+        from .summary import cart_summary
+        return cart_summary(self, lines)
+
     @property
     def total_items(self):
-        return self.items.aggregate(
-            total=models.Sum('quantity')
-        )['total'] or 0
+        return self.summary().item_count
 
     @property
     def subtotal(self):
-        from django.db.models import Sum, F
-        result = self.items.aggregate(
-            total=Sum(F('price_at_addition') * F('quantity'))
-        )['total'] or Decimal('0.00')
-        return Decimal(result).quantize(Decimal('0.00'))
+        return self.summary().subtotal
 
     @property
     def total(self):
-        subtotal = self.subtotal
-        if hasattr(self, 'applied_coupon') and self.applied_coupon:
-            return max(Decimal('0.00'),
-                       subtotal - self.applied_coupon.calculate_discount(subtotal))
-        return subtotal
+        return self.summary().total
 
     def clear(self):
         self.items.all().delete()
@@ -138,3 +139,39 @@ class CartItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity}x {self.product.name} (Cart: {self.cart.id})"
+
+
+class WishlistItem(models.Model):
+    """A product saved for later, kept out of the cart"""
+    # The unique (user, product) index also serves per-user lookups
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='wishlist_items',
+        db_index=False
+    )
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='wishlist_items'
+    )
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-added_at', '-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'product'],
+                name='unique_user_wishlist_product'
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of a user's list, newest first
+            models.Index(
+                fields=['user', '-added_at', '-id'],
+                name='wishlist_user_recent_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} saved by {self.user_id}"
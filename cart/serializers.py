@@ -1,8 +1,7 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_serializer, OpenApiExample
 from products.serializers import ProductSerializer
-from .models import Cart, CartItem
-from django.db.models import Sum
+from .models import Cart, CartItem, WishlistItem
 from products.models import Product
 
 
@@ -19,23 +18,49 @@ class CartItemSerializer(serializers.ModelSerializer):
         return obj.subtotal
 
 
+class CartRowSerializer(serializers.Serializer):
+    # The line's CartItem; null until the line is in the database
+    id = serializers.IntegerField(allow_null=True)
+    product = serializers.IntegerField(source='product_id')
+    name = serializers.CharField()
+    slug = serializers.CharField()
+    image = serializers.CharField(allow_null=True)
+    quantity = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    stock = serializers.IntegerField()
+    warning = serializers.CharField(allow_null=True)
+
+
+class CartSummarySerializer(serializers.Serializer):
+    items = CartRowSerializer(many=True)
+    item_count = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+    promotions = serializers.ListField(child=serializers.CharField())
+    warnings = serializers.ListField(child=serializers.DictField())
+
+
 class CartSerializer(serializers.ModelSerializer):
-    items = serializers.SerializerMethodField()
+    """
+    A cart with its lines and totals from the cart read model. Lines
+    already at hand (after an update) are passed in the `lines` context
+    entry.
+    """
     
+    coupon = serializers.CharField(source='applied_coupon.code', default=None, read_only=True)
+
     class Meta:
         model = Cart
-        fields = ['id', 'user', 'created_at', 'updated_at', 'items']
-    
-    def get_items(self, obj):
-        items = []
-        for item in obj.items.all():
-            items.append({
-                'id': item.id,
-                'product': item.product.id,
-                'quantity': item.quantity,
-                'price': str(item.price_at_addition or item.product.price)
-            })
-        return items
+        fields = ['id', 'user', 'created_at', 'updated_at', 'coupon']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        summary = instance.summary(self.context.get('lines'))
+        data.update(CartSummarySerializer(summary).data)
+        return data
 
 @extend_schema_serializer(
     examples=[
@@ -51,10 +76,116 @@ class CartSerializer(serializers.ModelSerializer):
     ]
 )
 class CartItemActionSerializer(serializers.Serializer):
+    # Unknown products are reported by the cart operation itself
     product_id = serializers.IntegerField(required=True)
     quantity = serializers.IntegerField(default=1, min_value=1)
 
+
+class RepricedLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    name = serializers.CharField()
+    old_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    new_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class ReducedLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    name = serializers.CharField()
+    requested = serializers.IntegerField()
+    available = serializers.IntegerField()
+
+
+class RemovedLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    name = serializers.CharField(allow_null=True)
+    reason = serializers.CharField()
+
+
+class CartRevalidationSerializer(serializers.Serializer):
+    changed = serializers.BooleanField()
+    repriced = RepricedLineSerializer(many=True)
+    reduced = ReducedLineSerializer(many=True)
+    removed = RemovedLineSerializer(many=True)
+
+
+class CouponApplySerializer(serializers.Serializer):
+    code = serializers.CharField(max_length=50)
+
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    # set accepts 0, to drop the line
+    quantity = serializers.IntegerField(min_value=0)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'set' and attrs['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': 'Must be at least 1'})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(
+        child=CartOperationSerializer(),
+        allow_empty=False,
+        max_length=100
+    )
+
+    def validate_operations(self, value):
+        return [(item['op'], item['product_id'], item['quantity']) for item in value]
+
+
+class CartLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(default=1, min_value=1)
+
+
+class CartMergeSerializer(serializers.Serializer):
+    """A guest cart held by the client, merged into the account's cart"""
+    items = serializers.ListField(
+        child=CartLineSerializer(),
+        allow_empty=True,
+        max_length=100
+    )
+
+    def validate_items(self, value):
+        quantities = {}
+        for item in value:
+            product_id = item['product_id']
+            quantities[product_id] = quantities.get(product_id, 0) + item['quantity']
+        return quantities
+
+
+class WishlistItemSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(source='product.id', read_only=True)
+    name = serializers.CharField(source='product.name', read_only=True)
+    slug = serializers.CharField(source='product.slug', read_only=True)
+    price = serializers.DecimalField(
+        source='product.price', max_digits=10, decimal_places=2, read_only=True
+    )
+    stock = serializers.IntegerField(source='product.stock', read_only=True)
+    in_stock = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WishlistItem
+        fields = ['id', 'product_id', 'name', 'slug', 'price', 'stock', 'in_stock', 'added_at']
+
+    def get_in_stock(self, obj):
+        return obj.product.available and obj.product.stock > 0
+
+
+class WishlistAddSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(required=True)
+
     def validate_product_id(self, value):
         if not Product.objects.filter(id=value).exists():
             raise serializers.ValidationError("Product does not exist")
         return value
+
+
+class WishlistMoveSerializer(serializers.Serializer):
+    product_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=100
+    )
@@ -0,0 +1,591 @@
+import logging
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from threading import Lock
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+
+from products.models import Product
+
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+
+# RedisCartStorage (which shares the cache's connection pool) writes carts
+# behind, so it has to be asked for explicitly
+CART_STORAGE_BACKEND = getattr(
+    settings, 'CART_STORAGE_BACKEND', 'cart.storage.DatabaseCartStorage'
+)
+# 'write_behind' persists changed carts from a periodic task (and at
+# checkout); 'write_through' also persists after every change.
+CART_STORAGE_DURABILITY = getattr(settings, 'CART_STORAGE_DURABILITY', 'write_behind')
+CART_STORAGE_TIMEOUT = getattr(settings, 'CART_STORAGE_TIMEOUT', 60 * 60 * 24 * 30)
+CART_PERSIST_BATCH_SIZE = 500
+
+CartLine = namedtuple('CartLine', 'quantity price added_at')
+
+
+class CartUpdateError(Exception):
+    """Raised by a cart mutation to abort it without writing anything"""
+
+    def __init__(self, message, status_code=400, errors=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.errors = errors
+
+
+def get_or_create_cart(user_id):
+    cart, _ = Cart.objects.get_or_create(user_id=user_id, defaults={'is_active': True})
+    return cart
+
+
+def _locked_cart(user_id):
+    """The user's cart row, locked; serialises writers of one cart"""
+    try:
+        return Cart.objects.select_for_update().get(user_id=user_id)
+    except Cart.DoesNotExist:
+        get_or_create_cart(user_id)
+        return Cart.objects.select_for_update().get(user_id=user_id)
+
+
+def _stored_lines(cart_filter):
+    """{product_id: (CartItem id, CartLine)}, in the order lines were added"""
+    rows = CartItem.objects.filter(
+        is_removed=False, **cart_filter
+    ).order_by('added_at', 'id').values_list(
+        'id', 'product_id', 'quantity',
+        # Rows from before prices were recorded
+        Coalesce('price_at_addition', 'product__price'),
+        'added_at'
+    )
+    return {
+        product_id: (item_id, CartLine(quantity, price, added_at))
+        for item_id, product_id, quantity, price, added_at in rows
+    }
+
+
+def _database_lines(cart_filter):
+    return {
+        product_id: line
+        for product_id, (_, line) in _stored_lines(cart_filter).items()
+    }
+
+
+def write_lines(cart, stored, changes):
+    """
+    Apply {product_id: CartLine or None} to the cart's rows, `stored`
+    being their _stored_lines read under the cart row lock: one bulk
+    update, one bulk insert and one delete at most.
+    """
+    removed = [
+        product_id for product_id, line in changes.items()
+        if line is None and product_id in stored
+    ]
+    updated, created = [], []
+    for product_id, line in changes.items():
+        if line is None:
+            continue
+        if product_id not in stored:
+            created.append(CartItem(
+                cart=cart,
+                product_id=product_id,
+                quantity=line.quantity,
+                price_at_addition=line.price
+            ))
+            continue
+        item_id, current = stored[product_id]
+        if (current.quantity, current.price) != (line.quantity, line.price):
+            updated.append(CartItem(
+                id=item_id,
+                quantity=line.quantity,
+                price_at_addition=line.price
+            ))
+    if removed:
+        cart.items.filter(product_id__in=removed).delete()
+    CartItem.objects.bulk_update(updated, ['quantity', 'price_at_addition'])
+    CartItem.objects.bulk_create(created)
+    if removed or updated or created:
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+
+
+def _stock_product(product_id):
+    product = Product.objects.only('id', 'price', 'stock').filter(id=product_id).first()
+    if product is None:
+        raise CartUpdateError('Product not found', status.HTTP_404_NOT_FOUND)
+    return product
+
+
+def adding(product, quantity):
+    """A cart mutation adding `quantity` of `product`, within its stock"""
+    def add(lines):
+        line = lines.get(product.id)
+        in_cart = line.quantity if line else 0
+        if in_cart + quantity > product.stock:
+            raise CartUpdateError(f'Only {product.stock - in_cart} more available')
+        price = line.price if line else product.price
+        return {product.id: new_line(in_cart + quantity, price, line)}
+    return add
+
+
+def _cart_id(user_id):
+    cart_id = Cart.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+    return cart_id if cart_id is not None else get_or_create_cart(user_id).id
+
+
+CART_SQL_NAMES = {
+    'items': CartItem._meta.db_table,
+    'products': Product._meta.db_table,
+    'cart': CartItem._meta.get_field('cart').column,
+    'product': CartItem._meta.get_field('product').column,
+    'quantity': CartItem._meta.get_field('quantity').column,
+    'price': CartItem._meta.get_field('price_at_addition').column,
+    'added_at': CartItem._meta.get_field('added_at').column,
+    'is_removed': CartItem._meta.get_field('is_removed').column,
+}
+
+
+
+def _cart_sql(template, **extra):
+    return template.format(**CART_SQL_NAMES, **extra)
+
+
+# Insert the line, or update it on conflict with the live-line unique
+# constraint (unique_cart_product), only while the result fits the stock.
+# Returns no row when the product is missing or the stock is short.
+UPSERT_SQL = """
+    INSERT INTO {items} ({cart}, {product}, {quantity}, {price}, {added_at}, {is_removed})
+    SELECT %(cart)s, p.id, %(quantity)s, p.price, %(now)s, %(false)s
+    FROM {products} p
+    WHERE p.id = %(product)s AND p.stock >= %(quantity)s
+    ON CONFLICT ({cart}, {product}) WHERE NOT {is_removed}
+    DO UPDATE SET {quantity} = {new_quantity}
+    WHERE {new_quantity} <= (
+        SELECT stock FROM {products} WHERE id = EXCLUDED.{product}
+    )
+    RETURNING {quantity}
+"""
+ADD_SQL = _cart_sql(
+    UPSERT_SQL, new_quantity=_cart_sql('{items}.{quantity} + EXCLUDED.{quantity}')
+)
+SET_SQL = _cart_sql(UPSERT_SQL, new_quantity=_cart_sql('EXCLUDED.{quantity}'))
+DECREMENT_SQL = _cart_sql("""
+    UPDATE {items} SET {quantity} = {quantity} - %(quantity)s
+    WHERE {cart} = %(cart)s AND {product} = %(product)s
+        AND {is_removed} = %(false)s AND {quantity} > %(quantity)s
+    RETURNING {quantity}
+""")
+DELETE_SQL = _cart_sql("""
+    DELETE FROM {items}
+    WHERE {cart} = %(cart)s AND {product} = %(product)s
+        AND {is_removed} = %(false)s AND {quantity} <= %(quantity)s
+    RETURNING {product}
+""")
+
+
+def _line_params(cart_id, product_id, quantity):
+    return {
+        'cart': cart_id,
+        'product': product_id,
+        'quantity': quantity,
+        'now': timezone.now(),
+        'false': False,
+    }
+
+
+def _returning(sql, params):
+    """Run a write statement and return its RETURNING row, if any"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def _stock_and_quantity(cart_id, product_id):
+    """Why an upsert was refused: (stock, quantity in cart)"""
+    row = Product.objects.filter(id=product_id).annotate(
+        in_cart=Subquery(
+            CartItem.objects.filter(
+                cart_id=cart_id, product_id=product_id, is_removed=False
+            ).values('quantity')[:1]
+        )
+    ).values_list('stock', 'in_cart').first()
+    if row is None:
+        raise CartUpdateError('Product not found', status.HTTP_404_NOT_FOUND)
+    return row[0], row[1] or 0
+
+
+class CartStorage:
+    """
+    Where the active cart of each user lives.
+
+    A cart is an ordered {product_id: CartLine} mapping. Every change goes
+    through `update(user_id, mutate)`: `mutate` receives the current lines
+    and returns the changes ({product_id: CartLine or None to remove}),
+    which are applied atomically with respect to other writers of the same
+    cart. It may raise CartUpdateError to abort.
+    """
+
+    # Whether Cart/CartItem are always current, so reads can join them
+    lines_in_database = False
+
+    def lines(self, user_id):
+        raise NotImplementedError
+
+    def update(self, user_id, mutate):
+        raise NotImplementedError
+
+    def clear(self, user_id):
+        return self.update(user_id, lambda lines: dict.fromkeys(lines))
+
+    # Single-product operations. They return the new lines, or None when
+    # the backend did not read them back.
+
+    def add(self, user_id, product_id, quantity):
+        """Add `quantity` of a product, within its stock"""
+        product = _stock_product(product_id)
+        if quantity > product.stock:
+            raise CartUpdateError('Not enough stock available')
+        return self.update(user_id, adding(product, quantity))
+
+    def set_quantity(self, user_id, product_id, quantity):
+        """Set a product's quantity, within its stock; 0 removes it"""
+        if quantity == 0:
+            return self.update(user_id, lambda lines: dict.fromkeys({product_id} & set(lines)))
+        product = _stock_product(product_id)
+        if quantity > product.stock:
+            raise CartUpdateError(f'Only {product.stock} available')
+
+        def set_line(lines):
+            line = lines.get(product_id)
+            price = line.price if line else product.price
+            return {product_id: new_line(quantity, price, line)}
+        return self.update(user_id, set_line)
+
+    def remove(self, user_id, product_id, quantity):
+        """Take `quantity` of a product out, dropping the line at zero"""
+        def remove(lines):
+            line = lines.get(product_id)
+            if line is None:
+                raise CartUpdateError('Item not in cart', status.HTTP_404_NOT_FOUND)
+            if line.quantity > quantity:
+                return {product_id: line._replace(quantity=line.quantity - quantity)}
+            return {product_id: None}
+        return self.update(user_id, remove)
+
+    def apply(self, user_id, operations):
+        """
+        Apply a list of (op, product_id, quantity) operations in order, op
+        being 'add', 'set' or 'remove', as one update: all of them or, if
+        any fails, none (the CartUpdateError lists every failure).
+        Products are fetched with one query.
+        """
+        product_ids = {product_id for op, product_id, _ in operations if op != 'remove'}
+        products = Product.objects.only('id', 'price', 'stock').in_bulk(list(product_ids))
+
+        def apply_all(lines):
+            lines = dict(lines)
+            changed = set()
+            errors = []
+            for index, (op, product_id, quantity) in enumerate(operations):
+                line = lines.get(product_id)
+                in_cart = line.quantity if line else 0
+                if op == 'remove':
+                    if line is None:
+                        errors.append((index, product_id, 'Item not in cart'))
+                        continue
+                    total = max(in_cart - quantity, 0)
+                else:
+                    product = products.get(product_id)
+                    if product is None:
+                        errors.append((index, product_id, 'Product not found'))
+                        continue
+                    total = in_cart + quantity if op == 'add' else quantity
+                    if total > product.stock:
+                        errors.append((index, product_id, f'Only {product.stock} available'))
+                        continue
+                changed.add(product_id)
+                if total == 0:
+                    lines.pop(product_id, None)
+                else:
+                    price = line.price if line else product.price
+                    lines[product_id] = new_line(total, price, line)
+            if errors:
+                raise CartUpdateError('Cart not updated', errors=[
+                    {'index': index, 'product': product_id, 'error': message}
+                    for index, product_id, message in errors
+                ])
+            return {product_id: lines.get(product_id) for product_id in changed}
+
+        return self.update(user_id, apply_all)
+
+    def persist(self, user_id):
+        """Write the cart back to Cart/CartItem; a no-op when it lives there"""
+
+    def persist_dirty(self, limit=CART_PERSIST_BATCH_SIZE):
+        """Persist carts changed since the last run; returns how many"""
+        return 0
+
+    @staticmethod
+    def merged(lines, changes):
+        lines = dict(lines)
+        for product_id, line in changes.items():
+            if line is None:
+                lines.pop(product_id, None)
+            else:
+                lines[product_id] = line
+        return lines
+
+
+class DatabaseCartStorage(CartStorage):
+    """Carts live in Cart/CartItem; each update locks the cart row"""
+
+    lines_in_database = True
+
+    def lines(self, user_id):
+        return _database_lines({'cart__user_id': user_id})
+
+    def update(self, user_id, mutate):
+        with transaction.atomic():
+            cart = _locked_cart(user_id)
+            stored = _stored_lines({'cart': cart})
+            lines = {product_id: line for product_id, (_, line) in stored.items()}
+            changes = mutate(dict(lines))
+            write_lines(cart, stored, changes)
+        return self.merged(lines, changes)
+
+    # Single-product operations are one statement each; the stock check
+    # is part of the statement, and why nothing was written is only
+    # looked up when it was refused.
+
+    def add(self, user_id, product_id, quantity):
+        cart_id = _cart_id(user_id)
+        if _returning(ADD_SQL, _line_params(cart_id, product_id, quantity)) is None:
+            stock, in_cart = _stock_and_quantity(cart_id, product_id)
+            if quantity > stock:
+                raise CartUpdateError('Not enough stock available')
+            raise CartUpdateError(f'Only {stock - in_cart} more available')
+
+    def set_quantity(self, user_id, product_id, quantity):
+        cart_id = _cart_id(user_id)
+        params = _line_params(cart_id, product_id, quantity)
+        if quantity == 0:
+            CartItem.objects.filter(
+                cart_id=cart_id, product_id=product_id, is_removed=False
+            ).delete()
+        elif _returning(SET_SQL, params) is None:
+            stock, _ = _stock_and_quantity(cart_id, product_id)
+            raise CartUpdateError(f'Only {stock} available')
+
+    def remove(self, user_id, product_id, quantity):
+        params = _line_params(_cart_id(user_id), product_id, quantity)
+        if _returning(DECREMENT_SQL, params) is None:
+            if _returning(DELETE_SQL, params) is None:
+                raise CartUpdateError('Item not in cart', status.HTTP_404_NOT_FOUND)
+
+
+class WriteBehindCartStorage(CartStorage):
+    """
+    Carts are served from a fast store, loaded from the database on first
+    use and written back by `persist`.
+    """
+
+    def persist(self, user_id):
+        lines = self.lines(user_id)
+        with transaction.atomic():
+            cart = _locked_cart(user_id)
+            stored = _stored_lines({'cart': cart})
+            changes = dict.fromkeys(set(stored) - set(lines))
+            changes.update(lines)
+            write_lines(cart, stored, changes)
+
+    def after_update(self, user_id):
+        if CART_STORAGE_DURABILITY == 'write_through':
+            self.persist(user_id)
+
+    def persist_dirty(self, limit=CART_PERSIST_BATCH_SIZE):
+        user_ids = self.pop_dirty(limit)
+        for user_id in user_ids:
+            try:
+                self.persist(user_id)
+            except Exception as e:
+                logger.error(f"Failed to persist cart of user {user_id}: {e}")
+                self.mark_dirty(user_id)
+        return len(user_ids)
+
+    def pop_dirty(self, limit):
+        raise NotImplementedError
+
+    def mark_dirty(self, user_id):
+        raise NotImplementedError
+
+
+def _encode(line):
+    return f'{line.quantity}|{line.price}|{line.added_at.timestamp()}'
+
+
+def _decode(value):
+    quantity, price, added_at = value.decode().split('|')
+    return CartLine(
+        int(quantity),
+        Decimal(price),
+        datetime.fromtimestamp(float(added_at), tz=dt_timezone.utc)
+    )
+
+
+class RedisCartStorage(WriteBehindCartStorage):
+    """
+    Each cart is a Redis hash of product id -> line, shared by every worker.
+
+    Updates are optimistic transactions (WATCH/MULTI) on the cart's hash,
+    and add the user to a dirty set that the write-behind task drains.
+    """
+
+    # Marks a hash as loaded, so an empty cart is not reloaded every time
+    LOADED_FIELD = '_'
+    DIRTY_KEY = 'cart:dirty'
+    # Load the database copy only if no worker has created the hash since
+    LOAD_SCRIPT = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then
+            redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+            redis.call('EXPIRE', KEYS[1], ARGV[1])
+        end
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection('default')
+
+    @staticmethod
+    def key(user_id):
+        return f'cart:{user_id}'
+
+    def _load(self, user_id):
+        fields = [self.LOADED_FIELD, '1']
+        for product_id, line in DatabaseCartStorage().lines(user_id).items():
+            fields.extend([product_id, _encode(line)])
+        self.redis.eval(self.LOAD_SCRIPT, 1, self.key(user_id), CART_STORAGE_TIMEOUT, *fields)
+
+    def _decode_hash(self, values):
+        lines = {
+            int(field): _decode(value)
+            for field, value in values.items()
+            if field.decode() != self.LOADED_FIELD
+        }
+        return dict(sorted(lines.items(), key=lambda item: item[1].added_at))
+
+    def lines(self, user_id):
+        values = self.redis.hgetall(self.key(user_id))
+        if not values:
+            self._load(user_id)
+            values = self.redis.hgetall(self.key(user_id))
+        return self._decode_hash(values)
+
+    def update(self, user_id, mutate):
+        from redis.exceptions import WatchError
+
+        key = self.key(user_id)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    values = pipe.hgetall(key)
+                    if not values:
+                        pipe.reset()
+                        self._load(user_id)
+                        continue
+                    lines = self._decode_hash(values)
+                    changes = mutate(dict(lines))
+                    removed = [product_id for product_id, line in changes.items() if line is None]
+                    written = {
+                        product_id: _encode(line)
+                        for product_id, line in changes.items() if line is not None
+                    }
+                    pipe.multi()
+                    if removed:
+                        pipe.hdel(key, *removed)
+                    if written:
+                        pipe.hset(key, mapping=written)
+                    pipe.expire(key, CART_STORAGE_TIMEOUT)
+                    if changes:
+                        pipe.sadd(self.DIRTY_KEY, user_id)
+                    pipe.execute()
+                    break
+                except WatchError:
+                    continue
+        if changes:
+            self.after_update(user_id)
+        return self.merged(lines, changes)
+
+    def pop_dirty(self, limit):
+        return [int(user_id) for user_id in self.redis.spop(self.DIRTY_KEY, limit) or []]
+
+    def mark_dirty(self, user_id):
+        self.redis.sadd(self.DIRTY_KEY, user_id)
+
+
+class LocalCartStorage(WriteBehindCartStorage):
+    """
+    In-process stand-in for RedisCartStorage with the same semantics, for
+    tests and single-process development. Not shared between workers.
+    """
+
+    def __init__(self):
+        self.carts = {}
+        self.dirty = set()
+        self.lock = Lock()
+
+    def lines(self, user_id):
+        with self.lock:
+            if user_id not in self.carts:
+                self.carts[user_id] = DatabaseCartStorage().lines(user_id)
+            return dict(self.carts[user_id])
+
+    def update(self, user_id, mutate):
+        self.lines(user_id)  # load on first use
+        with self.lock:
+            lines = self.carts[user_id]
+            changes = mutate(dict(lines))
+            self.carts[user_id] = lines = self.merged(lines, changes)
+            if changes:
+                self.dirty.add(user_id)
+        if changes:
+            self.after_update(user_id)
+        return dict(lines)
+
+    def pop_dirty(self, limit):
+        with self.lock:
+            user_ids = list(self.dirty)[:limit]
+            self.dirty.difference_update(user_ids)
+        return user_ids
+
+    def mark_dirty(self, user_id):
+        with self.lock:
+            self.dirty.add(user_id)
+
+
+_storage = None
+_storage_lock = Lock()
+
+
+def get_cart_storage():
+    """The configured cart storage, created once per process"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = import_string(CART_STORAGE_BACKEND)()
+    return _storage
+
+
+def new_line(quantity, price, previous=None):
+    """A line for `quantity`, keeping the position of an existing line"""
+    added_at = previous.added_at if previous else timezone.now()
+    return CartLine(quantity, price, added_at)
@@ -0,0 +1,177 @@
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db.models import IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from products.models import Product
+from promotions.engine import Line, evaluate_cart
+
+from .models import CartItem
+from .storage import get_cart_storage
+
+CartRow = namedtuple(
+    'CartRow',
+    'id product_id name slug image quantity price current_price stock available subtotal '
+    'discount warning'
+)
+CartSummary = namedtuple(
+    'CartSummary', 'items item_count subtotal discount total promotions warnings'
+)
+
+PRODUCT_FIELDS = ('name', 'slug', 'image', 'price', 'stock', 'available', 'category')
+ZERO = Decimal('0.00')
+
+
+def stock_warning(quantity, stock, available):
+    if not available:
+        return 'No longer available'
+    if stock == 0:
+        return 'Out of stock'
+    if quantity > stock:
+        return f'Only {stock} available'
+    return None
+
+
+def _image_url(name):
+    if not name:
+        return None
+    return Product._meta.get_field('image').storage.url(name)
+
+
+def _database_rows(user_id):
+    """Cart lines joined with their products, in one query"""
+    return CartItem.objects.filter(
+        cart__user_id=user_id, is_removed=False
+    ).order_by('added_at', 'id').values_list(
+        'id', 'product_id', 'quantity',
+        Coalesce('price_at_addition', 'product__price'),
+        *(f'product__{field}' for field in PRODUCT_FIELDS)
+    )
+
+
+def _line_rows(lines, user_id=None):
+    """
+    Lines already at hand, joined with one product query that also picks
+    up the id of each line's CartItem row, once one has been written
+    """
+    if user_id is None:
+        item_id = Value(None, output_field=IntegerField())
+    else:
+        item_id = Subquery(CartItem.objects.filter(
+            cart__user_id=user_id, product=OuterRef('pk'), is_removed=False
+        ).values('id')[:1])
+    products = {
+        row[0]: row[1:]
+        for row in Product.objects.filter(id__in=list(lines)).annotate(
+            item_id=item_id
+        ).values_list('id', 'item_id', *PRODUCT_FIELDS)
+    }
+    for product_id, line in lines.items():
+        if product_id in products:
+            item_id, *product = products[product_id]
+            yield (item_id, product_id, line.quantity, line.price, *product)
+
+
+def cart_summary(cart=None, lines=None):
+    """
+    Everything shown for a cart, computed in one pass over one query.
+
+    `cart` is the user's Cart; `lines` are lines already at hand (from a
+    storage update, or a guest's session cart, whose prices may be None
+    for the current price). Lines are read from cart storage otherwise,
+    joined with their products in the same query when the storage is the
+    database.
+    """
+    if lines is None:
+        storage = get_cart_storage()
+        if storage.lines_in_database:
+            raw_rows = _database_rows(cart.user_id)
+        else:
+            raw_rows = _line_rows(storage.lines(cart.user_id), cart.user_id)
+    else:
+        raw_rows = _line_rows(lines, cart.user_id if cart else None)
+
+    items, warnings, promotion_lines = [], [], []
+    item_count, subtotal = 0, ZERO
+    for row in raw_rows:
+        item_id, product_id, quantity, price, name, slug, image, current_price, stock, available, category_id = row
+        price = current_price if price is None else price
+        row_subtotal = (price * quantity).quantize(ZERO)
+        warning = stock_warning(quantity, stock, available)
+        if warning:
+            warnings.append({'product': product_id, 'message': warning})
+        items.append(CartRow(
+            item_id, product_id, name, slug, _image_url(image), quantity, price,
+            current_price, stock, available, row_subtotal, ZERO, warning
+        ))
+        promotion_lines.append(Line(product_id, category_id, quantity, price))
+        item_count += quantity
+        subtotal += row_subtotal
+
+    evaluation = evaluate_cart(promotion_lines, getattr(cart, 'applied_coupon_id', None))
+    items = [
+        item._replace(discount=evaluation.line_discounts.get(item.product_id, ZERO))
+        for item in items
+    ]
+    return CartSummary(
+        items, item_count, subtotal, evaluation.discount,
+        subtotal - evaluation.discount, evaluation.applied, warnings
+    )
+
+
+CartRevalidation = namedtuple('CartRevalidation', 'lines repriced reduced removed changed')
+
+
+def revalidate_cart(cart):
+    """
+    Bring a cart in line with current prices and stock, e.g. before
+    checkout: lines are repriced, quantities clamped to stock, and lines
+    of unavailable or sold-out products dropped.
+
+    Products are read with the cart summary's one query and all changes
+    are written as one storage update. Returns the resulting lines and
+    what changed, for the shopper to review.
+    """
+    rows = {row.product_id: row for row in cart_summary(cart).items}
+    diff = {}
+
+    def revalidate(lines):
+        repriced, reduced, removed = [], [], []
+        changes = {}
+        for product_id, line in lines.items():
+            row = rows.get(product_id)
+            if row is None or not row.available or row.stock == 0:
+                changes[product_id] = None
+                removed.append({
+                    'product': product_id,
+                    'name': row.name if row else None,
+                    'reason': row.warning if row else 'No longer available',
+                })
+                continue
+            quantity = min(line.quantity, row.stock)
+            if quantity < line.quantity:
+                reduced.append({
+                    'product': product_id,
+                    'name': row.name,
+                    'requested': line.quantity,
+                    'available': quantity,
+                })
+            if line.price != row.current_price:
+                repriced.append({
+                    'product': product_id,
+                    'name': row.name,
+                    'old_price': line.price,
+                    'new_price': row.current_price,
+                })
+            if (quantity, row.current_price) != (line.quantity, line.price):
+                changes[product_id] = line._replace(quantity=quantity, price=row.current_price)
+        diff.update(repriced=repriced, reduced=reduced, removed=removed)
+        return changes
+
+    lines = get_cart_storage().update(cart.user_id, revalidate)
+    return CartRevalidation(
+        lines=lines,
+        changed=any(diff.values()),
+        **diff
+    )
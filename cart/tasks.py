@@ -0,0 +1,16 @@
+import logging
+
+from celery import shared_task
+
+from .storage import get_cart_storage
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def persist_carts():
+    """Write carts changed since the last run back to the database"""
+    persisted = get_cart_storage().persist_dirty()
+    if persisted:
+        logger.debug(f"Persisted {persisted} carts")
+    return persisted
@@ -0,0 +1,100 @@
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products.models import Product
+from cart.models import Cart, CartItem
+from cart.storage import DatabaseCartStorage, RedisCartStorage
+from cart.tasks import persist_carts
+from products.tests.utils import redis_client
+from promotions.engine import get_rule_index
+
+User = get_user_model()
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price=Decimal('10.00'), stock=5)
+            for i in range(4)
+        ]
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=2)
+        CartItem.objects.create(cart=cart, product=self.products[1], quantity=2)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('cart:cart-batch')
+        # Rows and query counts below are those of the database storage
+        patcher = mock.patch('cart.storage._storage', DatabaseCartStorage())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Promotion rules are compiled once per worker, outside the counts
+        get_rule_index()
+
+    def rows(self):
+        return dict(
+            CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')
+        )
+
+    def test_operations_are_applied_in_order(self):
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'set', 'product_id': self.products[0].id, 'quantity': 4},
+            {'op': 'remove', 'product_id': self.products[1].id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.products[2].id, 'quantity': 1},
+            {'op': 'add', 'product_id': self.products[2].id, 'quantity': 2},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        expected = {self.products[0].id: 4, self.products[2].id: 3}
+        self.assertEqual(
+            {item['product']: item['quantity'] for item in response.data['items']}, expected
+        )
+        self.assertEqual(self.rows(), expected)
+
+    def test_products_are_fetched_once(self):
+        operations = [
+            {'op': 'set', 'product_id': product.id, 'quantity': 1} for product in self.products
+        ]
+        # Products; then in one transaction the locked cart row, its lines,
+        # one bulk update and one bulk insert; then the response
+        with self.assertNumQueries(10):
+            self.client.post(self.url, {'operations': operations}, format='json')
+
+    def test_any_failure_applies_nothing(self):
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'set', 'product_id': self.products[0].id, 'quantity': 1},
+            {'op': 'add', 'product_id': self.products[1].id, 'quantity': 4},
+            {'op': 'remove', 'product_id': self.products[3].id, 'quantity': 1},
+            {'op': 'set', 'product_id': 999999, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], [
+            {'index': 1, 'product': self.products[1].id, 'error': 'Only 5 available'},
+            {'index': 2, 'product': self.products[3].id, 'error': 'Item not in cart'},
+            {'index': 3, 'product': 999999, 'error': 'Product not found'},
+        ])
+        self.assertEqual(self.rows(), {self.products[0].id: 2, self.products[1].id: 2})
+
+    def test_only_set_accepts_zero(self):
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'add', 'product_id': self.products[0].id, 'quantity': 0},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_redis_storage_writes_rows_when_persisted(self):
+        redis = redis_client(self, 'cart:*')
+        with mock.patch('django_redis.get_redis_connection', return_value=redis):
+            storage = RedisCartStorage()
+        with mock.patch('cart.storage._storage', storage):
+            response = self.client.post(self.url, {'operations': [
+                {'op': 'set', 'product_id': self.products[0].id, 'quantity': 4},
+                {'op': 'remove', 'product_id': self.products[1].id, 'quantity': 2},
+                {'op': 'add', 'product_id': self.products[2].id, 'quantity': 1},
+            ]}, format='json')
+            self.assertEqual(response.status_code, 200)
+            # Written behind
+            self.assertEqual(self.rows(), {self.products[0].id: 2, self.products[1].id: 2})
+            self.assertEqual(persist_carts(), 1)
+        self.assertEqual(self.rows(), {self.products[0].id: 4, self.products[2].id: 1})
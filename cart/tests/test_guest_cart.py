@@ -0,0 +1,76 @@
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products.models import Product
+from cart.models import Cart, CartItem
+from cart.storage import DatabaseCartStorage
+
+User = get_user_model()
+
+
+class GuestCartMergeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.phone = Product.objects.create(name='Phone', price=Decimal('100.00'), stock=3)
+        self.case = Product.objects.create(name='Case', price=Decimal('10.00'), stock=10)
+        self.retired = Product.objects.create(
+            name='Retired', price=Decimal('5.00'), stock=10, available=False
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.phone, quantity=2)
+        # The merges are read back from the rows the database storage writes
+        patcher = mock.patch('cart.storage._storage', DatabaseCartStorage())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rows(self):
+        return dict(
+            CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')
+        )
+
+    def test_guest_cart_is_merged_at_login(self):
+        self.client.post(reverse('cart:add', args=[self.phone.id]), {'quantity': 2})
+        self.client.post(reverse('cart:add', args=[self.case.id]), {'quantity': 1})
+        self.assertEqual(
+            self.client.session[settings.CART_SESSION_ID],
+            {str(self.phone.id): {'quantity': 2}, str(self.case.id): {'quantity': 1}}
+        )
+
+        self.client.login(email='test@example.com', password='testpass123')
+
+        # 2 in the cart + 2 from the guest cart, clamped to the stock of 3
+        self.assertEqual(self.rows(), {self.phone.id: 3, self.case.id: 1})
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+    def test_merge_endpoint_clamps_and_reports_adjustments(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post(reverse('cart:cart-merge'), {'items': [
+            {'product_id': self.phone.id, 'quantity': 1},
+            {'product_id': self.phone.id, 'quantity': 1},
+            {'product_id': self.case.id, 'quantity': 4},
+            {'product_id': self.retired.id, 'quantity': 1},
+            {'product_id': 999999, 'quantity': 1},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {item['product']: item['quantity'] for item in response.data['items']},
+            {self.phone.id: 3, self.case.id: 4}
+        )
+        self.assertEqual(response.data['adjusted'], [
+            {'product': self.phone.id, 'quantity': 3},
+            {'product': self.retired.id, 'quantity': 0},
+            {'product': 999999, 'quantity': 0},
+        ])
+        self.assertEqual(self.rows(), {self.phone.id: 3, self.case.id: 4})
+
+    def test_guest_cart_page_lists_session_items(self):
+        self.client.post(reverse('cart:add', args=[self.case.id]), {'quantity': 2})
+        response = self.client.get(reverse('cart:detail'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['summary'].subtotal, Decimal('20.00'))
@@ -0,0 +1,72 @@
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products.models import Product
+from cart.models import Cart, CartItem
+from promotions.engine import get_rule_index
+from cart.storage import DatabaseCartStorage
+from cart.summary import revalidate_cart
+
+User = get_user_model()
+
+
+class CartRevalidationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.cart = Cart.objects.create(user=self.user)
+        self.repriced = Product.objects.create(name='Repriced', price=Decimal('10.00'), stock=5)
+        self.scarce = Product.objects.create(name='Scarce', price=Decimal('10.00'), stock=5)
+        self.retired = Product.objects.create(name='Retired', price=Decimal('10.00'), stock=5)
+        self.unchanged = Product.objects.create(name='Unchanged', price=Decimal('10.00'), stock=5)
+        for product in (self.repriced, self.scarce, self.retired, self.unchanged):
+            CartItem.objects.create(cart=self.cart, product=product, quantity=3)
+        Product.objects.filter(pk=self.repriced.pk).update(price=Decimal('12.50'))
+        Product.objects.filter(pk=self.scarce.pk).update(stock=2)
+        Product.objects.filter(pk=self.retired.pk).update(available=False)
+        # The query counts below are those of the database storage
+        patcher = mock.patch('cart.storage._storage', DatabaseCartStorage())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Promotion rules are compiled once per worker, outside the counts
+        get_rule_index()
+
+    def test_cart_is_repriced_and_clamped_in_bulk(self):
+        # The joined read, then the locked cart row, its lines, one bulk
+        # update and the delete
+        with self.assertNumQueries(8):
+            revalidation = revalidate_cart(self.cart)
+        self.assertTrue(revalidation.changed)
+        self.assertEqual(revalidation.repriced, [{
+            'product': self.repriced.id, 'name': 'Repriced',
+            'old_price': Decimal('10.00'), 'new_price': Decimal('12.50'),
+        }])
+        self.assertEqual(revalidation.reduced, [{
+            'product': self.scarce.id, 'name': 'Scarce', 'requested': 3, 'available': 2,
+        }])
+        self.assertEqual(revalidation.removed, [{
+            'product': self.retired.id, 'name': 'Retired', 'reason': 'No longer available',
+        }])
+        self.assertEqual(
+            set(CartItem.objects.filter(cart=self.cart).values_list(
+                'product_id', 'quantity', 'price_at_addition'
+            )),
+            {
+                (self.repriced.id, 3, Decimal('12.50')),
+                (self.scarce.id, 2, Decimal('10.00')),
+                (self.unchanged.id, 3, Decimal('10.00')),
+            }
+        )
+        self.assertFalse(revalidate_cart(self.cart).changed)
+
+    def test_endpoint_returns_the_diff(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post(reverse('cart:cart-revalidate'))
+        self.assertEqual(response.status_code, 200)
+        changes = response.data['changes']
+        self.assertTrue(changes['changed'])
+        self.assertEqual(changes['repriced'][0]['new_price'], '12.50')
+        self.assertEqual(len(response.data['items']), 3)
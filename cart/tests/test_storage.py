@@ -0,0 +1,251 @@
+from decimal import Decimal
+from threading import Thread
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products.models import Product
+from cart.models import Cart, CartItem
+from cart.storage import (
+    CartUpdateError,
+    DatabaseCartStorage,
+    LocalCartStorage,
+    RedisCartStorage,
+    _encode,
+    new_line,
+)
+from products.tests.utils import redis_client
+
+User = get_user_model()
+
+
+def increment(product_id, price=Decimal('10.00')):
+    def mutate(lines):
+        line = lines.get(product_id)
+        return {product_id: new_line((line.quantity if line else 0) + 1, price, line)}
+    return mutate
+
+
+class CartStorageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price=Decimal('10.00'), stock=10)
+            for i in range(3)
+        ]
+
+    def rows(self):
+        return dict(
+            CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')
+        )
+
+    def test_database_storage_writes_rows(self):
+        storage = DatabaseCartStorage()
+        product = self.products[0]
+        storage.update(self.user.id, increment(product.id))
+        lines = storage.update(self.user.id, increment(product.id))
+        self.assertEqual(lines[product.id].quantity, 2)
+        self.assertEqual(self.rows(), {product.id: 2})
+        storage.clear(self.user.id)
+        self.assertEqual(self.rows(), {})
+
+    def test_write_behind_persists_changed_carts(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=2)
+        storage = LocalCartStorage()
+
+        # Loaded from the database on first use, then served from memory
+        self.assertEqual(storage.lines(self.user.id)[self.products[0].id].quantity, 2)
+        storage.update(self.user.id, increment(self.products[1].id))
+        storage.update(self.user.id, lambda lines: {self.products[0].id: None})
+        self.assertEqual(self.rows(), {self.products[0].id: 2})
+
+        self.assertEqual(storage.persist_dirty(), 1)
+        self.assertEqual(self.rows(), {self.products[1].id: 1})
+        self.assertEqual(storage.persist_dirty(), 0)
+
+    @mock.patch('cart.storage.CART_STORAGE_DURABILITY', 'write_through')
+    def test_write_through_persists_every_change(self):
+        storage = LocalCartStorage()
+        storage.update(self.user.id, increment(self.products[0].id))
+        self.assertEqual(self.rows(), {self.products[0].id: 1})
+
+    def test_aborted_update_changes_nothing(self):
+        storage = LocalCartStorage()
+        storage.update(self.user.id, increment(self.products[0].id))
+
+        def fail(lines):
+            raise CartUpdateError('Item not in cart')
+
+        with self.assertRaises(CartUpdateError):
+            storage.update(self.user.id, fail)
+        self.assertEqual(storage.lines(self.user.id)[self.products[0].id].quantity, 1)
+
+    def test_concurrent_updates_are_not_lost(self):
+        storage = LocalCartStorage()
+        storage.lines(self.user.id)
+        product_id = self.products[0].id
+        threads = [
+            Thread(target=storage.update, args=(self.user.id, increment(product_id)))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(storage.lines(self.user.id)[product_id].quantity, 20)
+
+    def test_lines_keep_the_order_they_were_added_in(self):
+        storage = LocalCartStorage()
+        for product in reversed(self.products):
+            storage.update(self.user.id, increment(product.id))
+        storage.update(self.user.id, increment(self.products[2].id))
+        self.assertEqual(
+            list(storage.lines(self.user.id)),
+            [product.id for product in reversed(self.products)]
+        )
+
+    def test_api_reads_its_own_writes_before_persisting(self):
+        storage = LocalCartStorage()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with mock.patch('cart.storage._storage', storage):
+            client.post(
+                reverse('cart:cart-add-item'),
+                {'product_id': self.products[0].id, 'quantity': 2},
+                format='json'
+            )
+            response = client.get(reverse('cart:cart-list'))
+        self.assertEqual(
+            [(item['product'], item['quantity'], item['price']) for item in response.data['items']],
+            [(self.products[0].id, 2, '10.00')]
+        )
+        self.assertEqual(self.rows(), {})
+
+
+class RedisCartStorageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price=Decimal('10.00'), stock=10)
+            for i in range(2)
+        ]
+        self.redis = redis_client(self, 'cart:*')
+        with mock.patch('django_redis.get_redis_connection', return_value=self.redis):
+            self.storage = RedisCartStorage()
+        self.key = RedisCartStorage.key(self.user.id)
+
+    def rows(self):
+        return dict(
+            CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')
+        )
+
+    def test_loads_from_the_database_and_persists_changes(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=2)
+
+        self.assertEqual(self.storage.lines(self.user.id)[self.products[0].id].quantity, 2)
+        self.storage.update(self.user.id, increment(self.products[1].id))
+        self.storage.update(self.user.id, lambda lines: {self.products[0].id: None})
+        self.assertEqual(self.rows(), {self.products[0].id: 2})
+        self.assertTrue(self.redis.sismember(RedisCartStorage.DIRTY_KEY, self.user.id))
+
+        self.assertEqual(self.storage.persist_dirty(), 1)
+        self.assertEqual(self.rows(), {self.products[1].id: 1})
+        self.assertEqual(self.storage.persist_dirty(), 0)
+
+    def test_empty_cart_is_loaded_once(self):
+        self.assertEqual(self.storage.lines(self.user.id), {})
+        self.assertEqual(self.redis.hkeys(self.key), [RedisCartStorage.LOADED_FIELD.encode()])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.storage.lines(self.user.id), {})
+
+    def test_load_keeps_a_cart_another_worker_loaded(self):
+        self.storage.update(self.user.id, increment(self.products[0].id))
+        # Not persisted yet, so the database still has no lines
+        self.storage._load(self.user.id)
+        self.assertEqual(self.storage.lines(self.user.id)[self.products[0].id].quantity, 1)
+
+    def test_update_retries_after_a_concurrent_write(self):
+        self.storage.lines(self.user.id)
+        calls = []
+
+        def mutate(lines):
+            if not calls:
+                # Another worker writes between WATCH and EXEC
+                self.redis.hset(
+                    self.key, self.products[1].id, _encode(new_line(3, Decimal('10.00')))
+                )
+            calls.append(dict(lines))
+            return increment(self.products[0].id)(lines)
+
+        lines = self.storage.update(self.user.id, mutate)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(
+            {product_id: line.quantity for product_id, line in lines.items()},
+            {self.products[1].id: 3, self.products[0].id: 1}
+        )
+        self.assertEqual(self.storage.lines(self.user.id), lines)
+
+    def test_aborted_update_changes_nothing(self):
+        self.storage.update(self.user.id, increment(self.products[0].id))
+
+        def fail(lines):
+            raise CartUpdateError('Item not in cart')
+
+        with self.assertRaises(CartUpdateError):
+            self.storage.update(self.user.id, fail)
+        self.assertEqual(self.storage.lines(self.user.id)[self.products[0].id].quantity, 1)
+
+
+class CartOperationTests(TestCase):
+    """add/set_quantity/remove behave the same on every backend"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        Cart.objects.create(user=self.user)
+        self.product = Product.objects.create(name='Phone', price=Decimal('10.00'), stock=5)
+
+    def check_operations(self, storage):
+        user_id = self.user.id
+        storage.add(user_id, self.product.id, 2)
+        storage.add(user_id, self.product.id, 1)
+        self.assertEqual(storage.lines(user_id)[self.product.id].quantity, 3)
+
+        with self.assertRaisesMessage(CartUpdateError, 'Only 2 more available'):
+            storage.add(user_id, self.product.id, 3)
+        with self.assertRaisesMessage(CartUpdateError, 'Not enough stock available'):
+            storage.add(user_id, self.product.id, 6)
+        with self.assertRaises(CartUpdateError) as missing:
+            storage.add(user_id, 999999, 1)
+        self.assertEqual(missing.exception.status_code, 404)
+
+        storage.set_quantity(user_id, self.product.id, 5)
+        with self.assertRaisesMessage(CartUpdateError, 'Only 5 available'):
+            storage.set_quantity(user_id, self.product.id, 6)
+        storage.remove(user_id, self.product.id, 4)
+        self.assertEqual(storage.lines(user_id)[self.product.id].quantity, 1)
+        storage.remove(user_id, self.product.id, 1)
+        self.assertEqual(storage.lines(user_id), {})
+        with self.assertRaisesMessage(CartUpdateError, 'Item not in cart'):
+            storage.remove(user_id, self.product.id, 1)
+
+    def test_database_operations(self):
+        self.check_operations(DatabaseCartStorage())
+
+    def test_local_operations(self):
+        self.check_operations(LocalCartStorage())
+
+    def test_redis_operations(self):
+        with mock.patch('django_redis.get_redis_connection', return_value=redis_client(self, 'cart:*')):
+            self.check_operations(RedisCartStorage())
+
+    def test_database_add_is_one_statement(self):
+        storage = DatabaseCartStorage()
+        storage.add(self.user.id, self.product.id, 1)
+        # The cart id, then the upsert
+        with self.assertNumQueries(2):
+            storage.add(self.user.id, self.product.id, 1)
+        item = CartItem.objects.get(cart__user=self.user)
+        self.assertEqual((item.quantity, item.price_at_addition), (2, Decimal('10.00')))
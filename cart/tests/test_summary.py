@@ -0,0 +1,77 @@
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products.models import Product
+from cart.models import Cart, CartItem
+from promotions.engine import get_rule_index
+from cart.storage import DatabaseCartStorage, new_line
+from cart.summary import cart_summary
+
+User = get_user_model()
+
+
+class CartSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.cart = Cart.objects.create(user=self.user)
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price=Decimal('10.00'), stock=5)
+            for i in range(30)
+        ]
+        for product in self.products:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+        # The query counts below are those of the database storage
+        patcher = mock.patch('cart.storage._storage', DatabaseCartStorage())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Promotion rules are compiled once per worker, outside the counts
+        get_rule_index()
+
+    def test_cart_is_listed_with_one_query_for_its_items(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        # The cart row, then its lines joined with their products
+        with self.assertNumQueries(2):
+            response = client.get(reverse('cart:cart-list'))
+        self.assertEqual(len(response.data['items']), 30)
+        self.assertEqual(response.data['item_count'], 60)
+        self.assertEqual(response.data['subtotal'], '600.00')
+        self.assertEqual(response.data['total'], '600.00')
+        self.assertEqual(response.data['items'][0]['name'], 'Product 0')
+        self.assertEqual(
+            response.data['items'][0]['id'],
+            CartItem.objects.get(cart=self.cart, product=self.products[0]).id
+        )
+
+    def test_updated_cart_keeps_its_item_ids(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post(
+            reverse('cart:cart-add-item'),
+            {'product_id': self.products[0].id, 'quantity': 1},
+            format='json'
+        )
+        self.assertEqual(
+            response.data['items'][0]['id'],
+            CartItem.objects.get(cart=self.cart, product=self.products[0]).id
+        )
+
+    def test_stock_warnings(self):
+        Product.objects.filter(pk=self.products[0].pk).update(stock=1)
+        Product.objects.filter(pk=self.products[1].pk).update(stock=0)
+        Product.objects.filter(pk=self.products[2].pk).update(available=False)
+        summary = self.cart.summary()
+        self.assertEqual(summary.warnings, [
+            {'product': self.products[0].id, 'message': 'Only 1 available'},
+            {'product': self.products[1].id, 'message': 'Out of stock'},
+            {'product': self.products[2].id, 'message': 'No longer available'},
+        ])
+
+    def test_guest_lines_use_current_prices(self):
+        with self.assertNumQueries(1):
+            summary = cart_summary(lines={self.products[0].id: new_line(3, None)})
+        self.assertEqual(summary.subtotal, Decimal('30.00'))
+        self.assertEqual(summary.items[0].price, Decimal('10.00'))
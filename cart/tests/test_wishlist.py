@@ -0,0 +1,115 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from django.contrib.auth import get_user_model
+from unittest import mock
+from products.models import Product
+from cart import views
+from cart.models import Cart, CartItem, WishlistItem
+from cart.storage import DatabaseCartStorage
+
+User = get_user_model()
+
+
+class WishlistAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', price=10 + i, stock=5, slug=f'product-{i}'
+            )
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.list_url = reverse('cart:wishlist-list')
+        # Moves to and from the cart are read back from its rows
+        patcher = mock.patch('cart.storage._storage', DatabaseCartStorage())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _save(self, *products):
+        for product in products:
+            self.client.post(self.list_url, {'product_id': product.id})
+
+    def test_add_is_idempotent(self):
+        response = self.client.post(self.list_url, {'product_id': self.products[0].id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['price'], '10.00')
+        response = self.client.post(self.list_url, {'product_id': self.products[0].id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(WishlistItem.objects.count(), 1)
+
+    def test_add_unknown_product(self):
+        response = self.client.post(self.list_url, {'product_id': 999})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_remove(self):
+        self._save(self.products[0])
+        url = reverse('cart:wishlist-detail', args=[self.products[0].id])
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    @mock.patch.object(views, 'WISHLIST_PAGE_SIZE', 2)
+    def test_list_hydrates_in_one_query_and_pages_by_cursor(self):
+        self._save(*self.products)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url)
+        seen = [item['name'] for item in response.data['results']]
+        self.assertIn('stock', response.data['results'][0])
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [item['name'] for item in response.data['results']]
+        self.assertEqual(seen, [f'Product {i}' for i in reversed(range(5))])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.list_url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_move_to_cart_in_one_batch(self):
+        self.products[2].stock = 0
+        self.products[2].save()
+        self._save(*self.products[:3])
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[1], quantity=3)
+
+        response = self.client.post(
+            reverse('cart:wishlist-move-to-cart'),
+            {'product_ids': [p.id for p in self.products[:4]]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['moved'], [self.products[0].id, self.products[1].id])
+        self.assertEqual(response.data['unavailable'], [self.products[2].id])
+        self.assertEqual(response.data['not_saved'], [self.products[3].id])
+        quantities = dict(cart.items.values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.products[0].id: 1, self.products[1].id: 3})
+        self.assertEqual(
+            list(WishlistItem.objects.values_list('product_id', flat=True)),
+            [self.products[2].id]
+        )
+
+    def test_save_from_cart(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=2)
+        CartItem.objects.create(cart=cart, product=self.products[1], quantity=1)
+        self._save(self.products[0])
+
+        response = self.client.post(
+            reverse('cart:wishlist-save-from-cart'),
+            {'product_ids': [self.products[0].id, self.products[3].id]},
+            format='json'
+        )
+        self.assertEqual(response.data['saved'], [self.products[0].id])
+        self.assertEqual(response.data['not_in_cart'], [self.products[3].id])
+        self.assertEqual(
+            list(cart.items.values_list('product_id', flat=True)), [self.products[1].id]
+        )
+        self.assertEqual(WishlistItem.objects.count(), 1)
+
+    def test_requires_authentication(self):
+        response = APIClient().get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -6,6 +6,7 @@ app_name = 'cart'
 
 router = DefaultRouter()
 router.register(r'cart', views.CartViewSet, basename='cart')  
+router.register(r'wishlist', views.WishlistViewSet, basename='wishlist')
 
 urlpatterns = [
     # Web Interface URLs
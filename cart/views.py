@@ -1,14 +1,32 @@
-from django.db import transaction
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiExample
 from django.shortcuts import redirect, get_object_or_404, render
-from .models import Cart, CartItem
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from .models import Cart, WishlistItem
+from promotions.models import Coupon
+from .cart import Cart as GuestCart, merge_quantities
+from .summary import cart_summary, revalidate_cart
+from .storage import CartUpdateError, get_cart_storage, get_or_create_cart, new_line
 from products.models import Product
-from .serializers import CartSerializer, CartItemActionSerializer
-from django.contrib.auth.decorators import login_required
+from products.pagination import InvalidCursor, paginate_keyset
+from .serializers import (
+    CartSerializer,
+    CartBatchSerializer,
+    CartItemActionSerializer,
+    CartMergeSerializer,
+    CartRevalidationSerializer,
+    CouponApplySerializer,
+    WishlistItemSerializer,
+    WishlistAddSerializer,
+    WishlistMoveSerializer,
+)
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 import logging
@@ -18,23 +36,25 @@ logger = logging.getLogger(__name__)
 class CartViewSet(viewsets.ViewSet):
     """
     API endpoints for cart operations
+
+    Cart lines are read and changed through cart storage, so they may be
+    served from Redis ahead of the Cart/CartItem rows.
     """
     permission_classes = [IsAuthenticated]
 
     def get_cart(self):
         """Get or create cart for the current user"""
-        cart, created = Cart.objects.get_or_create(
-            user=self.request.user,
-            defaults={'is_active': True}
+        return get_or_create_cart(self.request.user.id)
+
+    def cart_response(self, lines=None):
+        return Response(
+            CartSerializer(self.get_cart(), context={'lines': lines}).data,
+            status=status.HTTP_200_OK
         )
-        logger.debug(f"Cart {'created' if created else 'retrieved'}: {cart.id}")
-        return cart
 
     def list(self, request):
         """Get cart summary"""
-        cart = self.get_cart()
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return self.cart_response()
     @extend_schema(
         request=CartItemActionSerializer,
         responses={200: CartSerializer},
@@ -47,51 +67,14 @@ class CartViewSet(viewsets.ViewSet):
         serializer.is_valid(raise_exception=True)
         
         try:
-            product = Product.objects.get(id=serializer.validated_data['product_id'])
-            quantity = serializer.validated_data.get('quantity', 1)
-            
-            if quantity > product.stock:
-                return Response(
-                    {'error': 'Not enough stock available'},  # Changed to match test
-                    status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Check stock before attempting to add
-            if quantity > product.stock:
-                return Response(
-                    {'error': f'Only {product.stock} items available'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            with transaction.atomic():
-                cart = self.get_cart()
-                try:
-                    cart_item = CartItem.objects.get(cart=cart, product=product)
-                    new_quantity = cart_item.quantity + quantity
-                    if new_quantity > product.stock:
-                        return Response(
-                            {'error': f'Only {product.stock - cart_item.quantity} more available'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    cart_item.quantity = new_quantity
-                    cart_item.save()
-                except CartItem.DoesNotExist:
-                    CartItem.objects.create(
-                        cart=cart,
-                        product=product,
-                        quantity=quantity
-                    )
-                
-                return Response(
-                    CartSerializer(cart, context={'request': request}).data,
-                    status=status.HTTP_200_OK
-                )
-                
-        except Product.DoesNotExist:
-            return Response(
-                {'error': 'Product not found'}, 
-                status=status.HTTP_404_NOT_FOUND
+            lines = get_cart_storage().add(
+                request.user.id,
+                serializer.validated_data['product_id'],
+                serializer.validated_data['quantity']
             )
+        except CartUpdateError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return self.cart_response(lines)
 
     @extend_schema(
         request=CartItemActionSerializer,
@@ -109,40 +92,15 @@ class CartViewSet(viewsets.ViewSet):
         """Remove item from cart or reduce quantity"""
         serializer = CartItemActionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        
         try:
-            product = Product.objects.get(id=serializer.validated_data['product_id'])
-            quantity = serializer.validated_data.get('quantity', 1)
-            
-            if quantity <= 0:
-                return Response(
-                    {'error': 'Quantity must be positive'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            with transaction.atomic():
-                cart = self.get_cart()
-                try:
-                    cart_item = CartItem.objects.get(cart=cart, product=product)
-                    if cart_item.quantity > quantity:
-                        cart_item.quantity -= quantity
-                        cart_item.save()
-                    else:
-                        cart_item.delete()
-                        
-                    return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
-                    
-                except CartItem.DoesNotExist:
-                    return Response(
-                        {'error': 'Item not in cart'}, 
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-                    
-        except Product.DoesNotExist:
-            return Response(
-                {'error': 'Product not found'}, 
-                status=status.HTTP_404_NOT_FOUND
+            lines = get_cart_storage().remove(
+                request.user.id,
+                serializer.validated_data['product_id'],
+                serializer.validated_data['quantity']
             )
+        except CartUpdateError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return self.cart_response(lines)
 
     @extend_schema(
         responses={
@@ -155,55 +113,279 @@ class CartViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['delete'])
     def clear(self, request):
         """Clear all items from the cart"""
-        with transaction.atomic():
-            cart = self.get_cart()
-            cart.items.all().delete()
+        get_cart_storage().clear(request.user.id)
+        return Response(
+            {'message': 'Cart cleared successfully', 'items': []},
+            status=status.HTTP_200_OK
+        )
+
+    @extend_schema(
+        request=CartBatchSerializer,
+        responses={200: CartSerializer},
+        examples=[OpenApiExample(
+            'Example',
+            value={'operations': [
+                {'op': 'set', 'product_id': 1, 'quantity': 3},
+                {'op': 'add', 'product_id': 2, 'quantity': 1},
+                {'op': 'remove', 'product_id': 3, 'quantity': 1},
+            ]},
+            request_only=True
+        )]
+    )
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Apply several add/set/remove operations at once, in order.
+
+        Either every operation is applied or, when any of them fails, none
+        is and each failure is listed under `errors`.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            lines = get_cart_storage().apply(
+                request.user.id, serializer.validated_data['operations']
+            )
+        except CartUpdateError as e:
+            return Response({'error': e.message, 'errors': e.errors}, status=e.status_code)
+        return self.cart_response(lines)
+
+    @extend_schema(request=CouponApplySerializer, responses={200: CartSerializer})
+    @action(detail=False, methods=['post', 'delete'])
+    def coupon(self, request):
+        """Apply a coupon code to the cart (POST) or take it off (DELETE)"""
+        cart = self.get_cart()
+        if request.method == 'DELETE':
+            Cart.objects.filter(pk=cart.pk).update(applied_coupon=None)
+            return self.cart_response()
+        serializer = CouponApplySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        coupon = Coupon.objects.filter(
+            Coupon.redeemable(),
+            Q(promotion__ends_at__isnull=True) | Q(promotion__ends_at__gt=timezone.now()),
+            code=serializer.validated_data['code'].strip().upper(),
+            promotion__is_active=True
+        ).first()
+        if coupon is None:
+            return Response(
+                {'error': 'Invalid or expired coupon'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        Cart.objects.filter(pk=cart.pk).update(applied_coupon=coupon)
+        return self.cart_response()
+
+    @extend_schema(request=None, responses={200: CartSerializer})
+    @action(detail=False, methods=['post'])
+    def revalidate(self, request):
+        """
+        Reprice the cart and check it against stock, as checkout does, and
+        list what changed under `changes`.
+        """
+        cart = self.get_cart()
+        revalidation = revalidate_cart(cart)
+        data = CartSerializer(cart, context={'lines': revalidation.lines}).data
+        data['changes'] = CartRevalidationSerializer(revalidation).data
+        return Response(data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=CartMergeSerializer,
+        examples=[OpenApiExample(
+            'Example',
+            value={'items': [{'product_id': 1, 'quantity': 2}]},
+            request_only=True
+        )]
+    )
+    @action(detail=False, methods=['post'])
+    def merge(self, request):
+        """
+        Merge a guest cart into the account's cart, for clients that sign
+        in with a token instead of a session.
+
+        Quantities are added to the cart's and clamped to stock; products
+        that could not be added in full are listed under `adjusted` with
+        the quantity now in the cart.
+        """
+        serializer = CartMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines, adjusted = merge_quantities(
+            request.user.id, serializer.validated_data['items']
+        )
+        data = CartSerializer(self.get_cart(), context={'lines': lines}).data
+        data['adjusted'] = [
+            {'product': product_id, 'quantity': quantity}
+            for product_id, quantity in sorted(adjusted.items())
+        ]
+        return Response(data, status=status.HTTP_200_OK)
+
+WISHLIST_PAGE_SIZE = 20
+WISHLIST_ORDERING = ('-added_at', '-id')
+
+class WishlistViewSet(viewsets.ViewSet):
+    """
+    Saved-for-later products, kept out of the cart.
+
+    Items are addressed by product id. Listing joins the product so price
+    and stock for a whole page come from one query, paginated by keyset.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return WishlistItem.objects.filter(
+            user=self.request.user
+        ).select_related('product').only(
+            'id', 'added_at',
+            'product__id', 'product__name', 'product__slug',
+            'product__price', 'product__stock', 'product__available'
+        )
+
+    @extend_schema(responses={200: WishlistItemSerializer(many=True)})
+    def list(self, request):
+        """One page of the wishlist, newest first"""
+        try:
+            items, next_cursor = paginate_keyset(
+                self.get_queryset(),
+                WISHLIST_ORDERING,
+                cursor=request.query_params.get('cursor'),
+                page_size=WISHLIST_PAGE_SIZE
+            )
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        next_url = None
+        if next_cursor:
+            next_url = request.build_absolute_uri(
+                f"{reverse('cart:wishlist-list')}?{urlencode({'cursor': next_cursor})}"
+            )
+        return Response({
+            'next': next_url,
+            'results': WishlistItemSerializer(items, many=True).data,
+        })
+
+    @extend_schema(request=WishlistAddSerializer, responses={201: WishlistItemSerializer})
+    def create(self, request):
+        """Save a product; saving it again is a no-op"""
+        serializer = WishlistAddSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        item, created = WishlistItem.objects.get_or_create(
+            user=request.user,
+            product_id=serializer.validated_data['product_id']
+        )
+        item = self.get_queryset().get(pk=item.pk)
+        return Response(
+            WishlistItemSerializer(item).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def destroy(self, request, pk=None):
+        """Remove a product (by product id) from the wishlist"""
+        deleted, _ = WishlistItem.objects.filter(
+            user=request.user, product_id=pk
+        ).delete()
+        if not deleted:
             return Response(
-                {'message': 'Cart cleared successfully', 'items': []},
-                status=status.HTTP_200_OK
+                {'error': 'Item not in wishlist'},
+                status=status.HTTP_404_NOT_FOUND
             )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(request=WishlistMoveSerializer)
+    @action(detail=False, methods=['post'], url_path='move-to-cart')
+    def move_to_cart(self, request):
+        """
+        Move saved products into the cart in one batch.
+
+        In-stock products are added with quantity 1 (products already in
+        the cart are left as they are) and leave the wishlist; products
+        that cannot be bought stay saved and are reported back.
+        """
+        serializer = WishlistMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_ids = set(serializer.validated_data['product_ids'])
+
+        saved = list(self.get_queryset().filter(product_id__in=product_ids))
+        movable = {
+            item.product.id: item.product for item in saved
+            if item.product.available and item.product.stock > 0
+        }
+
+        def add(lines):
+            return {
+                product.id: new_line(1, product.price)
+                for product in movable.values() if product.id not in lines
+            }
+
+        lines = get_cart_storage().update(request.user.id, add)
+        moved = list(movable)
+        WishlistItem.objects.filter(
+            user=request.user, product_id__in=moved
+        ).delete()
+
+        return Response({
+            'moved': sorted(moved),
+            'unavailable': sorted(
+                item.product_id for item in saved if item.product_id not in movable
+            ),
+            'not_saved': sorted(product_ids - {item.product_id for item in saved}),
+            'cart': CartSerializer(
+                get_or_create_cart(request.user.id), context={'lines': lines}
+            ).data,
+        })
+
+    @extend_schema(request=WishlistMoveSerializer)
+    @action(detail=False, methods=['post'], url_path='save-from-cart')
+    def save_from_cart(self, request):
+        """Move cart lines into the wishlist in one batch"""
+        serializer = WishlistMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_ids = set(serializer.validated_data['product_ids'])
+
+        storage = get_cart_storage()
+        # Save first, so a failure cannot drop products from both lists
+        saved = product_ids & set(storage.lines(request.user.id))
+        WishlistItem.objects.bulk_create(
+            [WishlistItem(user=request.user, product_id=product_id) for product_id in saved],
+            ignore_conflicts=True
+        )
+        lines = storage.update(
+            request.user.id,
+            lambda lines: dict.fromkeys(saved & set(lines))
+        )
+
+        return Response({
+            'saved': sorted(saved),
+            'not_in_cart': sorted(product_ids - saved),
+            'cart': CartSerializer(
+                get_or_create_cart(request.user.id), context={'lines': lines}
+            ).data,
+        })
 
 # HTML Views
-@login_required
 def cart_detail(request):
-    """Render cart page with debug information"""
-    try:
-        cart = Cart.objects.select_related('user')\
-                          .prefetch_related('items__product')\
-                          .get(user=request.user)
-        logger.debug(f"Rendering cart for user {request.user.id}")
-        return render(request, 'cart/detail.html', {
-            'cart': cart,
-            'debug': True  
+    """Render cart page; guests see their session cart"""
+    if request.user.is_authenticated:
+        summary = get_or_create_cart(request.user.id).summary()
+    else:
+        summary = cart_summary(lines={
+            product_id: new_line(quantity, None)
+            for product_id, quantity in GuestCart(request).quantities().items()
         })
-    except Cart.DoesNotExist:
-        logger.info(f"Creating new cart for user {request.user.id}")
-        cart = Cart.objects.create(user=request.user)
-        return render(request, 'cart/detail.html', {'cart': cart})
+    return render(request, 'cart/detail.html', {'summary': summary})
 
-@login_required
 @require_POST
 def add_to_cart(request, product_id):
     """Add item to cart from web interface"""
+    product = get_object_or_404(Product, id=product_id)
     try:
         quantity = int(request.POST.get('quantity', 1))
-        product = get_object_or_404(Product, id=product_id)
-        
-        with transaction.atomic():
-            cart, _ = Cart.objects.get_or_create(user=request.user)
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
-            
+        if quantity < 1:
+            raise ValueError('Quantity must be positive')
+        if request.user.is_authenticated:
+            get_cart_storage().add(request.user.id, product.id, quantity)
+        else:
+            # Stock is checked when the guest cart is merged at login
+            GuestCart(request).add(product, quantity)
         messages.success(request, f"Added {product.name} to cart")
         return redirect('cart:detail')
         
     except Exception as e:
         messages.error(request, f"Error adding to cart: {str(e)}")
-        return redirect('products:detail', slug=product.slug)
\ No newline at end of file
+        return redirect('products:detail', slug=product.slug)
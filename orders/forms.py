@@ -1,8 +1,16 @@
+import logging
+
 from django import forms
+from django.db import transaction
 from django.core.exceptions import ValidationError
 from .models import Order, OrderItem
 from products.models import Product
+from products.stock import stock_transaction
 from cart.models import Cart
+from cart.storage import get_cart_storage
+from promotions.models import Coupon
+
+logger = logging.getLogger(__name__)
 
 class OrderCreateForm(forms.ModelForm):
     class Meta:
@@ -38,8 +46,17 @@ class OrderCreateForm(forms.ModelForm):
         cleaned_data = super().clean()
         
         # Verify the user has items in their cart
-        if not Cart.objects.filter(user=self.user).exists():
+        cart = Cart.objects.filter(user=self.user).first()
+        if cart is None or not get_cart_storage().lines(self.user.id):
             raise ValidationError("You cannot create an order with an empty cart")
+
+        if cart.applied_coupon_id is not None and not Coupon.objects.filter(
+            Coupon.redeemable(), pk=cart.applied_coupon_id
+        ).exists():
+            Cart.objects.filter(pk=cart.pk).update(applied_coupon=None)
+            raise ValidationError(
+                "Your coupon can no longer be used and was removed from the cart"
+            )
             
         return cleaned_data
 
@@ -48,31 +65,62 @@ class OrderCreateForm(forms.ModelForm):
         order.user = self.user
         
         if commit:
-            order.save()
-            self._create_order_items(order)
+            storage = get_cart_storage()
+            # The cart may be ahead of its rows under write-behind
+            storage.persist(self.user.id)
+            lines = storage.lines(self.user.id)
+            # Raises OutOfStock, without an order, if anything sold out
+            # since the cart was revalidated
+            with stock_transaction({
+                product_id: line.quantity for product_id, line in lines.items()
+            }):
+                order.save()
+                self._create_order_items(order, lines)
             
         return order
 
-    def _create_order_items(self, order):
-        """Create order items from user's cart"""
-        cart = Cart.objects.get(user=self.user)
-        
-        for item in cart.items.all():
-            OrderItem.objects.create(
+    def _create_order_items(self, order, lines):
+        """Create order items from the user's cart lines"""
+        storage = get_cart_storage()
+        cart = Cart.objects.select_related('applied_coupon').get(user=self.user)
+        if cart.applied_coupon is not None and not cart.applied_coupon.redeem():
+            # Its last redemption went to a concurrent checkout
+            logger.info(f"Coupon {cart.applied_coupon.code} ran out during checkout of order {order.pk}")
+            cart.applied_coupon = None
+        summary = cart.summary(lines)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                product=item.product,
-                price=item.product.price,
-                quantity=item.quantity,
-                product_name=item.product.name,
-                product_sku=item.product.sku
+                product_id=row.product_id,
+                price=row.price,
+                quantity=row.quantity,
+                product_name=row.name
             )
-        
-        # Calculate and save total price
-        order.total_price = sum(
-            item.price * item.quantity 
-            for item in order.items.all()
-        )
-        order.save()
-        
-        # Clear the cart
-        cart.items.all().delete()
\ No newline at end of file
+            for row in summary.items
+        ])
+        order.total_price = summary.total
+        order.discount_amount = summary.discount
+        order.save(update_fields=['total_price', 'discount_amount'])
+        Cart.objects.filter(pk=cart.pk).update(applied_coupon=None)
+
+        # Clear the cart once the order is in: carts held outside the
+        # database would not come back if the order rolled back
+        def clear_cart():
+            storage.clear(self.user.id)
+            storage.persist(self.user.id)
+        transaction.on_commit(clear_cart)
+
+
+def revalidation_messages(revalidation):
+    """What changed in the cart since it was filled, one line each"""
+    return [
+        f"The price of {item['name']} changed from ${item['old_price']:.2f} to ${item['new_price']:.2f}"
+        for item in revalidation.repriced
+    ] + [
+        f"Only {item['available']} of {item['name']} available; the quantity was reduced"
+        for item in revalidation.reduced
+    ] + [
+        f"{item['name'] or 'A product'} is no longer available and was removed"
+        for item in revalidation.removed
+    ]
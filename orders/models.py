@@ -2,6 +2,7 @@ from django.db import DatabaseError, models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from products.models import Product
+from products.stock import restock
 from django.utils import timezone
 from django.db.models import Q, Sum, F
 from decimal import Decimal, InvalidOperation
@@ -215,15 +216,17 @@ class Order(models.Model):
 
     def _restock_inventory(self):
         """Restock products when order is cancelled"""
-        for item in self.items.all():
-            if item.product:
-                try:
-                    with transaction.atomic():
-                        product = Product.objects.select_for_update().get(pk=item.product.pk)
-                        product.stock += item.quantity
-                        product.save()
-                except Exception as e:
-                    logger.error(f"Failed to restock product {item.product.pk}: {e}")
+        # One relative UPDATE instead of locking and saving each product;
+        # hot products' counters pick it up at their next reconcile
+        quantities = {}
+        for product_id, quantity in self.items.filter(
+            product__isnull=False
+        ).values_list('product_id', 'quantity'):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        try:
+            restock(quantities)
+        except DatabaseError as e:
+            logger.error(f"Failed to restock products of order {self.pk}: {e}")
 
 
 class OrderItem(models.Model):
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from orders.models import Order
+
+User = get_user_model()
+
+
+class OrderViewSetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='orderuser@example.com', password='pass1234')
+        other = User.objects.create_user(email='other@example.com', password='pass1234')
+        self.orders = [
+            Order.objects.create(user=self.user, total_price=10 * i) for i in range(1, 5)
+        ]
+        Order.objects.create(user=other, total_price=99)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('orders:orders-api:order-list')
+
+    def test_list_is_routed_to_the_api(self):
+        self.assertEqual(self.url, '/orders/api/orders/')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('results', response.data)
+
+    def test_cursor_pages_through_own_orders_newest_first(self):
+        response = self.client.get(self.url, {'page_size': 3})
+        ids = [order['id'] for order in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [order['id'] for order in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(ids, [order.id for order in reversed(self.orders)])
+
+    def test_status_filter(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(status=Order.Status.PAID)
+        response = self.client.get(self.url, {'status': 'PAID'})
+        self.assertEqual(
+            [order['id'] for order in response.data['results']], [self.orders[0].id]
+        )
@@ -0,0 +1,136 @@
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+from cart.models import Cart, CartItem
+from cart.storage import LocalCartStorage
+from orders.forms import OrderCreateForm
+from orders.models import Order
+from products.models import Product
+from products.stock import LocalStockCounter, OutOfStock
+from promotions.engine import bump_promotion_version
+from promotions.models import Coupon, Promotion
+
+User = get_user_model()
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='pass1234')
+        self.product = Product.objects.create(name='Phone', price=Decimal('100.00'), stock=5)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        self.data = {
+            'shipping_address': '{"line1": "1 Main St"}',
+            'billing_address': '{"line1": "1 Main St"}',
+            'payment_method': Order.PaymentMethod.CREDIT_CARD,
+        }
+
+    def test_changes_are_shown_before_the_order_is_placed(self):
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('90.00'))
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse('orders:create'), self.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'The price of Phone changed from $100.00 to $90.00')
+        self.assertFalse(Order.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('orders:create'), self.data)
+        self.assertRedirects(response, reverse('orders:list'), fetch_redirect_response=False)
+        order = Order.objects.get(user=self.user)
+        item = order.items.get()
+        self.assertEqual((item.price, item.quantity, item.product_name), (Decimal('90.00'), 2, 'Phone'))
+        self.assertEqual(order.total_price, Decimal('180.00'))
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+
+    def test_validating_the_form_leaves_the_cart_alone(self):
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('90.00'), stock=1)
+        form = OrderCreateForm(data=self.data, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        item = CartItem.objects.get(cart__user=self.user)
+        self.assertEqual((item.quantity, item.price_at_addition), (2, Decimal('100.00')))
+
+    def test_cart_is_kept_when_the_order_fails(self):
+        storage = LocalCartStorage()
+        with mock.patch('cart.storage._storage', storage):
+            form = OrderCreateForm(data=self.data, user=self.user)
+            self.assertTrue(form.is_valid(), form.errors)
+            # The last write of the order transaction fails
+            with mock.patch.object(Cart.objects, 'filter', side_effect=DatabaseError):
+                with self.captureOnCommitCallbacks(execute=True):
+                    with self.assertRaises(DatabaseError):
+                        form.save()
+            self.assertFalse(Order.objects.exists())
+            self.assertEqual(storage.lines(self.user.id)[self.product.pk].quantity, 2)
+
+    def test_hot_product_is_released_when_the_order_fails(self):
+        Product.objects.filter(pk=self.product.pk).update(hot=True)
+        counter = LocalStockCounter()
+        with mock.patch('products.stock._counter', counter):
+            form = OrderCreateForm(data=self.data, user=self.user)
+            self.assertTrue(form.is_valid(), form.errors)
+            with mock.patch.object(Cart.objects, 'filter', side_effect=DatabaseError):
+                with self.assertRaises(DatabaseError):
+                    form.save()
+        self.assertEqual(counter.counts[self.product.pk], [5, 0, 0])
+
+    def test_empty_cart_cannot_be_ordered(self):
+        CartItem.objects.all().delete()
+        form = OrderCreateForm(data=self.data, user=self.user)
+        self.assertFalse(form.is_valid())
+
+    def test_applied_coupon_is_redeemed_with_the_order(self):
+        promotion = Promotion.objects.create(name='-10%', kind='percentage', value=10)
+        coupon = Coupon.objects.create(code='TEN', promotion=promotion, max_redemptions=5)
+        Cart.objects.filter(user=self.user).update(applied_coupon=coupon)
+
+        form = OrderCreateForm(data=self.data, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        order = form.save()
+        self.assertEqual(order.discount_amount, Decimal('20.00'))
+        self.assertEqual(order.total_price, Decimal('180.00'))
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.redemptions, 1)
+        self.assertIsNone(Cart.objects.get(user=self.user).applied_coupon_id)
+        bump_promotion_version()
+
+    def test_order_takes_its_stock(self):
+        form = OrderCreateForm(data=self.data, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        order = form.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+        order.cancel()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+    def test_product_sold_out_during_checkout_rolls_the_order_back(self):
+        form = OrderCreateForm(data=self.data, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        # Another buyer takes the stock after the cart was revalidated
+        Product.objects.filter(pk=self.product.pk).update(stock=1)
+
+        with self.assertRaises(OutOfStock):
+            form.save()
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(CartItem.objects.filter(cart__user=self.user).exists())
+
+    def test_hot_product_is_reserved_from_the_counter(self):
+        Product.objects.filter(pk=self.product.pk).update(hot=True)
+        counter = LocalStockCounter()
+        with mock.patch('products.stock._counter', counter):
+            form = OrderCreateForm(data=self.data, user=self.user)
+            self.assertTrue(form.is_valid(), form.errors)
+            with self.captureOnCommitCallbacks(execute=True):
+                form.save()
+            self.assertEqual(counter.counts[self.product.pk], [3, 0, 2])
+            self.product.refresh_from_db()
+            self.assertEqual(self.product.stock, 5)
+
+            counter.reconcile()
+            self.product.refresh_from_db()
+            self.assertEqual(self.product.stock, 3)
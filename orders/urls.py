@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 from .views import (
     OrderListView,
@@ -30,9 +30,12 @@ traditional_urlpatterns = [
 
 ]
 
-# DRF API URLs
+# DRF API URLs, under their own prefix: registered at the root they were
+# shadowed by the views above
 router = DefaultRouter()
-router.register(r'', OrderViewSet, basename='order')
+router.register(r'orders', OrderViewSet, basename='order')
 
 # Combine both URL patterns
-urlpatterns = traditional_urlpatterns + router.urls
\ No newline at end of file
+urlpatterns = traditional_urlpatterns + [
+    path('api/', include((router.urls, 'orders-api'))),
+]
\ No newline at end of file
@@ -13,7 +13,7 @@ from django.views.generic import ListView
 from django.views.generic import DetailView
 from django.views.generic.edit import CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .forms import OrderCreateForm
+from .forms import OrderCreateForm, revalidation_messages
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.http import HttpResponseRedirect
@@ -23,14 +23,35 @@ from django.template.loader import get_template
 import datetime
 from xhtml2pdf import pisa
 from products.models import Product
+from products.stock import OutOfStock
+from cart.models import Cart
+from cart.summary import revalidate_cart
+from products.pagination import KeysetPagination
 from django.views.generic import View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .models import OrderItem
 
  
+class OrderPagination(KeysetPagination):
+    """Order history cursors, served by the (user, -created_at) index"""
+    page_size = 10
+    orderings = {'newest': ('-created_at', '-id')}
+
+
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderPagination
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Order.objects.none()
+        queryset = Order.objects.filter(
+            user=self.request.user
+        ).prefetch_related('items')
+        if status := self.request.query_params.get('status'):
+            queryset = queryset.filter(status=status)
+        return queryset
 
     @swagger_auto_schema(
         operation_description="List all orders with optional status filtering",
@@ -249,7 +270,30 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
         return response
     
 
-class OrderTemplateCreateView(LoginRequiredMixin, CreateView):
+class CheckoutMixin:
+    """Places an OrderCreateForm's order from the user's current cart"""
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def cart_is_current(self, form):
+        """
+        Reprice and restock-check the cart of a valid form. Any change is
+        added to the form's errors for the shopper to review, and
+        submitting again places the order as now listed.
+        """
+        revalidation = revalidate_cart(Cart.objects.get(user=self.request.user))
+        if not revalidation.lines:
+            form.add_error(None, "You cannot create an order with an empty cart")
+            return False
+        for message in revalidation_messages(revalidation):
+            form.add_error(None, message)
+        return not revalidation.changed
+
+
+class OrderTemplateCreateView(LoginRequiredMixin, CheckoutMixin, CreateView):
     model = Order
     form_class = OrderCreateForm
     template_name = 'orders/create.html'
@@ -257,12 +301,18 @@ class OrderTemplateCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
-        response = super().form_valid(form)
+        if not self.cart_is_current(form):
+            return self.form_invalid(form)
+        try:
+            response = super().form_valid(form)
+        except OutOfStock as e:
+            form.add_error(None, str(e))
+            return self.form_invalid(form)
         messages.success(self.request, "Order created successfully!")
         return response
     
 
-class OrderCreateView(LoginRequiredMixin, CreateView):
+class OrderCreateView(LoginRequiredMixin, CheckoutMixin, CreateView):
     model = Order
     form_class = OrderCreateForm
     template_name = 'orders/create.html'
@@ -270,7 +320,13 @@ class OrderCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
-        response = super().form_valid(form)
+        if not self.cart_is_current(form):
+            return self.form_invalid(form)
+        try:
+            response = super().form_valid(form)
+        except OutOfStock as e:
+            form.add_error(None, str(e))
+            return self.form_invalid(form)
         messages.success(self.request, f"Order #{self.object.id} created successfully!")
         return response
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, Review, ProductImage  
+from .models import Category, Product, Review, ProductImage, PriceHistory, SearchQueryStat
 from django.utils.html import format_html
 from django.urls import reverse
 from django.db.models import Avg
@@ -43,7 +43,7 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [ProductImageInline]  # Added this line
     list_display = ('image_thumb', 'name', 'price', 'category', 'available', 'featured', 
                    'average_rating', 'created_at')
-    list_filter = ('available', 'featured', 'category', 'created_at')
+    list_filter = ('available', 'featured', 'hot', 'category', 'created_at')
     list_editable = ('price', 'available', 'featured')
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ('name', 'description', 'category__name')
@@ -56,7 +56,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('name', 'slug', 'category', 'price')
         }),
         ('Inventory', {
-            'fields': ('stock', 'available', 'featured'),
+            'fields': ('stock', 'available', 'featured', 'hot'),
             'classes': ('collapse',)
         }),
         ('Details', {
@@ -105,4 +105,35 @@ class ReviewAdmin(admin.ModelAdmin):
 
     def short_comment(self, obj):
         return obj.comment[:50] + '...' if len(obj.comment) > 50 else obj.comment
-    short_comment.short_description = 'Comment Preview'
\ No newline at end of file
+    short_comment.short_description = 'Comment Preview'
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ('product', 'previous_price', 'price', 'recorded_at')
+    list_select_related = ('product',)
+    search_fields = ('product__name',)
+    date_hierarchy = 'recorded_at'
+
+    # Price history is append-only evidence of past prices
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(SearchQueryStat)
+class SearchQueryStatAdmin(admin.ModelAdmin):
+    list_display = ('query', 'hour', 'searches', 'zero_results')
+    search_fields = ('query',)
+    date_hierarchy = 'hour'
+    ordering = ('-hour', '-searches')
+
+    # Rows are written by the analytics flush only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,267 @@
+import hashlib
+import logging
+import math
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import filters
+from .models import (
+    CategoryTrend,
+    Product,
+    ProductTrend,
+    ProductViewStat,
+    SearchQueryStat,
+)
+
+logger = logging.getLogger(__name__)
+
+# Events are counted in the cache per bucket and a bucket is flushed to the
+# database once it is closed, so the request path never writes a row.
+ANALYTICS_BUCKET_SECONDS = getattr(settings, 'ANALYTICS_BUCKET_SECONDS', 60)
+# Counters survive this long, which bounds how far a stalled flush can catch up
+ANALYTICS_COUNTER_TIMEOUT = getattr(settings, 'ANALYTICS_COUNTER_TIMEOUT', 60 * 60 * 6)
+TRENDING_HALF_LIFE = getattr(settings, 'TRENDING_HALF_LIFE', timedelta(hours=24))
+
+FLUSH_LOCK_KEY = 'analytics_flush_lock'
+FLUSH_LOCK_TIMEOUT = 60 * 5
+FLUSHED_THROUGH_KEY = 'analytics_flushed_through'
+MAX_QUERY_LENGTH = 255
+
+
+def current_bucket(now=None):
+    return int((now or timezone.now()).timestamp()) // ANALYTICS_BUCKET_SECONDS
+
+
+def bucket_hour(bucket):
+    start = datetime.fromtimestamp(bucket * ANALYTICS_BUCKET_SECONDS, tz=dt_timezone.utc)
+    return start.replace(minute=0, second=0, microsecond=0)
+
+
+def _members_key(stream, bucket):
+    return f'analytics_{stream}_{bucket}_members'
+
+
+def _counter_key(stream, bucket, member_key):
+    return f'analytics_{stream}_{bucket}_{member_key}'
+
+
+def _count(stream, member_key, member):
+    """
+    Add one event to the current bucket of a stream.
+
+    The first event for a member in a bucket also appends it to the
+    bucket's member list, so the flush can find every counter without
+    scanning keys. Analytics must never break the request being counted.
+    """
+    bucket = current_bucket()
+    counter_key = _counter_key(stream, bucket, member_key)
+    try:
+        if cache.add(counter_key, 1, timeout=ANALYTICS_COUNTER_TIMEOUT):
+            members_key = _members_key(stream, bucket)
+            cache.add(members_key, 0, timeout=ANALYTICS_COUNTER_TIMEOUT)
+            index = cache.incr(members_key)
+            cache.set(
+                f'{members_key}_{index}',
+                (member_key, member),
+                timeout=ANALYTICS_COUNTER_TIMEOUT
+            )
+        else:
+            cache.incr(counter_key)
+    except Exception as e:
+        logger.warning(f"Dropped {stream} analytics event: {e}")
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())[:MAX_QUERY_LENGTH]
+
+
+def record_product_view(product_id):
+    _count('views', product_id, product_id)
+
+
+def record_search(query):
+    query = normalize_query(query)
+    if query:
+        _count('searches', hashlib.md5(query.encode()).hexdigest(), query)
+
+
+def _read_bucket(stream, bucket):
+    """
+    Counters of one closed bucket as ({member: count}, keys), where keys
+    are the cache entries to delete once the counts are safely stored.
+    """
+    members_key = _members_key(stream, bucket)
+    size = cache.get(members_key)
+    if not size:
+        return {}, []
+    slot_keys = [f'{members_key}_{index}' for index in range(1, size + 1)]
+    members = list(cache.get_many(slot_keys).values())
+    counter_keys = {
+        _counter_key(stream, bucket, member_key): member
+        for member_key, member in members
+    }
+    counts = cache.get_many(list(counter_keys))
+    return {
+        member: counts[key]
+        for key, member in counter_keys.items() if counts.get(key)
+    }, [members_key, *slot_keys, *counter_keys]
+
+
+def _merge_counts(model, field, counts):
+    """
+    Add {(hour, member): {column: n}} onto the aggregate rows, creating
+    the missing ones. Existing rows are read with one query per table.
+    """
+    if not counts:
+        return
+    hours = {hour for hour, _ in counts}
+    members = {member for _, member in counts}
+    columns = sorted({column for values in counts.values() for column in values})
+    existing = {
+        (row.hour, getattr(row, field)): row
+        for row in model.objects.select_for_update().filter(
+            hour__in=hours, **{f'{field}__in': members}
+        )
+    }
+    created = []
+    for key, values in counts.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(model(hour=key[0], **{field: key[1]}, **values))
+            continue
+        for column, value in values.items():
+            setattr(row, column, getattr(row, column) + value)
+    model.objects.bulk_update(existing.values(), columns, batch_size=1000)
+    model.objects.bulk_create(created, batch_size=1000)
+
+
+def _log2_add(a, b):
+    """log2(2^a + 2^b) without overflowing"""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def _decay_weight(moment):
+    """log2 of the weight of an event at `moment`: 2^(t / half-life)"""
+    return moment.timestamp() / TRENDING_HALF_LIFE.total_seconds()
+
+
+def decayed_score(score, now=None):
+    """Turn a stored trend score back into decayed views as of `now`"""
+    return 2 ** (score - _decay_weight(now or timezone.now()))
+
+
+def _update_trends(model, field, increments):
+    """Fold {member id: log2 contribution} into the stored trend scores"""
+    if not increments:
+        return
+    existing = {
+        getattr(row, f'{field}_id'): row
+        for row in model.objects.select_for_update().filter(
+            **{f'{field}_id__in': increments}
+        )
+    }
+    now = timezone.now()
+    created = []
+    for member_id, contribution in increments.items():
+        row = existing.get(member_id)
+        if row is None:
+            created.append(model(**{f'{field}_id': member_id}, score=contribution))
+        else:
+            row.score = _log2_add(row.score, contribution)
+            row.updated_at = now
+    model.objects.bulk_update(existing.values(), ['score', 'updated_at'], batch_size=1000)
+    model.objects.bulk_create(created, batch_size=1000)
+
+
+def _record_trends(views):
+    product_increments = {}
+    for (hour, product_id), count in views.items():
+        contribution = math.log2(count) + _decay_weight(hour)
+        product_increments[product_id] = _log2_add(
+            product_increments.get(product_id), contribution
+        )
+
+    categories = dict(
+        Product.objects.filter(
+            id__in=product_increments, category__isnull=False
+        ).values_list('id', 'category_id')
+    )
+    category_increments = {}
+    for product_id, score in product_increments.items():
+        category_id = categories.get(product_id)
+        if category_id:
+            category_increments[category_id] = _log2_add(
+                category_increments.get(category_id), score
+            )
+
+    _update_trends(ProductTrend, 'product', product_increments)
+    _update_trends(CategoryTrend, 'category', category_increments)
+
+
+def flush(now=None):
+    """
+    Move every closed bucket's counters into the aggregate tables.
+
+    The bucket being written to and the one before it are left alone, so
+    a request that computed its bucket just before the boundary still
+    lands in a bucket that has not been flushed. Returns the number of
+    buckets processed, or None if another flush holds the lock.
+    """
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=FLUSH_LOCK_TIMEOUT):
+        return None
+    try:
+        last_closed = current_bucket(now) - 2
+        oldest = last_closed - ANALYTICS_COUNTER_TIMEOUT // ANALYTICS_BUCKET_SECONDS
+        first = max(cache.get(FLUSHED_THROUGH_KEY, oldest) + 1, oldest)
+
+        views = Counter()
+        searches = Counter()
+        flushed_keys = []
+        for bucket in range(first, last_closed + 1):
+            hour = bucket_hour(bucket)
+            for stream, totals in (('views', views), ('searches', searches)):
+                counts, keys = _read_bucket(stream, bucket)
+                for member, count in counts.items():
+                    totals[(hour, member)] += count
+                flushed_keys.extend(keys)
+
+        # Checked once per distinct query per flush, off the request path
+        unmatched = {
+            query for query in {query for _, query in searches}
+            if not Product.objects.filter(filters.search_filter(query)).exists()
+        }
+        live_products = set(
+            Product.objects.filter(
+                id__in={product_id for _, product_id in views}
+            ).values_list('id', flat=True)
+        )
+        views = Counter({
+            key: count for key, count in views.items() if key[1] in live_products
+        })
+
+        with transaction.atomic():
+            _merge_counts(ProductViewStat, 'product_id', {
+                key: {'views': count} for key, count in views.items()
+            })
+            _merge_counts(SearchQueryStat, 'query', {
+                key: {
+                    'searches': count,
+                    'zero_results': count if key[1] in unmatched else 0,
+                }
+                for key, count in searches.items()
+            })
+            _record_trends(views)
+
+        cache.delete_many(flushed_keys)
+        cache.set(FLUSHED_THROUGH_KEY, last_closed, timeout=None)
+        return max(last_closed - first + 1, 0)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
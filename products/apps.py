@@ -5,6 +5,8 @@ class ProductsConfig(AppConfig):
     name = 'products'
 
     def ready(self):
+        from . import recently_viewed  # noqa: F401 (merges lists at login)
+
         # Skip during management commands and tests
         if (os.environ.get('RUN_MAIN') != 'true' and 
             not os.environ.get('RUNNING_TESTS')):
@@ -0,0 +1,70 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+# Versions never expire on their own; a lost version simply reads as 0
+# and forces the dependent entries to be rebuilt once.
+VERSION_TIMEOUT = None
+
+# Catalog-wide versions for responses that embed every product's reviews
+# or category data.
+REVIEWS_VERSION_KEY = 'review_version_all'
+CATEGORY_VERSION_KEY = 'category_version'
+PRODUCT_VERSION_KEY = 'product_version'
+
+
+def review_version_key(product_id):
+    return f'review_version_{product_id}'
+
+
+def get_review_versions(product_ids):
+    """Current review aggregate version for each product id (one multi-get)"""
+    keys = {product_id: review_version_key(product_id) for product_id in product_ids}
+    found = cache.get_many(keys.values())
+    return {product_id: found.get(key, 0) for product_id, key in keys.items()}
+
+
+def get_versions(keys):
+    """
+    Current value of each version key, in order.
+
+    Missing versions are initialised to the current time rather than read
+    as 0, so validators handed out before a cache flush never match again.
+    """
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        version = time.time_ns()
+        for key in missing:
+            cache.add(key, version, timeout=VERSION_TIMEOUT)
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def version_time(version):
+    """The moment a version was bumped, for Last-Modified headers"""
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc) if version else None
+
+
+def bump_review_versions(product_ids):
+    """
+    Mark the rating aggregates of these products as changed.
+
+    Versions are monotonic timestamps written with a single set_many, so a
+    batch of affected products costs one cache round trip.
+    """
+    version = time.time_ns()
+    keys = {review_version_key(product_id) for product_id in product_ids}
+    keys.add(REVIEWS_VERSION_KEY)
+    cache.set_many(dict.fromkeys(keys, version), timeout=VERSION_TIMEOUT)
+
+
+def bump_category_version():
+    """Mark category data (names, slugs, descriptions) as changed"""
+    cache.set(CATEGORY_VERSION_KEY, time.time_ns(), timeout=VERSION_TIMEOUT)
+
+
+def bump_product_version():
+    """Mark product data as changed for catalog-wide cached responses"""
+    cache.set(PRODUCT_VERSION_KEY, time.time_ns(), timeout=VERSION_TIMEOUT)
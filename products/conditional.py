@@ -0,0 +1,54 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Answer conditional list/retrieve requests with 304 Not Modified.
+
+    Views implement get_list_validators() and get_object_validators(),
+    returning (fingerprint, last_modified) built from cheap aggregate
+    queries and cache versions, or None to skip the check. They run before
+    the queryset is loaded, so a matching If-None-Match or
+    If-Modified-Since costs no serialization.
+    """
+
+    def get_list_validators(self):
+        return None
+
+    def get_object_validators(self):
+        return None
+
+    def get_etag(self, fingerprint):
+        # The same data renders differently per page, filter and format
+        parts = (*fingerprint, self.request.get_full_path(), self.request.accepted_media_type)
+        digest = hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+        return quote_etag(digest)
+
+    def conditional_response(self, validators, handler, request, *args, **kwargs):
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        fingerprint, last_modified = validators
+        etag = self.get_etag(fingerprint)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_list_validators(), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_object_validators(), super().retrieve, request, *args, **kwargs
+        )
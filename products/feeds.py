@@ -0,0 +1,212 @@
+import hashlib
+import time
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BigIntegerField, Count, ExpressionWrapper, F, Max
+from django.urls import reverse
+
+from .caching import CATEGORY_VERSION_KEY, get_versions
+from .models import Product
+
+FEED_CHUNK_SIZE = getattr(settings, 'PRODUCT_FEED_CHUNK_SIZE', 1000)
+FEED_CURRENCY = getattr(settings, 'PRODUCT_FEED_CURRENCY', 'USD')
+FEED_CACHE_TIMEOUT = getattr(settings, 'PRODUCT_FEED_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+# Served feeds are rebuilt by one request at a time once this old
+FEED_REFRESH_INTERVAL = getattr(settings, 'PRODUCT_FEED_REFRESH_INTERVAL', 60 * 5)
+FEED_REBUILD_LOCK_TIMEOUT = 60 * 5
+FEED_FORMATS = ('xml', 'tsv')
+
+TSV_COLUMNS = ['id', 'title', 'link', 'price', 'availability', 'image_link', 'product_type']
+
+XML_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n'
+    '<channel>\n'
+    '<title>Product feed</title>\n'
+)
+XML_CLOSE = '</channel>\n</rss>\n'
+
+ROW_FIELDS = (
+    'id', 'name', 'slug', 'price', 'stock', 'available',
+    'image', 'category__name', 'updated_at'
+)
+
+
+def _bucket():
+    return ExpressionWrapper(
+        F('id') / FEED_CHUNK_SIZE,
+        output_field=BigIntegerField()
+    )
+
+
+def feed_chunks():
+    """Return {chunk: (row_count, newest updated_at)} in a single grouped query"""
+    rows = Product.objects.annotate(
+        bucket=_bucket()
+    ).order_by().values('bucket').annotate(
+        row_count=Count('id'),
+        lastmod=Max('updated_at')
+    )
+    return {
+        row['bucket']: (row['row_count'], row['lastmod'])
+        for row in rows
+    }
+
+
+def _tsv_value(value):
+    return str(value).replace('\t', ' ').replace('\r', ' ').replace('\n', ' ')
+
+
+def render_row(row, base_url):
+    """Render one product as (xml item, tsv line)"""
+    (product_id, name, slug, price, stock, available,
+     image, category_name, _) = row
+    availability = 'in stock' if available and stock > 0 else 'out of stock'
+    link = base_url + reverse('products:detail', args=[slug])
+    image_link = f'{base_url}{settings.MEDIA_URL}{image}' if image else ''
+    price = f'{price} {FEED_CURRENCY}'
+    values = [product_id, name, link, price, availability, image_link, category_name or '']
+
+    xml = (
+        '<item>'
+        f'<g:id>{product_id}</g:id>'
+        f'<g:title>{escape(name)}</g:title>'
+        f'<g:link>{escape(link)}</g:link>'
+        f'<g:price>{price}</g:price>'
+        f'<g:availability>{availability}</g:availability>'
+        f'<g:image_link>{escape(image_link)}</g:image_link>'
+        f'<g:product_type>{escape(category_name or "")}</g:product_type>'
+        '</item>\n'
+    )
+    tsv = '\t'.join(_tsv_value(value) for value in values) + '\n'
+    return xml, tsv
+
+
+def _index_cache_key(base_url):
+    digest = hashlib.md5(base_url.encode()).hexdigest()[:12]
+    return f'product_feed_index_{digest}'
+
+
+def _lock_cache_key(base_url):
+    digest = hashlib.md5(base_url.encode()).hexdigest()[:12]
+    return f'product_feed_lock_{digest}'
+
+
+def _chunk_cache_key(chunk, base_url, category_version):
+    # Rows embed their category's name, which product updated_at misses
+    digest = hashlib.md5(f'{base_url}|{category_version}'.encode()).hexdigest()[:12]
+    return f'product_feed_chunk_{digest}_{chunk}'
+
+
+def _chunk_rows(chunk):
+    low = chunk * FEED_CHUNK_SIZE
+    return Product.objects.filter(
+        id__gte=low, id__lt=low + FEED_CHUNK_SIZE
+    ).order_by('id')
+
+
+def rebuild_chunks(base_url):
+    """
+    Bring the stored chunk cache up to date and return it ordered by chunk.
+
+    Each stored chunk remembers the fingerprint it was built from. Chunks
+    whose fingerprint is unchanged are reused as is; for the others only
+    rows with updated_at newer than the stored fingerprint are re-rendered,
+    and rows that no longer exist are dropped. A category change starts
+    every chunk over. Returns (chunks, stats).
+    """
+    fingerprints = feed_chunks()
+    category_version = get_versions([CATEGORY_VERSION_KEY])[0]
+    keys = {
+        chunk: _chunk_cache_key(chunk, base_url, category_version)
+        for chunk in fingerprints
+    }
+    stored = cache.get_many(keys.values())
+    stats = {'chunks': len(fingerprints), 'rebuilt_chunks': 0, 'rendered_rows': 0}
+
+    chunks = {}
+    updates = {}
+    for chunk, fingerprint in sorted(fingerprints.items()):
+        entry = stored.get(keys[chunk])
+        if entry and entry['fingerprint'] == fingerprint:
+            chunks[chunk] = entry['rows']
+            continue
+
+        rows = _chunk_rows(chunk)
+        if entry:
+            current_ids = set(rows.values_list('id', flat=True))
+            rendered = {
+                product_id: lines
+                for product_id, lines in entry['rows'].items()
+                if product_id in current_ids
+            }
+            previous_lastmod = entry['fingerprint'][1]
+            changed = rows.filter(updated_at__gt=previous_lastmod)
+            # Rows added with an older updated_at are rendered as well
+            missing = current_ids - rendered.keys()
+            if missing:
+                changed = rows.filter(id__in=missing) | changed
+        else:
+            rendered = {}
+            changed = rows
+
+        for row in changed.values_list(*ROW_FIELDS).iterator(chunk_size=FEED_CHUNK_SIZE):
+            rendered[row[0]] = render_row(row, base_url)
+            stats['rendered_rows'] += 1
+
+        rendered = dict(sorted(rendered.items()))
+        chunks[chunk] = rendered
+        updates[keys[chunk]] = {'fingerprint': fingerprint, 'rows': rendered}
+        stats['rebuilt_chunks'] += 1
+
+    if updates:
+        cache.set_many(updates, timeout=FEED_CACHE_TIMEOUT)
+    cache.set(_index_cache_key(base_url), {
+        'built_at': time.time(),
+        'keys': [(chunk, keys[chunk]) for chunk in chunks],
+    }, timeout=FEED_CACHE_TIMEOUT)
+    return chunks, stats
+
+
+def cached_chunks(base_url):
+    """
+    The chunks to serve, as last built by rebuild_chunks().
+
+    Once they are FEED_REFRESH_INTERVAL old, or a chunk was evicted, the
+    request that takes the rebuild lock rebuilds them while the others
+    keep serving the previous build. Returns None when there is nothing
+    complete to serve until a rebuild in progress elsewhere finishes.
+    """
+    index = cache.get(_index_cache_key(base_url))
+    chunks = None
+    if index is not None:
+        stored = cache.get_many([key for _, key in index['keys']])
+        if len(stored) == len(index['keys']):
+            chunks = {chunk: stored[key]['rows'] for chunk, key in index['keys']}
+            if time.time() - index['built_at'] < FEED_REFRESH_INTERVAL:
+                return chunks
+
+    lock_key = _lock_cache_key(base_url)
+    if not cache.add(lock_key, 1, timeout=FEED_REBUILD_LOCK_TIMEOUT):
+        return chunks
+    try:
+        return rebuild_chunks(base_url)[0]
+    finally:
+        cache.delete(lock_key)
+
+
+def iter_feed(chunks, fmt):
+    """Stream a full feed document in the requested format"""
+    column = FEED_FORMATS.index(fmt)
+    if fmt == 'xml':
+        yield XML_OPEN
+    else:
+        yield '\t'.join(TSV_COLUMNS) + '\n'
+
+    for rows in chunks.values():
+        yield ''.join(lines[column] for lines in rows.values())
+
+    if fmt == 'xml':
+        yield XML_CLOSE
@@ -1,6 +1,13 @@
 import django_filters
 from .models import Product
 from django.db.models import Q
+from . import analytics
+
+
+def search_filter(value):
+    """Products whose name or description contains `value`"""
+    return Q(name__icontains=value) | Q(description__icontains=value)
+
 
 class ProductFilter(django_filters.FilterSet):
     search = django_filters.CharFilter(method='filter_search')
@@ -14,7 +21,9 @@ class ProductFilter(django_filters.FilterSet):
         fields = ['search', 'min_price', 'max_price', 'category', 'available']
     
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(name__icontains=value) |
-            Q(description__icontains=value)
-        )
\ No newline at end of file
+        # Views may filter more than once per request (e.g. for ETags)
+        if not getattr(self.request, '_search_recorded', False):
+            analytics.record_search(value)
+            if self.request is not None:
+                self.request._search_recorded = True
+        return queryset.filter(search_filter(value))
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .caching import review_version_key
+from .models import Review
+
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'PRODUCT_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Cached fragments are shared by every visitor, so forms inside them are
+# rendered with this placeholder and the real per-user CSRF token is
+# substituted when the page is assembled.
+CSRF_PLACEHOLDER = '__fragment_csrf_token__'
+
+
+def _rating_summaries(product_ids):
+    rows = Review.objects.filter(
+        product_id__in=product_ids
+    ).order_by().values('product_id').annotate(
+        average=Avg('rating'),
+        count=Count('id')
+    )
+    return {
+        row['product_id']: (row['average'], row['count'])
+        for row in rows
+    }
+
+
+def _render_cards(products):
+    ratings = _rating_summaries([product.id for product in products])
+    return {
+        product.id: render_to_string('products/_product_card.html', {
+            'product': product,
+            'average_rating': ratings.get(product.id, (None, 0))[0],
+            'review_count': ratings.get(product.id, (None, 0))[1],
+            'csrf_token': CSRF_PLACEHOLDER,
+        })
+        for product in products
+    }
+
+
+def _render_details(products):
+    ratings = _rating_summaries([product.id for product in products])
+    return {
+        product.id: render_to_string('products/_product_detail.html', {
+            'product': product,
+            'reviews': product.reviews.select_related('user')[:5],
+            'average_rating': ratings.get(product.id, (None, 0))[0],
+            'review_count': ratings.get(product.id, (None, 0))[1],
+            'csrf_token': CSRF_PLACEHOLDER,
+        })
+        for product in products
+    }
+
+
+RENDERERS = {
+    'card': _render_cards,
+    'detail': _render_details,
+}
+
+
+def fragment_key(kind, product):
+    return f'product_{kind}_{product.id}_{product.updated_at.timestamp()}'
+
+
+def render_product_fragments(request, specs):
+    """
+    Return the HTML fragment for each (kind, product) in `specs`, in order.
+
+    Fragments are keyed by product id and updated_at and remember the
+    review version they were rendered with, so every fragment on the page
+    and the current review versions come back in a single cache
+    multi-get. Only missing or stale fragments are rendered, one batch
+    per kind.
+    """
+    specs = list(specs)
+    if not specs:
+        return []
+
+    keys = [fragment_key(kind, product) for kind, product in specs]
+    version_keys = {product.id: review_version_key(product.id) for _, product in specs}
+    found = cache.get_many(keys + list(version_keys.values()))
+    versions = {
+        product_id: found.get(key, 0)
+        for product_id, key in version_keys.items()
+    }
+
+    fragments = {}
+    stale = {}
+    for (kind, product), key in zip(specs, keys):
+        entry = found.get(key)
+        if entry and entry[0] == versions[product.id]:
+            fragments[key] = entry[1]
+        else:
+            stale.setdefault(kind, {})[key] = product
+
+    updates = {}
+    for kind, products in stale.items():
+        rendered = RENDERERS[kind](list(products.values()))
+        for key, product in products.items():
+            fragments[key] = rendered[product.id]
+            updates[key] = (versions[product.id], rendered[product.id])
+    if updates:
+        cache.set_many(updates, timeout=FRAGMENT_CACHE_TIMEOUT)
+
+    csrf_token = get_token(request)
+    return [
+        mark_safe(fragments[key].replace(CSRF_PLACEHOLDER, csrf_token))
+        for key in keys
+    ]
+
+
+def render_product_cards(request, products):
+    """Card fragments for a list of products"""
+    return render_product_fragments(
+        request, [('card', product) for product in products]
+    )
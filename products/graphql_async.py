@@ -0,0 +1,90 @@
+import asyncio
+
+import graphene
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+from .graphql_connections import KeysetConnectionField
+from .loaders import get_loaders
+
+# Run root fields in separate worker threads, each with its own database
+# connection, so independent fields of one operation query in parallel.
+# Off, they take turns on the request's thread.
+GRAPHQL_CONCURRENT_RESOLVERS = getattr(settings, 'GRAPHQL_CONCURRENT_RESOLVERS', True)
+
+
+def selected_field_names(info):
+    """Names of every field selected below the current one, at any depth"""
+    names = set()
+    pending = [node.selection_set for node in info.field_nodes]
+    seen_fragments = set()
+    while pending:
+        selection_set = pending.pop()
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                names.add(selection.name.value)
+                pending.append(selection.selection_set)
+            elif isinstance(selection, InlineFragmentNode):
+                pending.append(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                if name not in seen_fragments and name in info.fragments:
+                    seen_fragments.add(name)
+                    pending.append(info.fragments[name].selection_set)
+    return names
+
+
+def run_sync(func, *args, **kwargs):
+    """
+    Call blocking `func` directly, or return an awaitable running it in a
+    worker thread when called from the event loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return func(*args, **kwargs)
+    concurrent = GRAPHQL_CONCURRENT_RESOLVERS
+
+    def call():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if concurrent:
+                # Worker threads are not covered by request_finished
+                close_old_connections()
+    return sync_to_async(call, thread_sensitive=not concurrent)()
+
+
+def in_worker_thread(resolve):
+    """
+    Make a synchronous root resolver awaitable.
+
+    The resolver runs off the event loop and then loads, in the same
+    thread, every batch loader the selection below it will read, so the
+    nested resolvers that run on the loop only hit loader caches.
+    """
+    def resolve_and_prefetch(root, info, **args):
+        result = resolve(root, info, **args)
+        get_loaders(info).prefetch(selected_field_names(info))
+        return result
+
+    async def resolver(root, info, **args):
+        return await run_sync(resolve_and_prefetch, root, info, **args)
+    return resolver
+
+
+class ThreadedResolverMixin:
+    def wrap_resolve(self, parent_resolver):
+        return in_worker_thread(super().wrap_resolve(parent_resolver))
+
+
+class ThreadedField(ThreadedResolverMixin, graphene.Field):
+    pass
+
+
+class ThreadedKeysetConnectionField(ThreadedResolverMixin, KeysetConnectionField):
+    pass
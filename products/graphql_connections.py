@@ -0,0 +1,152 @@
+import base64
+import json
+
+import graphene
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from graphene_django.filter import DjangoFilterConnectionField
+from graphql import GraphQLError
+
+from .loaders import get_loaders
+
+
+def count_rows(queryset, estimate=False):
+    """
+    Row count of a queryset. With `estimate` on PostgreSQL this is the
+    planner's estimate from EXPLAIN, which costs no table scan.
+    """
+    connection = connections[queryset.db]
+    if not estimate or connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CountableConnection(graphene.relay.Connection):
+    """Connection whose total is only counted when a client selects it"""
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int(
+        estimate=graphene.Boolean(default_value=False),
+        description='Number of matching nodes; pass estimate: true for a planner estimate.'
+    )
+
+    def resolve_total_count(self, info, estimate=False):
+        from .graphql_async import run_sync
+        return run_sync(count_rows, self.queryset, estimate)
+
+
+class KeysetConnectionField(DjangoFilterConnectionField):
+    """
+    Relay connection paginated with keyset predicates instead of OFFSET.
+
+    Nodes are sorted by the first field of the model's Meta.ordering, then
+    id. Cursors encode both, so `after:`/`before:` turn into an indexed
+    range condition and a page costs the same however deep it is. One row
+    past the page is fetched to tell whether another page follows. The
+    nodes of each page are registered with the request's batch loaders.
+    """
+
+    @property
+    def args(self):
+        args = super().args
+        args.pop('offset', None)
+        return args
+
+    @args.setter
+    def args(self, args):
+        self._base_args = args
+
+    @staticmethod
+    def keyset_ordering(model):
+        ordering = model._meta.ordering
+        return ordering[0] if ordering else 'pk'
+
+    @staticmethod
+    def encode_cursor(node, field):
+        value = getattr(node, field)
+        value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        payload = json.dumps([value, node.pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor, model, field):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return model._meta.get_field(field).to_python(value), int(pk)
+        except (TypeError, ValueError, ValidationError):
+            raise GraphQLError('Invalid cursor')
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        queryset = iterable
+        model = queryset.model
+        ordering = cls.keyset_ordering(model)
+        descending = ordering.startswith('-')
+        field = ordering.lstrip('-')
+
+        first, last = args.get('first'), args.get('last')
+        after, before = args.get('after'), args.get('before')
+        if first is not None and last is not None:
+            raise GraphQLError('Pass either first or last, not both')
+        backwards = last is not None or (before is not None and first is None)
+        limit = last if backwards else first
+        if limit is None:
+            limit = max_limit
+        if limit is None or limit < 0:
+            raise GraphQLError('first and last must not be negative')
+
+        page = queryset
+        for cursor, forward in ((after, True), (before, False)):
+            if cursor is None:
+                continue
+            value, pk = cls.decode_cursor(cursor, model, field)
+            # Rows after the cursor in the sort order, or before it
+            lookup = 'lt' if descending == forward else 'gt'
+            page = page.filter(
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{field: value, f'pk__{lookup}': pk})
+            )
+
+        order = ('-' if descending != backwards else '') + field
+        tiebreak = ('-' if descending != backwards else '') + 'pk'
+        rows = list(page.order_by(order, tiebreak)[:limit + 1])
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+
+        edges = [
+            connection.Edge(node=node, cursor=cls.encode_cursor(node, field))
+            for node in rows
+        ]
+        result = connection(
+            edges=edges,
+            page_info=graphene.relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=more if backwards else after is not None,
+                has_next_page=before is not None if backwards else more,
+            )
+        )
+        result.queryset = queryset
+        return result
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager,
+                            queryset_resolver, max_limit, enforce_first_or_last,
+                            root, info, **args):
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver,
+            max_limit, enforce_first_or_last, root, info, **args
+        )
+        get_loaders(info).register(edge.node for edge in result.edges)
+        return result
@@ -0,0 +1,184 @@
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    InlineFragmentNode,
+    IntValueNode,
+    OperationType,
+    VariableNode,
+    get_named_type,
+    get_nullable_type,
+    is_leaf_type,
+    is_list_type,
+)
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.shortcuts import get_user_by_token
+from graphql_jwt.utils import get_http_authorization
+
+# Budgets per kind of caller. Cost counts every object the query can
+# return, with connections multiplied by their page size.
+GRAPHQL_QUERY_BUDGETS = getattr(settings, 'GRAPHQL_QUERY_BUDGETS', {
+    'anonymous': {'max_cost': 1000, 'max_depth': 8},
+    'authenticated': {'max_cost': 5000, 'max_depth': 10},
+    'staff': {'max_cost': 20000, 'max_depth': 12},
+})
+# Assumed size of plain list fields, which have no page size argument
+GRAPHQL_LIST_SIZE_ESTIMATE = getattr(settings, 'GRAPHQL_LIST_SIZE_ESTIMATE', 10)
+
+
+class QueryTooComplex(GraphQLError):
+    def __init__(self, message, cost, depth):
+        super().__init__(message, extensions={
+            'code': 'QUERY_TOO_COMPLEX',
+            'cost': cost,
+            'depth': depth,
+        })
+
+
+def _is_connection(graphql_type):
+    fields = getattr(graphql_type, 'fields', None) or {}
+    return 'edges' in fields and 'pageInfo' in fields
+
+
+class CostAnalyzer:
+    """
+    Estimates the cost and depth of one operation from its document alone.
+
+    A leaf field costs nothing; an object field costs 1 plus the cost of
+    its selection, multiplied by `first`/`last` on connections (or the
+    relay max limit when neither is given) and by a fixed estimate on
+    plain lists. Introspection fields are not counted.
+    """
+
+    def __init__(self, schema, document, variables=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.defaults = {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+
+    def analyze(self, operation):
+        """(cost, depth) of an operation of the document"""
+        self.defaults = {
+            definition.variable.name.value: definition.default_value
+            for definition in operation.variable_definitions or ()
+        }
+        root = {
+            OperationType.QUERY: self.schema.query_type,
+            OperationType.MUTATION: self.schema.mutation_type,
+            OperationType.SUBSCRIPTION: self.schema.subscription_type,
+        }[operation.operation]
+        return self._selection_cost(root, operation.selection_set, set())
+
+    def _int_argument(self, field, name):
+        for argument in field.arguments or ():
+            if argument.name.value != name:
+                continue
+            value = argument.value
+            if isinstance(value, VariableNode):
+                variable = value.name.value
+                if variable in self.variables:
+                    value = self.variables[variable]
+                    return value if isinstance(value, int) else None
+                value = self.defaults.get(variable)
+            if isinstance(value, IntValueNode):
+                return int(value.value)
+        return None
+
+    def _page_size(self, field):
+        size = self._int_argument(field, 'first') or self._int_argument(field, 'last')
+        return max(size or graphene_settings.RELAY_CONNECTION_MAX_LIMIT, 0)
+
+    def _fields(self, parent_type, selection_set, visited):
+        """Field nodes of a selection set, with fragments expanded"""
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield parent_type, selection
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                yield from self._fields(fragment_type, selection.selection_set, visited)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                yield from self._fields(
+                    fragment_type, fragment.selection_set, visited | {name}
+                )
+
+    def _selection_cost(self, parent_type, selection_set, visited):
+        """(cost, depth) of a selection set"""
+        cost, depth = 0, 0
+        for owner, field in self._fields(parent_type, selection_set, visited):
+            name = field.name.value
+            definition = getattr(owner, 'fields', {}).get(name)
+            if name.startswith('__') or definition is None:
+                continue
+            field_type = get_named_type(definition.type)
+            if is_leaf_type(field_type) or field.selection_set is None:
+                depth = max(depth, 1)
+                continue
+            child_cost, child_depth = self._selection_cost(
+                field_type, field.selection_set, visited
+            )
+            if _is_connection(field_type):
+                size = self._page_size(field)
+            elif is_list_type(get_nullable_type(definition.type)) and not _is_connection(owner):
+                size = GRAPHQL_LIST_SIZE_ESTIMATE
+            else:
+                size = 1
+            cost += 1 + size * child_cost
+            depth = max(depth, child_depth + 1)
+        return cost, depth
+
+
+def resolve_user(request):
+    """The session user, or the user of a valid JWT sent with the request"""
+    user = request.user
+    if not user.is_authenticated:
+        token = get_http_authorization(request)
+        if token:
+            try:
+                user = get_user_by_token(token, request)
+            except JSONWebTokenError:
+                pass
+    return user
+
+
+def budget_for(request):
+    """The budget tier of the caller"""
+    user = resolve_user(request)
+    if user.is_authenticated and user.is_staff:
+        return GRAPHQL_QUERY_BUDGETS['staff']
+    if user.is_authenticated:
+        return GRAPHQL_QUERY_BUDGETS['authenticated']
+    return GRAPHQL_QUERY_BUDGETS['anonymous']
+
+
+def check_query_cost(request, schema, document, operation, variables):
+    """
+    Return {'cost', 'depth', 'maxCost'} for the operation, raising
+    QueryTooComplex if it exceeds the caller's budget.
+    """
+    cost, depth = CostAnalyzer(schema, document, variables).analyze(operation)
+    budget = budget_for(request)
+    if depth > budget['max_depth']:
+        raise QueryTooComplex(
+            f"Query depth {depth} exceeds the limit of {budget['max_depth']}",
+            cost, depth
+        )
+    if cost > budget['max_cost']:
+        raise QueryTooComplex(
+            f"Query cost {cost} exceeds the limit of {budget['max_cost']}",
+            cost, depth
+        )
+    return {'cost': cost, 'depth': depth, 'maxCost': budget['max_cost']}
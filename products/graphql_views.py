@@ -0,0 +1,347 @@
+import hashlib
+import json
+from inspect import isawaitable
+import logging
+from collections import OrderedDict, namedtuple
+from threading import Lock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    execute,
+    get_operation_ast,
+    parse,
+    validate,
+)
+
+from .caching import (
+    CATEGORY_VERSION_KEY,
+    PRODUCT_VERSION_KEY,
+    REVIEWS_VERSION_KEY,
+    get_versions,
+)
+from .graphql_cost import QueryTooComplex, check_query_cost, resolve_user
+
+logger = logging.getLogger(__name__)
+
+GRAPHQL_DOCUMENT_CACHE_SIZE = getattr(settings, 'GRAPHQL_DOCUMENT_CACHE_SIZE', 256)
+GRAPHQL_RESPONSE_CACHE_TIMEOUT = getattr(settings, 'GRAPHQL_RESPONSE_CACHE_TIMEOUT', 0)
+# Anyone can register documents, so they expire unless clients keep
+# using them: every hit extends a document's lifetime by this much.
+PERSISTED_QUERY_TIMEOUT = getattr(settings, 'PERSISTED_QUERY_TIMEOUT', 60 * 60 * 24 * 7)
+
+# Everything the schema exposes to anonymous users derives from these
+CATALOG_VERSION_KEYS = [PRODUCT_VERSION_KEY, CATEGORY_VERSION_KEY, REVIEWS_VERSION_KEY]
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def persisted_query_key(sha256_hash):
+    return f'graphql_persisted_{sha256_hash}'
+
+
+class DocumentCache:
+    """
+    Process-local LRU of parsed and validated documents, keyed by the
+    sha256 of the query text. Only documents that passed validation are
+    kept, so a hit skips both steps.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.documents = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            document = self.documents.get(key)
+            if document is not None:
+                self.documents.move_to_end(key)
+            return document
+
+    def set(self, key, document):
+        with self.lock:
+            self.documents[key] = document
+            self.documents.move_to_end(key)
+            while len(self.documents) > self.size:
+                self.documents.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.documents.clear()
+
+
+documents = DocumentCache(GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+PreparedOperation = namedtuple('PreparedOperation', 'document operation_ast response_key')
+
+
+class PersistedQueryGraphQLView(GraphQLView):
+    """
+    GraphQL endpoint with automatic persisted queries.
+
+    Clients send `extensions.persistedQuery.sha256Hash`, with or without the
+    query text. A hash the server has not seen yet answers
+    PersistedQueryNotFound and the client retries with the full query,
+    which is validated and then registered. Parsed documents are reused
+    across requests, and anonymous query results are cached per
+    (hash, operation, variables) until the catalog changes.
+
+    Every operation is costed against the caller's budget before it runs;
+    the estimate is returned under `extensions.cost`.
+    """
+
+    @staticmethod
+    def get_persisted_hash(request, data):
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                return None
+        if not isinstance(extensions, dict):
+            return None
+        persisted = extensions.get('persistedQuery')
+        if isinstance(persisted, dict) and persisted.get('sha256Hash'):
+            return str(persisted['sha256Hash'])
+        return None
+
+    def get_document(self, key, query):
+        """(document, errors) for a query, parsing and validating on a miss"""
+        document = documents.get(key)
+        if document is not None:
+            return document, None
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            return None, [e]
+        errors = validate(
+            self.schema.graphql_schema,
+            document,
+            self.validation_rules,
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if errors:
+            return None, errors
+        documents.set(key, document)
+        return document, None
+
+    def can_cache_response(self, request, operation_ast):
+        return bool(
+            GRAPHQL_RESPONSE_CACHE_TIMEOUT
+            and operation_ast is not None
+            and operation_ast.operation == OperationType.QUERY
+            and not request.META.get('HTTP_AUTHORIZATION')
+            and not request.user.is_authenticated
+        )
+
+    def response_cache_key(self, key, operation_name, variables):
+        fingerprint = json.dumps(
+            [key, operation_name, variables or {}, get_versions(CATALOG_VERSION_KEYS)],
+            sort_keys=True,
+            default=str
+        )
+        return f'graphql_response_{hashlib.md5(fingerprint.encode()).hexdigest()}'
+
+    def prepare_operation(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        """
+        Everything before execution: resolve a persisted query, reuse or
+        validate the document, check its cost and look up the response
+        cache. Returns a PreparedOperation, or the result to answer with
+        when there is nothing to execute.
+        """
+        persisted_hash = self.get_persisted_hash(request, data)
+        if persisted_hash:
+            if not query:
+                query = cache.get(persisted_query_key(persisted_hash))
+                if query is None:
+                    return ExecutionResult(errors=[GraphQLError(
+                        'PersistedQueryNotFound',
+                        extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'}
+                    )])
+                cache.touch(persisted_query_key(persisted_hash), PERSISTED_QUERY_TIMEOUT)
+            elif query_hash(query) != persisted_hash:
+                return ExecutionResult(errors=[GraphQLError(
+                    'provided sha does not match query',
+                    extensions={'code': 'PERSISTED_QUERY_HASH_MISMATCH'}
+                )])
+        if not query:
+            return super().execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+
+        key = persisted_hash or query_hash(query)
+        document, errors = self.get_document(key, query)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+        if persisted_hash:
+            cache.add(persisted_query_key(key), query, timeout=PERSISTED_QUERY_TIMEOUT)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if (
+            request.method.lower() == 'get'
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'],
+                f'Can only perform a {operation_ast.operation.value} operation from a POST request.'
+            ))
+
+        if operation_ast is not None:
+            try:
+                request._graphql_cost = check_query_cost(
+                    request, self.schema.graphql_schema, document, operation_ast, variables
+                )
+            except QueryTooComplex as e:
+                return ExecutionResult(errors=[e])
+
+        response_key = None
+        if self.can_cache_response(request, operation_ast):
+            response_key = self.response_cache_key(key, operation_name, variables)
+            cached = cache.get(response_key)
+            if cached is not None:
+                return ExecutionResult(data=cached)
+        return PreparedOperation(document, operation_ast, response_key)
+
+    def cache_response(self, prepared, result):
+        if prepared.response_key and not result.errors:
+            cache.set(prepared.response_key, result.data, timeout=GRAPHQL_RESPONSE_CACHE_TIMEOUT)
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        prepared = self.prepare_operation(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+        result = self.execute_document(
+            request, prepared.document, prepared.operation_ast, variables, operation_name
+        )
+        self.cache_response(prepared, result)
+        return result
+
+    def json_encode(self, request, d, pretty=False):
+        cost = getattr(request, '_graphql_cost', None)
+        if cost is not None:
+            d = {**d, 'extensions': {'cost': cost}}
+        return super().json_encode(request, d, pretty=pretty)
+
+    def execute_document(self, request, document, operation_ast, variables, operation_name):
+        execute_options = {
+            'root_value': self.get_root_value(request),
+            'context_value': self.get_context(request),
+            'variable_values': variables,
+            'operation_name': operation_name,
+            'middleware': self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options['execution_context_class'] = self.execution_context_class
+        try:
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and graphene_settings.ATOMIC_MUTATIONS is True
+            ):
+                with transaction.atomic():
+                    result = execute(self.schema.graphql_schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+            return execute(self.schema.graphql_schema, document, **execute_options)
+        except Exception as e:
+            logger.exception("GraphQL execution failed")
+            return ExecutionResult(errors=[e])
+
+
+class AsyncGraphQLView(PersistedQueryGraphQLView):
+    """
+    The GraphQL endpoint as a native async view, for the ASGI server.
+
+    Persisted queries, the document cache, cost checks and the response
+    cache work as in the sync view. Queries execute on the event loop
+    against a schema whose root fields await their resolvers in worker
+    threads, so independent root fields run at the same time; mutations
+    run in a thread through the sync path.
+    """
+
+    view_is_async = True
+
+    def get_middleware(self, request):
+        # The caller is resolved before execution, off the event loop
+        return None
+
+    def prepare_async(self, request, data, query, variables, operation_name):
+        request.user = resolve_user(request)
+        return self.prepare_operation(request, data, query, variables, operation_name)
+
+    async def execute_graphql_request_async(self, request, data, query, variables, operation_name):
+        prepared = await sync_to_async(self.prepare_async)(
+            request, data, query, variables, operation_name
+        )
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+
+        operation_ast = prepared.operation_ast
+        if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+            result = await sync_to_async(self.execute_document)(
+                request, prepared.document, operation_ast, variables, operation_name
+            )
+        else:
+            try:
+                result = execute(
+                    self.schema.graphql_schema,
+                    prepared.document,
+                    root_value=self.get_root_value(request),
+                    context_value=self.get_context(request),
+                    variable_values=variables,
+                    operation_name=operation_name,
+                )
+                if isawaitable(result):
+                    result = await result
+            except Exception as e:
+                logger.exception("GraphQL execution failed")
+                result = ExecutionResult(errors=[e])
+        await sync_to_async(self.cache_response)(prepared, result)
+        return result
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ('get', 'post'):
+                raise HttpError(HttpResponseNotAllowed(
+                    ['GET', 'POST'], 'GraphQL only supports GET and POST requests.'
+                ))
+            data = self.parse_body(request)
+            query, variables, operation_name, _ = self.get_graphql_params(request, data)
+            request._graphql_result = await self.execute_graphql_request_async(
+                request, data, query, variables, operation_name
+            )
+            result, status_code = self.get_response(request, data)
+            return HttpResponse(
+                status=status_code, content=result, content_type='application/json'
+            )
+        except HttpError as e:
+            response = e.response
+            response['Content-Type'] = 'application/json'
+            response.content = self.json_encode(request, {'errors': [self.format_error(e)]})
+            return response
+
+    def execute_graphql_request(self, request, *args, **kwargs):
+        # get_response() formats the result dispatch() already computed
+        return request._graphql_result
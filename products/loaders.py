@@ -0,0 +1,164 @@
+from collections import defaultdict
+from threading import Lock, RLock
+
+from django.db.models import Avg, Count
+
+from .models import Category, Product, ProductImage, Review
+
+
+class BatchLoader:
+    """
+    Request-scoped loader for synchronous resolvers.
+
+    Parent resolvers `register` the keys of every object they hand out, so
+    the first `load` at the next level fetches the whole sibling set with
+    one call to `batch_fn` (keys -> {key: value}). Keys that were never
+    registered are still loaded, just on their own. Results are memoised
+    for the rest of the request.
+
+    Root fields of the async endpoint resolve in parallel threads that
+    share the request's loaders, hence the lock.
+    """
+
+    def __init__(self, batch_fn, default=None):
+        self.batch_fn = batch_fn
+        self.default = default
+        self.cache = {}
+        self.pending = set()
+        self.lock = RLock()
+
+    def register(self, keys):
+        with self.lock:
+            self.pending.update(key for key in keys if key not in self.cache)
+
+    def prime(self, key, value):
+        with self.lock:
+            self.cache[key] = value
+            self.pending.discard(key)
+
+    def flush(self, extra=()):
+        """Fetch every registered key that has not been loaded yet"""
+        with self.lock:
+            keys, self.pending = self.pending | set(extra), set()
+            keys.difference_update(self.cache)
+            if not keys:
+                return
+            found = self.batch_fn(keys)
+            for key in keys:
+                self.cache[key] = found.get(key, self.default)
+
+    def load(self, key):
+        if key is None:
+            return self.default
+        with self.lock:
+            if key not in self.cache:
+                self.flush([key])
+            return self.cache[key]
+
+
+class Loaders:
+    """The batch loaders of one GraphQL request"""
+
+    # Loaders behind each schema field, in dependency order: loading
+    # products registers their own relations.
+    FIELD_LOADERS = (
+        ('product', {'product'}),
+        ('category', {'category'}),
+        ('product_images', {'images'}),
+        ('rating_summary', {'averageRating', 'reviewCount'}),
+    )
+
+    def __init__(self):
+        self.category = BatchLoader(self._categories)
+        self.product = BatchLoader(self._products)
+        self.product_images = BatchLoader(self._product_images, default=())
+        self.rating_summary = BatchLoader(self._rating_summaries, default=(0, 0))
+
+    def _categories(self, ids):
+        return Category.objects.in_bulk(ids)
+
+    def _products(self, ids):
+        products = Product.objects.in_bulk(ids)
+        self.register_products(products.values())
+        return products
+
+    def _product_images(self, product_ids):
+        images = defaultdict(list)
+        for image in ProductImage.objects.filter(product_id__in=product_ids):
+            images[image.product_id].append(image)
+        return images
+
+    def _rating_summaries(self, product_ids):
+        rows = Review.objects.filter(
+            product_id__in=product_ids
+        ).order_by().values('product_id').annotate(
+            average=Avg('rating'),
+            count=Count('id')
+        )
+        return {
+            row['product_id']: (row['average'], row['count'])
+            for row in rows
+        }
+
+    def register_products(self, products):
+        product_ids = []
+        category_ids = []
+        for product in products:
+            product_ids.append(product.id)
+            # Reuse a category that was already fetched with select_related
+            cached = product._state.fields_cache.get('category')
+            if cached is not None:
+                self.category.prime(cached.id, cached)
+            else:
+                category_ids.append(product.category_id)
+        self.product_images.register(product_ids)
+        self.rating_summary.register(product_ids)
+        self.category.register(key for key in category_ids if key is not None)
+
+    def register_reviews(self, reviews):
+        product_ids = []
+        for review in reviews:
+            cached = review._state.fields_cache.get('product')
+            if cached is not None:
+                self.product.prime(cached.id, cached)
+                self.register_products([cached])
+            else:
+                product_ids.append(review.product_id)
+        self.product.register(product_ids)
+
+    def prefetch(self, field_names):
+        """Load every registered key of the loaders behind `field_names`"""
+        for name, fields in self.FIELD_LOADERS:
+            if fields & field_names:
+                getattr(self, name).flush()
+
+    def register(self, objects):
+        """Register the relations of a list of resolved nodes"""
+        objects = list(objects)
+        if not objects:
+            return
+        if isinstance(objects[0], Product):
+            self.register_products(objects)
+        elif isinstance(objects[0], Review):
+            self.register_reviews(objects)
+
+
+_attach_lock = Lock()
+
+
+def get_loaders(info):
+    """
+    The loaders attached to the request behind `info.context`. Without a
+    context (direct schema.execute calls) every resolver gets fresh ones.
+    """
+    context = info.context
+    if context is None:
+        return Loaders()
+    loaders = getattr(context, '_graphql_loaders', None)
+    if loaders is None:
+        with _attach_lock:
+            loaders = getattr(context, '_graphql_loaders', None)
+            if loaders is None:
+                loaders = Loaders()
+                context._graphql_loaders = loaders
+    return loaders
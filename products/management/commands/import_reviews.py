@@ -0,0 +1,72 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from products import review_ingest
+from products.serializers import ReviewIngestRowSerializer
+
+
+class Command(BaseCommand):
+    help = 'Bulk import reviews from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV with a header row, or .jsonl with one object per line '
+                 '(fields: product, user, rating, comment, created_at)'
+        )
+        parser.add_argument(
+            '--on-conflict',
+            choices=review_ingest.ON_CONFLICT_CHOICES,
+            default=review_ingest.ON_CONFLICT_SKIP,
+            help='Skip or overwrite reviews that already exist for a product and user'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=review_ingest.REVIEW_INGEST_BATCH_SIZE,
+            help='Reviews written per batch'
+        )
+
+    def _read(self, source):
+        if self.path.endswith('.jsonl'):
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(source)
+
+    def _valid_rows(self, source):
+        """Validate rows as they stream in, reporting and skipping bad ones"""
+        for number, row in enumerate(self._read(source), start=1):
+            serializer = ReviewIngestRowSerializer(data=row)
+            if serializer.is_valid():
+                yield serializer.validated_data
+            else:
+                self.invalid += 1
+                self.stderr.write(f"Row {number}: {dict(serializer.errors)}")
+
+    def handle(self, *args, **options):
+        self.path = options['path']
+        self.invalid = 0
+        try:
+            source = open(self.path, encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f"Cannot read {self.path}: {e}")
+
+        with source:
+            result = review_ingest.ingest_reviews(
+                self._valid_rows(source),
+                on_conflict=options['on_conflict'],
+                batch_size=options['batch_size']
+            )
+
+        for missing in result['missing']:
+            self.stderr.write(
+                f"Skipped review by {missing['user']} for {missing['product']}: {missing['reason']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} created, {result['updated']} updated, "
+            f"{result['skipped']} skipped, {len(result['missing'])} unresolved, "
+            f"{self.invalid} invalid"
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:25
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('previous_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='products.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Price history',
+                'ordering': ['recorded_at'],
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['recorded_at'], name='price_history_brin_idx'), models.Index(fields=['product', 'recorded_at'], name='price_history_product_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:36
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_subscriptions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryTrend',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='products.category')),
+                ('score', models.FloatField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductTrend',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='products.product')),
+                ('score', models.FloatField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchQueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255)),
+                ('hour', models.DateTimeField()),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('zero_results', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['hour'],
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['hour'], name='search_query_stat_brin_idx')],
+                'constraints': [models.UniqueConstraint(fields=('query', 'hour'), name='unique_search_query_hour')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductViewStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='view_stats', to='products.product')),
+            ],
+            options={
+                'ordering': ['hour'],
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['hour'], name='product_view_stat_brin_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'hour'), name='unique_product_view_hour')],
+            },
+        ),
+    ]
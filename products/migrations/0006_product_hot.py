@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_review_rating_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='hot',
+            field=models.BooleanField(default=False, verbose_name='Hot Product'),
+        ),
+    ]
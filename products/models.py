@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import BrinIndex
 from django.utils.text import slugify
 from django.conf import settings
 from django.core.validators import MinValueValidator
@@ -10,8 +11,11 @@ from rest_framework import viewsets
 from rest_framework.response import Response
 from django.core.exceptions import ValidationError
 from django.db.models import Avg, Count
-from django.db.models.signals import pre_save
+from decimal import Decimal
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from .caching import bump_category_version, bump_product_version, bump_review_versions
 
 User = get_user_model()
 
@@ -62,6 +66,105 @@ class Category(models.Model):
         ]
 
 
+class ProductQuerySet(models.QuerySet):
+    """
+    Keeps the price history complete for bulk writes, which bypass
+    Product.save() and the post_save signal.
+
+    Bulk writes also stamp updated_at like save() does, since cached
+    product fragments and feed rows are keyed on it, and bump the product
+    version that cached GraphQL responses depend on. Stock-only writes
+    (checkout, restock(), reconcile) are hot and only get the stamp.
+    """
+
+    STOCK_FIELDS = {'stock', 'updated_at'}
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        if set(kwargs) <= self.STOCK_FIELDS:
+            return super().update(**kwargs)
+        rows = self._update_with_history(**kwargs)
+        bump_product_version()
+        return rows
+
+    def _update_with_history(self, **kwargs):
+        if 'price' not in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            # Locked until the update commits, so a concurrent writer cannot
+            # change a price between the snapshot and the update
+            before = {
+                product_id: (price, stock)
+                for product_id, price, stock in self.select_for_update().order_by(
+                    'pk'
+                ).values_list('id', 'price', 'stock')
+            }
+            rows = super().update(**kwargs)
+            after = self.model.objects.filter(
+                id__in=before
+            ).values_list('id', 'price', 'stock')
+            changes = [
+                (product_id, *before[product_id], price, stock)
+                for product_id, price, stock in after
+            ]
+            PriceHistory.record_changes(
+                (product_id, old_price, price)
+                for product_id, old_price, _, price, _ in changes
+            )
+            for product_id, old_price, old_stock, price, stock in changes:
+                queue_subscription_events(product_id, old_price, price, old_stock, stock)
+        return rows
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        if 'updated_at' not in fields:
+            now = timezone.now()
+            for obj in objs:
+                obj.updated_at = now
+            fields = [*fields, 'updated_at']
+        if set(fields) <= self.STOCK_FIELDS:
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        rows = self._bulk_update_with_history(objs, fields, batch_size)
+        bump_product_version()
+        return rows
+
+    def _bulk_update_with_history(self, objs, fields, batch_size):
+        if 'price' not in fields:
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        with transaction.atomic(using=self.db):
+            before = {
+                product_id: (price, stock)
+                for product_id, price, stock in self.model.objects.select_for_update().filter(
+                    id__in=[obj.pk for obj in objs]
+                ).order_by('pk').values_list('id', 'price', 'stock')
+            }
+            rows = super().bulk_update(objs, fields, batch_size=batch_size)
+            PriceHistory.record_changes(
+                (obj.pk, before[obj.pk][0], obj.price)
+                for obj in objs if obj.pk in before
+            )
+            for obj in objs:
+                if obj.pk not in before:
+                    continue
+                old_price, old_stock = before[obj.pk]
+                new_stock = obj.stock if 'stock' in fields else old_stock
+                queue_subscription_events(
+                    obj.pk, old_price, obj.price, old_stock, new_stock
+                )
+                obj._loaded_price = obj.price
+                obj._loaded_stock = new_stock
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            PriceHistory.record_changes(
+                (obj.pk, None, obj.price) for obj in objs if obj.pk
+            )
+        bump_product_version()
+        return objs
+
+
 class Product(models.Model):
     name = models.CharField(max_length=200, db_index=True)
     description = models.TextField()
@@ -95,6 +198,21 @@ class Product(models.Model):
 
     slug = models.SlugField(max_length=200, unique=True, blank=True, db_index=True)
     featured = models.BooleanField(default=False, verbose_name="Featured Product")
+    # Flash-sale mode: checkout reserves stock from a shared counter instead
+    # of writing this row (see products.stock)
+    hot = models.BooleanField(default=False, verbose_name="Hot Product")
+
+    objects = ProductQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored price and stock so saves can tell what changed
+        if 'price' in field_names:
+            instance._loaded_price = instance.price
+        if 'stock' in field_names:
+            instance._loaded_stock = instance.stock
+        return instance
 
     def clean(self):
         """Validate the product before saving"""
@@ -201,6 +319,11 @@ class Review(models.Model):
         indexes = [
             Index(fields=['product', 'created_at']),
             Index(fields=['product', 'rating']),
+            # Rating-sorted keyset pages: (rating, created_at, id) per product
+            Index(
+                fields=['product', 'rating', 'created_at', 'id'],
+                name='review_product_rating_idx'
+            ),
             Index(fields=['user', 'created_at']),
             Index(
                 fields=['rating'],
@@ -216,6 +339,222 @@ class Review(models.Model):
         ]
 
 
+class PriceHistory(models.Model):
+    """
+    Append-only record of every price a product has had.
+
+    Rows are only ever inserted in recorded_at order, so the table is
+    physically laid out by time and a BRIN index on recorded_at keeps
+    catalogue-wide range scans cheap at a fraction of a B-tree's size.
+    Per-product series use the (product, recorded_at) index.
+    """
+    product = models.ForeignKey(
+        Product,
+        related_name='price_history',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    previous_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True
+    )
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ['recorded_at']
+        verbose_name_plural = 'Price history'
+        indexes = [
+            BrinIndex(fields=['recorded_at'], name='price_history_brin_idx'),
+            Index(fields=['product', 'recorded_at'], name='price_history_product_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValidationError('Price history entries cannot be changed')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.price} at {self.recorded_at:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def record_changes(cls, changes):
+        """Insert one row per (product_id, old_price, new_price) that differs"""
+        now = timezone.now()
+        entries = [
+            cls(
+                product_id=product_id,
+                price=new_price,
+                previous_price=old_price,
+                recorded_at=now
+            )
+            for product_id, old_price, new_price in changes
+            if old_price is None or Decimal(str(old_price)) != Decimal(str(new_price))
+        ]
+        if entries:
+            cls.objects.bulk_create(entries, batch_size=1000)
+        return len(entries)
+
+
+class ProductSubscription(models.Model):
+    """
+    A customer's request to hear about a price drop or a restock.
+
+    Price-drop subscriptions always carry a target price, so the
+    subscribers to notify for a new price are a single range scan of
+    the partial (product, kind, target_price) index:
+    target_price >= new price. Restock subscriptions match on
+    (product, kind) alone. Subscriptions are one-shot and deactivate
+    once notified.
+    """
+    class Kind(models.TextChoices):
+        PRICE_DROP = 'PRICE_DROP', 'Price drop'
+        RESTOCK = 'RESTOCK', 'Back in stock'
+
+    user = models.ForeignKey(
+        User,
+        related_name='product_subscriptions',
+        on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(
+        Product,
+        related_name='subscriptions',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    target_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            Index(
+                fields=['product', 'kind', 'target_price'],
+                name='active_subscription_match_idx',
+                condition=Q(is_active=True)
+            ),
+        ]
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'product', 'kind'],
+                name='unique_user_product_subscription'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} alert for {self.product_id} ({self.user_id})"
+
+    @classmethod
+    def matching(cls, product_id, kind, price=None):
+        """Active subscriptions triggered by a price drop to `price` or a restock"""
+        subscriptions = cls.objects.filter(
+            product_id=product_id,
+            kind=kind,
+            is_active=True
+        )
+        if kind == cls.Kind.PRICE_DROP:
+            subscriptions = subscriptions.filter(target_price__gte=price)
+        return subscriptions
+
+
+class ProductViewStat(models.Model):
+    """Hourly product view counts, flushed in batches from the analytics buffers"""
+    product = models.ForeignKey(
+        Product,
+        related_name='view_stats',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['hour']
+        indexes = [
+            BrinIndex(fields=['hour'], name='product_view_stat_brin_idx'),
+        ]
+        constraints = [
+            UniqueConstraint(
+                fields=['product', 'hour'],
+                name='unique_product_view_hour'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.views} views at {self.hour:%Y-%m-%d %H:00}"
+
+
+class SearchQueryStat(models.Model):
+    """Hourly counts per normalised search query"""
+    query = models.CharField(max_length=255)
+    hour = models.DateTimeField()
+    searches = models.PositiveIntegerField(default=0)
+    # Searches that matched no products when the batch was flushed
+    zero_results = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['hour']
+        indexes = [
+            BrinIndex(fields=['hour'], name='search_query_stat_brin_idx'),
+        ]
+        constraints = [
+            UniqueConstraint(
+                fields=['query', 'hour'],
+                name='unique_search_query_hour'
+            ),
+        ]
+
+    def __str__(self):
+        return f"'{self.query}': {self.searches} searches at {self.hour:%Y-%m-%d %H:00}"
+
+
+class ProductTrend(models.Model):
+    """
+    Time-decayed popularity of a product.
+
+    `score` is log2 of the views weighted by 2^(t / half-life), so newer
+    views count exponentially more and the ranking never has to be
+    recomputed as time passes; see products.analytics.
+    """
+    product = models.OneToOneField(
+        Product,
+        related_name='trend',
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    score = models.FloatField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trend for {self.product_id}"
+
+
+class CategoryTrend(models.Model):
+    """Time-decayed popularity of a category, scored like ProductTrend"""
+    category = models.OneToOneField(
+        Category,
+        related_name='trend',
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    score = models.FloatField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trend for {self.category_id}"
+
+
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     def list(self, request, *args, **kwargs):
         cache_key = 'all_categories'
@@ -265,3 +604,66 @@ def product_pre_save(sender, instance, **kwargs):
         while Product.objects.filter(slug=instance.slug).exclude(id=instance.id).exists():
             instance.slug = f"{base_slug}-{counter}"
             counter += 1
+
+
+def queue_subscription_events(product_id, old_price, new_price, old_stock, new_stock):
+    """
+    Schedule subscriber fan-out for a price drop or restock once the
+    triggering transaction commits, so the write itself never waits on it.
+    """
+    from .tasks import enqueue_product_event
+
+    if old_price is not None and Decimal(str(new_price)) < Decimal(str(old_price)):
+        transaction.on_commit(lambda: enqueue_product_event(
+            product_id, ProductSubscription.Kind.PRICE_DROP, str(new_price)
+        ))
+    if old_stock == 0 and new_stock and new_stock > 0:
+        transaction.on_commit(lambda: enqueue_product_event(
+            product_id, ProductSubscription.Kind.RESTOCK
+        ))
+
+
+@receiver(post_save, sender=Product)
+def product_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """Record price history and queue subscriber notifications"""
+    previous_price = None if created else getattr(instance, '_loaded_price', None)
+    if update_fields is None or 'price' in update_fields:
+        if previous_price is None and not created:
+            # Instance was not loaded from the database; compare with the last entry
+            previous_price = instance.price_history.order_by(
+                '-recorded_at'
+            ).values_list('price', flat=True).first()
+        PriceHistory.record_changes([(instance.pk, previous_price, instance.price)])
+    if not created:
+        queue_subscription_events(
+            instance.pk,
+            previous_price,
+            instance.price,
+            getattr(instance, '_loaded_stock', None),
+            instance.stock
+        )
+    instance._loaded_price = instance.price
+    instance._loaded_stock = instance.stock
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_changed(sender, instance, **kwargs):
+    """Invalidate cached responses that embed product data"""
+    bump_product_version()
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    """Invalidate cached rating aggregates for the reviewed product"""
+    bump_review_versions([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """Invalidate validators of responses that embed category data"""
+    bump_category_version()
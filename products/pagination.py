@@ -0,0 +1,176 @@
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError as DRFValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _ordering_fields(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def encode_cursor(obj, ordering):
+    """Opaque cursor holding the sort key values of the last row on a page"""
+    values = []
+    for name, _ in _ordering_fields(ordering):
+        value = getattr(obj, name)
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, model, ordering):
+    """Turn a cursor back into typed sort key values, raising InvalidCursor"""
+    fields = _ordering_fields(ordering)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Invalid cursor')
+
+    decoded = []
+    for (name, _), value in zip(fields, values):
+        try:
+            decoded.append(model._meta.get_field(name).to_python(value))
+        except FieldDoesNotExist:
+            decoded.append(value)
+        except ValidationError:
+            raise InvalidCursor('Invalid cursor')
+    return decoded
+
+
+def keyset_filter(ordering, values):
+    """
+    Build the "rows after this position" predicate for a multi-column
+    ordering, e.g. for ('-created_at', '-id'):
+    created_at < c OR (created_at = c AND id < i)
+    """
+    clauses = []
+    fields = _ordering_fields(ordering)
+    for position, (name, descending) in enumerate(fields):
+        equal = {
+            previous: values[index]
+            for index, (previous, _) in enumerate(fields[:position])
+        }
+        lookup = f"{name}__{'lt' if descending else 'gt'}"
+        clauses.append(Q(**equal, **{lookup: values[position]}))
+    return reduce(lambda left, right: left | right, clauses)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=20):
+    """
+    Return (items, next_cursor) for one page of `queryset` sorted by
+    `ordering`, which must end in a unique column such as '-id'.
+
+    Reads page_size + 1 rows to learn whether another page exists, so no
+    COUNT(*) or OFFSET is ever issued.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(keyset_filter(ordering, values))
+
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    return items, encode_cursor(items[-1], ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination over paginate_keyset: forward-only cursors with no
+    COUNT(*) and no OFFSET, so deep pages cost the same as the first.
+
+    Subclasses list the sort orders they allow by name; each must end in
+    a unique column and be backed by an index.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    sort_query_param = 'sort'
+    orderings = {'newest': ('-id',)}
+    default_ordering = 'newest'
+
+    def get_ordering(self, request):
+        name = request.query_params.get(self.sort_query_param, self.default_ordering)
+        if name not in self.orderings:
+            raise DRFValidationError({
+                self.sort_query_param: f"Choose one of: {', '.join(self.orderings)}"
+            })
+        return self.orderings[name]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            items, self.next_cursor = paginate_keyset(
+                queryset,
+                self.get_ordering(request),
+                cursor=request.query_params.get(self.cursor_query_param),
+                page_size=self.get_page_size(request)
+            )
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return items
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor from the previous page',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.sort_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f"Sort order (default: {self.default_ordering})",
+                'schema': {'type': 'string', 'enum': list(self.orderings)},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f"Results per page (max: {self.max_page_size})",
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.utils.crypto import get_random_string
+
+from .models import Product
+
+RECENTLY_VIEWED_LIMIT = getattr(settings, 'RECENTLY_VIEWED_LIMIT', 12)
+RECENTLY_VIEWED_TIMEOUT = getattr(settings, 'RECENTLY_VIEWED_TIMEOUT', 60 * 60 * 24 * 30)
+
+# Anonymous visitors are identified by a random cookie instead of the
+# session: creating a session on every first page view is a database
+# write, and login rotates the session key before the list can be merged.
+VISITOR_COOKIE = 'recently_viewed'
+VISITOR_TOKEN_LENGTH = 32
+
+
+def _visitor_token(request):
+    token = request.COOKIES.get(VISITOR_COOKIE, '')
+    if len(token) == VISITOR_TOKEN_LENGTH and token.isalnum():
+        return token
+    return None
+
+
+def _visitor_key(token):
+    return f'recently_viewed_visitor_{token}'
+
+
+def _user_key(user_id):
+    return f'recently_viewed_user_{user_id}'
+
+
+def _owner_key(request):
+    if request.user.is_authenticated:
+        return _user_key(request.user.pk)
+    token = _visitor_token(request)
+    return _visitor_key(token) if token else None
+
+
+def _combine(*id_lists):
+    """Most recent first, without duplicates, capped"""
+    return list(dict.fromkeys(
+        product_id for ids in id_lists for product_id in ids
+    ))[:RECENTLY_VIEWED_LIMIT]
+
+
+def merge_visitor_history(request, user):
+    """Fold the anonymous visitor's list into the user's, newest first"""
+    token = _visitor_token(request)
+    if not token:
+        return
+    visitor_ids = cache.get(_visitor_key(token))
+    if not visitor_ids:
+        return
+    user_key = _user_key(user.pk)
+    cache.set(
+        user_key,
+        _combine(visitor_ids, cache.get(user_key, [])),
+        timeout=RECENTLY_VIEWED_TIMEOUT
+    )
+    cache.delete(_visitor_key(token))
+
+
+@receiver(user_logged_in)
+def merge_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        merge_visitor_history(request, user)
+
+
+def get_recently_viewed_ids(request):
+    key = _owner_key(request)
+    if key is None:
+        return []
+    if request.user.is_authenticated:
+        # Token-authenticated clients never pass through login()
+        merge_visitor_history(request, request.user)
+    return cache.get(key, [])
+
+
+def get_recently_viewed(request, exclude=None):
+    """Recently viewed products, newest first, hydrated with one query"""
+    ids = [
+        product_id for product_id in get_recently_viewed_ids(request)
+        if product_id != exclude
+    ]
+    if not ids:
+        return []
+    products = Product.objects.select_related('category').in_bulk(ids)
+    return [products[product_id] for product_id in ids if product_id in products]
+
+
+def remember_view(request, response, product_id):
+    """
+    Move `product_id` to the front of the viewer's list.
+
+    Costs one cache read and one write; the response carries the visitor
+    cookie for anonymous users and drops it once they are signed in.
+    """
+    if request.user.is_authenticated:
+        key = _user_key(request.user.pk)
+        if VISITOR_COOKIE in request.COOKIES:
+            merge_visitor_history(request, request.user)
+            response.delete_cookie(VISITOR_COOKIE)
+    else:
+        token = _visitor_token(request) or get_random_string(VISITOR_TOKEN_LENGTH)
+        key = _visitor_key(token)
+        response.set_cookie(
+            VISITOR_COOKIE,
+            token,
+            max_age=RECENTLY_VIEWED_TIMEOUT,
+            httponly=True,
+            samesite='Lax'
+        )
+    cache.set(
+        key,
+        _combine([product_id], cache.get(key, [])),
+        timeout=RECENTLY_VIEWED_TIMEOUT
+    )
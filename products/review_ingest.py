@@ -0,0 +1,192 @@
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .caching import bump_review_versions
+from .models import Product, Review
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+REVIEW_INGEST_BATCH_SIZE = getattr(settings, 'REVIEW_INGEST_BATCH_SIZE', 1000)
+PRODUCT_STATS_TIMEOUT = 3600
+
+ON_CONFLICT_SKIP = 'skip'
+ON_CONFLICT_UPDATE = 'update'
+ON_CONFLICT_CHOICES = (ON_CONFLICT_SKIP, ON_CONFLICT_UPDATE)
+
+
+def product_stats_key(slug):
+    return f'product_stats_{slug}'
+
+
+def review_stats(product_ids):
+    """Review count, average and distribution per product id, from one grouped query"""
+    stats = {
+        product_id: {'review_count': 0, 'average_rating': 0, 'rating_distribution': []}
+        for product_id in product_ids
+    }
+    rows = Review.objects.filter(
+        product_id__in=product_ids
+    ).order_by('product_id', 'rating').values('product_id', 'rating').annotate(
+        count=Count('id')
+    )
+    rating_sums = defaultdict(int)
+    for row in rows:
+        entry = stats[row['product_id']]
+        entry['review_count'] += row['count']
+        entry['rating_distribution'].append({'rating': row['rating'], 'count': row['count']})
+        rating_sums[row['product_id']] += row['rating'] * row['count']
+    for product_id, entry in stats.items():
+        if entry['review_count']:
+            entry['average_rating'] = rating_sums[product_id] / entry['review_count']
+    return stats
+
+
+def refresh_review_aggregates(products):
+    """
+    Recompute the cached rating stats of `products` ({id: slug}) and bump
+    their review versions, once for the whole set.
+    """
+    if not products:
+        return
+    stats = review_stats(list(products))
+    cache.set_many(
+        {product_stats_key(slug): stats[product_id] for product_id, slug in products.items()},
+        timeout=PRODUCT_STATS_TIMEOUT
+    )
+    bump_review_versions(products)
+
+
+def _ingest_batch(rows, on_conflict):
+    result = {'created': 0, 'updated': 0, 'skipped': 0, 'missing': []}
+
+    products = {
+        product.slug: product
+        for product in Product.objects.filter(
+            slug__in={row['product'] for row in rows}
+        ).only('id', 'slug')
+    }
+    users = dict(
+        User.objects.filter(
+            email__in={row['user'] for row in rows}
+        ).values_list('email', 'id')
+    )
+
+    # Later rows win when the same (product, user) pair repeats in a batch
+    reviews = {}
+    for row in rows:
+        product, user_id = products.get(row['product']), users.get(row['user'])
+        if product is None or user_id is None:
+            result['missing'].append({
+                'product': row['product'],
+                'user': row['user'],
+                'reason': 'unknown product' if product is None else 'unknown user',
+            })
+            continue
+        reviews[(product.id, user_id)] = Review(
+            product_id=product.id,
+            user_id=user_id,
+            rating=row['rating'],
+            comment=row.get('comment', '')
+        ), row.get('created_at')
+    if not reviews:
+        return result, {}
+
+    existing = set(
+        Review.objects.filter(
+            product_id__in={product_id for product_id, _ in reviews},
+            user_id__in={user_id for _, user_id in reviews}
+        ).values_list('product_id', 'user_id')
+    )
+    existing &= set(reviews)
+
+    if on_conflict == ON_CONFLICT_SKIP:
+        to_write = {key: value for key, value in reviews.items() if key not in existing}
+        Review.objects.bulk_create(
+            [review for review, _ in to_write.values()],
+            ignore_conflicts=True
+        )
+        result['skipped'] = len(existing)
+    else:
+        to_write = reviews
+        Review.objects.bulk_create(
+            [review for review, _ in to_write.values()],
+            update_conflicts=True,
+            unique_fields=['product', 'user'],
+            update_fields=['rating', 'comment']
+        )
+        result['updated'] = len(existing)
+    result['created'] = len(to_write) - result['updated']
+
+    # created_at is auto_now_add, so imported timestamps are applied afterwards
+    dated = {key: created_at for key, (_, created_at) in to_write.items() if created_at}
+    if dated:
+        written = Review.objects.filter(
+            product_id__in={product_id for product_id, _ in dated},
+            user_id__in={user_id for _, user_id in dated}
+        ).only('id', 'product_id', 'user_id')
+        stamped = []
+        for review in written:
+            created_at = dated.get((review.product_id, review.user_id))
+            if created_at:
+                review.created_at = created_at
+                stamped.append(review)
+        Review.objects.bulk_update(stamped, ['created_at'])
+
+    written_ids = {product_id for product_id, _ in to_write}
+    touched = {
+        product.id: product.slug
+        for product in products.values() if product.id in written_ids
+    }
+    return result, touched
+
+
+def ingest_reviews(rows, on_conflict=ON_CONFLICT_SKIP, batch_size=None):
+    """
+    Insert validated review rows ({'product': slug, 'user': email, 'rating',
+    'comment', optional 'created_at'}) in batches.
+
+    Each batch resolves products and users with one query each, writes all
+    reviews with a single INSERT (skipping or upserting on
+    unique_user_review_per_product) and recomputes the affected products'
+    rating aggregates once, instead of once per review.
+    """
+    if on_conflict not in ON_CONFLICT_CHOICES:
+        raise ValueError(f"on_conflict must be one of {ON_CONFLICT_CHOICES}")
+    batch_size = batch_size or REVIEW_INGEST_BATCH_SIZE
+    totals = {'created': 0, 'updated': 0, 'skipped': 0, 'missing': []}
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _merge(totals, _run_batch(batch, on_conflict))
+            batch = []
+    if batch:
+        _merge(totals, _run_batch(batch, on_conflict))
+    return totals
+
+
+def _run_batch(batch, on_conflict):
+    with transaction.atomic():
+        result, touched = _ingest_batch(batch, on_conflict)
+        transaction.on_commit(lambda: refresh_review_aggregates(touched))
+    logger.info(
+        f"Ingested review batch: {result['created']} created, "
+        f"{result['updated']} updated, {result['skipped']} skipped, "
+        f"{len(result['missing'])} unresolved"
+    )
+    return result
+
+
+def _merge(totals, result):
+    for key in ('created', 'updated', 'skipped'):
+        totals[key] += result[key]
+    totals['missing'].extend(result['missing'])
@@ -1,8 +1,10 @@
 import graphene
 from graphene_django import DjangoObjectType, DjangoListField
-from graphene_django.filter import DjangoFilterConnectionField
 from django_filters import FilterSet, NumberFilter, CharFilter
 from graphql_jwt.decorators import login_required, staff_member_required
+from .graphql_async import ThreadedField, ThreadedKeysetConnectionField
+from .graphql_connections import CountableConnection, KeysetConnectionField
+from .loaders import get_loaders
 from .models import Category, Product, Review, ProductImage
 
 # --------------------------
@@ -47,6 +49,7 @@ class CategoryType(DjangoObjectType):
         fields = ('id', 'name', 'slug', 'description', 'created_at')
         filterset_class = CategoryFilterSet
         interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
 
 class ProductImageType(DjangoObjectType):
     class Meta:
@@ -66,9 +69,19 @@ class ProductType(DjangoObjectType):
         )
         filterset_class = ProductFilterSet
         interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
     
     def resolve_images(self, info):
-        return self.images.all()
+        return get_loaders(info).product_images.load(self.id)
+
+    def resolve_average_rating(self, info):
+        return get_loaders(info).rating_summary.load(self.id)[0] or 0
+
+    def resolve_review_count(self, info):
+        return get_loaders(info).rating_summary.load(self.id)[1]
+
+    def resolve_category(self, info):
+        return get_loaders(info).category.load(self.category_id)
 
 class ReviewType(DjangoObjectType):
     class Meta:
@@ -76,15 +89,19 @@ class ReviewType(DjangoObjectType):
         fields = ('id', 'product', 'user', 'rating', 'comment', 'created_at')
         filterset_class = ReviewFilterSet
         interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
+
+    def resolve_product(self, info):
+        return get_loaders(info).product.load(self.product_id)
 
 # --------------------------
 # QUERIES (WITH PROPER RESOLVERS)
 # --------------------------
 
 class Query(graphene.ObjectType):
-    all_categories = DjangoFilterConnectionField(CategoryType)
-    all_products = DjangoFilterConnectionField(ProductType)
-    all_reviews = DjangoFilterConnectionField(ReviewType)
+    all_categories = KeysetConnectionField(CategoryType)
+    all_products = KeysetConnectionField(ProductType)
+    all_reviews = KeysetConnectionField(ReviewType)
     
     product_by_slug = graphene.Field(ProductType, slug=graphene.String(required=True))
     featured_products = graphene.List(ProductType)
@@ -93,16 +110,21 @@ class Query(graphene.ObjectType):
         return Category.objects.all()
 
     def resolve_all_products(self, info, **kwargs):
-        return Product.objects.select_related('category').prefetch_related('images')
+        # Images and ratings come from the batch loaders, one query per page
+        return Product.objects.select_related('category')
 
     def resolve_all_reviews(self, info, **kwargs):
-        return Review.objects.select_related('user', 'product')
+        return Review.objects.select_related('product__category')
 
     def resolve_product_by_slug(self, info, slug):
-        return Product.objects.get(slug=slug)
+        product = Product.objects.select_related('category').get(slug=slug)
+        get_loaders(info).register([product])
+        return product
 
     def resolve_featured_products(self, info):
-        return Product.objects.filter(featured=True)
+        products = list(Product.objects.select_related('category').filter(featured=True))
+        get_loaders(info).register(products)
+        return products
 
 # --------------------------
 # MUTATIONS
@@ -126,6 +148,25 @@ class CreateCategory(graphene.Mutation):
 class ProductMutations(graphene.ObjectType):
     create_category = CreateCategory.Field()
 
+# --------------------------
+# ASYNC QUERIES
+# --------------------------
+
+class AsyncQuery(Query):
+    """
+    Query with awaitable root fields for the ASGI endpoint, so independent
+    root fields of one operation resolve concurrently.
+    """
+    all_categories = ThreadedKeysetConnectionField(CategoryType)
+    all_products = ThreadedKeysetConnectionField(ProductType)
+    all_reviews = ThreadedKeysetConnectionField(ReviewType)
+
+    product_by_slug = ThreadedField(ProductType, slug=graphene.String(required=True))
+    featured_products = ThreadedField(graphene.List(ProductType))
+
+    class Meta:
+        name = 'Query'
+
 # --------------------------
 # SCHEMA DEFINITION
 # --------------------------
@@ -133,4 +174,9 @@ class ProductMutations(graphene.ObjectType):
 schema = graphene.Schema(
     query=Query,
     mutation=ProductMutations
+)
+
+async_schema = graphene.Schema(
+    query=AsyncQuery,
+    mutation=ProductMutations
 )
\ No newline at end of file
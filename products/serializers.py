@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_serializer, extend_schema_field, OpenApiExample
-from .models import Product, Category, Review
+from .models import Product, Category, Review, ProductSubscription
+from .review_ingest import ON_CONFLICT_CHOICES, ON_CONFLICT_SKIP
 from django.contrib.auth import get_user_model
+from decimal import Decimal
 
 User = get_user_model()
 
@@ -121,4 +123,50 @@ class ProductSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.CharField())
     def get_created_by(self, obj):
-        return str(obj.created_by)
\ No newline at end of file
+        return str(obj.created_by)
+
+
+class ProductSubscriptionSerializer(serializers.ModelSerializer):
+    product = serializers.SlugRelatedField(
+        slug_field='slug',
+        queryset=Product.objects.only('id', 'slug', 'price', 'stock')
+    )
+
+    class Meta:
+        model = ProductSubscription
+        fields = ['id', 'product', 'kind', 'target_price', 'is_active', 'created_at', 'notified_at']
+        read_only_fields = ['is_active', 'created_at', 'notified_at']
+        validators = []
+
+    def validate(self, attrs):
+        product = attrs['product']
+        if attrs['kind'] == ProductSubscription.Kind.RESTOCK:
+            if product.stock > 0:
+                raise serializers.ValidationError("Product is already in stock")
+            attrs['target_price'] = None
+        elif attrs.get('target_price') is None:
+            # Any drop below the current price
+            attrs['target_price'] = product.price - Decimal('0.01')
+        elif attrs['target_price'] >= product.price:
+            raise serializers.ValidationError(
+                {'target_price': 'Target price must be below the current price'}
+            )
+        return attrs
+
+
+class ReviewIngestRowSerializer(serializers.Serializer):
+    """One imported review; products and users are matched by slug and email"""
+    product = serializers.SlugField()
+    user = serializers.EmailField()
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+    comment = serializers.CharField(allow_blank=True, required=False, default='')
+    created_at = serializers.DateTimeField(required=False)
+
+
+class ReviewIngestSerializer(serializers.Serializer):
+    on_conflict = serializers.ChoiceField(
+        choices=ON_CONFLICT_CHOICES,
+        default=ON_CONFLICT_SKIP,
+        help_text="What to do with reviews that already exist for the same product and user"
+    )
+    reviews = ReviewIngestRowSerializer(many=True, allow_empty=False, max_length=5000)
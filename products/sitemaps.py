@@ -0,0 +1,192 @@
+import hashlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BigIntegerField, Count, ExpressionWrapper, F, Max
+from django.urls import reverse
+
+from .caching import CATEGORY_VERSION_KEY, get_versions, version_time
+from .models import Category, Product
+
+# The sitemaps.org protocol caps a single sitemap file at 50,000 URLs
+SITEMAP_CHUNK_SIZE = getattr(settings, 'SITEMAP_CHUNK_SIZE', 50000)
+SITEMAP_CACHE_TIMEOUT = getattr(settings, 'SITEMAP_CACHE_TIMEOUT', 60 * 60 * 24)
+SITEMAP_ITERATOR_CHUNK_SIZE = 2000
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_CLOSE = '</sitemapindex>\n'
+
+
+def _bucket(field='id'):
+    """Integer bucket number of a row, derived from its primary key"""
+    return ExpressionWrapper(
+        F(field) / SITEMAP_CHUNK_SIZE,
+        output_field=BigIntegerField()
+    )
+
+
+def _lastmod(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00') if value else None
+
+
+def sitemap_products():
+    """Products that are exposed to crawlers"""
+    return Product.objects.filter(available=True)
+
+
+def product_chunks():
+    """
+    Return {chunk: (url_count, lastmod)} for every non-empty product chunk.
+
+    Chunks are fixed primary key ranges, so a product never moves between
+    chunks and a change only invalidates the chunk that holds it.
+    """
+    rows = sitemap_products().annotate(
+        bucket=_bucket()
+    ).order_by().values('bucket').annotate(
+        url_count=Count('id'),
+        lastmod=Max('updated_at')
+    )
+    return {
+        row['bucket']: (row['url_count'], row['lastmod'])
+        for row in rows
+    }
+
+
+def category_chunks():
+    """
+    Return {chunk: (url_count, lastmod)} for every non-empty category chunk.
+
+    A category page changes whenever one of its products does, so its
+    lastmod is the newest of its own creation date and its products'
+    updated_at values. Categories have no updated_at of their own, so
+    the time of the last category change counts too: a renamed slug
+    changes every chunk's fingerprint rather than serving the old URL.
+    """
+    categories_changed = version_time(get_versions([CATEGORY_VERSION_KEY])[0])
+    chunks = {
+        row['bucket']: (row['url_count'], row['lastmod'])
+        for row in Category.objects.annotate(
+            bucket=_bucket()
+        ).order_by().values('bucket').annotate(
+            url_count=Count('id'),
+            lastmod=Max('created_at')
+        )
+    }
+    product_rows = sitemap_products().filter(
+        category__isnull=False
+    ).annotate(
+        bucket=_bucket('category_id')
+    ).order_by().values('bucket').annotate(lastmod=Max('updated_at'))
+    for row in product_rows:
+        if row['bucket'] in chunks:
+            url_count, lastmod = chunks[row['bucket']]
+            chunks[row['bucket']] = (url_count, max(lastmod, row['lastmod']))
+    # No category change is known while the version is unset (evicted)
+    return {
+        chunk: (url_count, max(filter(None, (lastmod, categories_changed))))
+        for chunk, (url_count, lastmod) in chunks.items()
+    }
+
+
+def _url_entry(loc, lastmod):
+    entry = f'<url><loc>{escape(loc)}</loc>'
+    if lastmod:
+        entry += f'<lastmod>{_lastmod(lastmod)}</lastmod>'
+    return entry + '</url>\n'
+
+
+def _chunk_range(chunk):
+    return chunk * SITEMAP_CHUNK_SIZE, (chunk + 1) * SITEMAP_CHUNK_SIZE
+
+
+def iter_product_urls(base_url, chunk):
+    """Stream <url> entries for one product chunk over a server-side cursor"""
+    low, high = _chunk_range(chunk)
+    detail_path = reverse('products:detail', args=['__slug__'])
+    rows = sitemap_products().filter(
+        id__gte=low, id__lt=high
+    ).order_by('id').values_list('slug', 'updated_at')
+    for slug, updated_at in rows.iterator(chunk_size=SITEMAP_ITERATOR_CHUNK_SIZE):
+        yield _url_entry(
+            base_url + detail_path.replace('__slug__', slug),
+            updated_at
+        )
+
+
+def iter_category_urls(base_url, chunk):
+    """Stream <url> entries for one category chunk"""
+    low, high = _chunk_range(chunk)
+    list_path = reverse('products:list')
+    categories = Category.objects.filter(
+        id__gte=low, id__lt=high
+    ).order_by('id').values_list('id', 'slug', 'created_at')
+    product_lastmods = dict(
+        sitemap_products().filter(
+            category_id__gte=low, category_id__lt=high
+        ).order_by().values('category_id').annotate(
+            lastmod=Max('updated_at')
+        ).values_list('category_id', 'lastmod')
+    )
+    for category_id, slug, created_at in categories.iterator(
+        chunk_size=SITEMAP_ITERATOR_CHUNK_SIZE
+    ):
+        lastmod = max(
+            filter(None, [created_at, product_lastmods.get(category_id)])
+        )
+        yield _url_entry(f'{base_url}{list_path}?category={slug}', lastmod)
+
+
+def _cache_key(kind, chunk, base_url, fingerprint):
+    url_count, lastmod = fingerprint
+    stamp = lastmod.isoformat() if lastmod else ''
+    digest = hashlib.md5(
+        f'{base_url}|{url_count}|{stamp}'.encode()
+    ).hexdigest()
+    return f'sitemap_{kind}_{chunk}_{digest}'
+
+
+def stream_chunk(kind, chunk, base_url, fingerprint, entries):
+    """
+    Yield a complete <urlset> document for one chunk.
+
+    A chunk is served from the cache while its fingerprint (URL count and
+    newest lastmod) is unchanged. On a miss the document is streamed to the
+    client as it is produced and stored once the last entry is written.
+    """
+    cache_key = _cache_key(kind, chunk, base_url, fingerprint)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = [XML_HEADER, URLSET_OPEN]
+    yield XML_HEADER + URLSET_OPEN
+    for entry in entries:
+        parts.append(entry)
+        yield entry
+    parts.append(URLSET_CLOSE)
+    yield URLSET_CLOSE
+    cache.set(cache_key, ''.join(parts), timeout=SITEMAP_CACHE_TIMEOUT)
+
+
+def render_index(base_url):
+    """Render the sitemap index pointing at every product and category chunk"""
+    lines = [XML_HEADER, INDEX_OPEN]
+    sections = [
+        ('sitemap-products', product_chunks()),
+        ('sitemap-categories', category_chunks()),
+    ]
+    for url_name, chunks in sections:
+        for chunk, (_, lastmod) in sorted(chunks.items()):
+            loc = base_url + reverse(url_name, args=[chunk])
+            entry = f'<sitemap><loc>{escape(loc)}</loc>'
+            if lastmod:
+                entry += f'<lastmod>{_lastmod(lastmod)}</lastmod>'
+            lines.append(entry + '</sitemap>\n')
+    lines.append(INDEX_CLOSE)
+    return ''.join(lines)
@@ -0,0 +1,413 @@
+import logging
+from contextlib import contextmanager
+from threading import Lock
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+
+from .models import Product, queue_subscription_events
+
+logger = logging.getLogger(__name__)
+
+
+# Unset, hot products take their stock from Product.stock like any other.
+# RedisStockCounter shares the cache's connection pool; LocalStockCounter
+# is not shared between processes.
+STOCK_COUNTER_BACKEND = getattr(settings, 'STOCK_COUNTER_BACKEND', None)
+
+
+class OutOfStock(Exception):
+    """Some products ran out; `products` is {product id: name}"""
+
+    def __init__(self, products):
+        self.products = products
+        super().__init__(
+            'Sold out while you were checking out: ' + ', '.join(sorted(products.values()))
+        )
+
+    @classmethod
+    def for_products(cls, product_ids):
+        return cls(dict(Product.objects.filter(pk__in=product_ids).values_list('id', 'name')))
+
+
+def _quantity_case(quantities):
+    return Case(
+        *(When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()),
+        output_field=PositiveIntegerField()
+    )
+
+
+def take_stock(quantities):
+    """
+    Decrement Product.stock by {product_id: quantity} in one conditional
+    UPDATE, or raise OutOfStock without changing anything if any product
+    has too little. Run inside the transaction that needs the stock.
+    """
+    if not quantities:
+        return
+    enough = Q()
+    for product_id, quantity in quantities.items():
+        enough |= Q(pk=product_id, stock__gte=quantity)
+    rows = Product.objects.filter(enough).update(stock=F('stock') - _quantity_case(quantities))
+    if rows != len(quantities):
+        # Raised inside the caller's transaction, which undoes the rows taken
+        short = Product.objects.filter(pk__in=list(quantities)).values_list('id', 'stock')
+        raise OutOfStock.for_products(
+            [product_id for product_id, stock in short if stock < quantities[product_id]]
+        )
+
+
+def restock(quantities):
+    """
+    Put {product_id: quantity} back into Product.stock in one UPDATE, and
+    notify the back-in-stock subscribers of products that had sold out
+    """
+    if not quantities:
+        return
+    with transaction.atomic():
+        sold_out = list(Product.objects.select_for_update().filter(
+            pk__in=list(quantities), stock=0
+        ).values_list('id', flat=True))
+        Product.objects.filter(pk__in=list(quantities)).update(
+            stock=F('stock') + _quantity_case(quantities)
+        )
+        for product_id in sold_out:
+            queue_subscription_events(product_id, None, None, 0, quantities[product_id])
+
+
+class StockCounter:
+    """
+    Stock of hot products, kept outside the database so buyers in a flash
+    sale do not queue on the product's row lock.
+
+    Each product has three counts: `available` units can still be
+    reserved, `held` units are reserved by checkouts in progress, and
+    `sold` units are committed but not yet subtracted from Product.stock.
+    reserve() moves available -> held, commit() held -> sold and release()
+    held -> available, each atomically for all products at once, so
+    available + held + sold stays equal to Product.stock and a reservation
+    can never exceed it.
+
+    Counts are loaded from Product.stock on first use. reconcile() writes
+    the sold counts to Product.stock and recomputes available from it, so
+    restocks and admin edits made in the database reach the counter.
+    Units held by a checkout that died before commit() or release() stay
+    unsellable, which can undersell but never oversell. Product.stock
+    of a hot product lags its sales until the next reconcile().
+    """
+
+    def reserve(self, quantities):
+        """Reserve {product_id: quantity} entirely, or raise OutOfStock"""
+        while quantities:
+            result = self._reserve(quantities)
+            if result is None:
+                return
+            product_id, loaded = result
+            if loaded:
+                raise OutOfStock.for_products([product_id])
+            stock = Product.objects.filter(pk=product_id).values_list('stock', flat=True).first()
+            if stock is None:
+                raise OutOfStock({product_id: f'Product {product_id}'})
+            self.load(product_id, stock)
+
+    def commit(self, quantities):
+        raise NotImplementedError
+
+    def release(self, quantities):
+        raise NotImplementedError
+
+    def load(self, product_id, stock):
+        """Start counting a product at `stock` unless another worker has"""
+        raise NotImplementedError
+
+    def reconcile(self):
+        """
+        Write sold units to Product.stock and resynchronize available with
+        it; counters of products no longer hot are dropped once nothing is
+        held. Returns the number of products reconciled.
+        """
+        product_ids = self.tracked()
+        for product_id in product_ids:
+            sold = self.take_sold(product_id)
+            if not sold:
+                continue
+            try:
+                if not Product.objects.filter(pk=product_id, stock__gte=sold).update(
+                    stock=F('stock') - sold
+                ):
+                    self._write_oversold(product_id, sold)
+            except Exception as e:
+                logger.error(f"Failed to write {sold} sold units of product {product_id}: {e}")
+                self.add_sold(product_id, sold)
+                raise
+        products = {
+            product_id: (stock, hot)
+            for product_id, stock, hot in Product.objects.filter(
+                pk__in=product_ids
+            ).values_list('id', 'stock', 'hot')
+        }
+        for product_id in product_ids:
+            stock, hot = products.get(product_id, (0, False))
+            self.resync(product_id, stock, keep=hot)
+        return len(product_ids)
+
+    def _write_oversold(self, product_id, sold):
+        # Product.stock was lowered below units already sold
+        stock = Product.objects.filter(pk=product_id).values_list('stock', flat=True).first()
+        if stock is None:
+            return
+        logger.error(
+            f"Product {product_id} is oversold by {sold - stock}: "
+            f"{sold} units sold with {stock} in stock"
+        )
+        Product.objects.filter(pk=product_id).update(stock=Greatest(F('stock') - sold, 0))
+
+    def tracked(self):
+        """Ids of the products being counted"""
+        raise NotImplementedError
+
+    def take_sold(self, product_id):
+        raise NotImplementedError
+
+    def add_sold(self, product_id, sold):
+        raise NotImplementedError
+
+    def resync(self, product_id, stock, keep=True):
+        """Set available to what `stock` leaves after held and sold units"""
+        raise NotImplementedError
+
+
+class RedisStockCounter(StockCounter):
+    """Counts live in Redis strings shared by every worker; each operation is one script"""
+
+    TRACKED_KEY = 'stock:tracked'
+    # KEYS: available and held of each product; ARGV: the quantities.
+    # Returns 0, or the 1-based position of the first product short of
+    # stock (negated when it is not counted yet).
+    RESERVE_SCRIPT = """
+        for i = 1, #ARGV do
+            local available = redis.call('GET', KEYS[2 * i - 1])
+            if not available then
+                return -i
+            end
+            if tonumber(available) < tonumber(ARGV[i]) then
+                return i
+            end
+        end
+        for i = 1, #ARGV do
+            redis.call('DECRBY', KEYS[2 * i - 1], ARGV[i])
+            redis.call('INCRBY', KEYS[2 * i], ARGV[i])
+        end
+        return 0
+    """
+    # KEYS: held and sold of each product
+    COMMIT_SCRIPT = """
+        for i = 1, #ARGV do
+            redis.call('DECRBY', KEYS[2 * i - 1], ARGV[i])
+            redis.call('INCRBY', KEYS[2 * i], ARGV[i])
+        end
+    """
+    # KEYS: held and available of each product. An available count that is
+    # not loaded is left alone: loading derives it from held.
+    RELEASE_SCRIPT = """
+        for i = 1, #ARGV do
+            redis.call('DECRBY', KEYS[2 * i - 1], ARGV[i])
+            if redis.call('EXISTS', KEYS[2 * i]) == 1 then
+                redis.call('INCRBY', KEYS[2 * i], ARGV[i])
+            end
+        end
+    """
+    # KEYS: available, held, sold, tracked; ARGV: stock, product id, whether
+    # to set an existing count (reconcile) and whether to keep counting
+    RESYNC_SCRIPT = """
+        local held = tonumber(redis.call('GET', KEYS[2]) or '0')
+        local sold = tonumber(redis.call('GET', KEYS[3]) or '0')
+        if ARGV[4] == '0' and held == 0 and sold == 0 then
+            redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+            redis.call('SREM', KEYS[4], ARGV[2])
+            return
+        end
+        if ARGV[3] == '1' or redis.call('EXISTS', KEYS[1]) == 0 then
+            redis.call('SET', KEYS[1], math.max(tonumber(ARGV[1]) - held - sold, 0))
+            redis.call('SADD', KEYS[4], ARGV[2])
+        end
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection('default')
+
+    @staticmethod
+    def key(product_id, count):
+        return f'stock:{product_id}:{count}'
+
+    def _keys(self, quantities, *counts):
+        return [
+            self.key(product_id, count)
+            for product_id in quantities for count in counts
+        ]
+
+    def _reserve(self, quantities):
+        result = self.redis.eval(
+            self.RESERVE_SCRIPT, 2 * len(quantities),
+            *self._keys(quantities, 'available', 'held'), *quantities.values()
+        )
+        if result == 0:
+            return None
+        return list(quantities)[abs(result) - 1], result > 0
+
+    def commit(self, quantities):
+        if quantities:
+            self.redis.eval(
+                self.COMMIT_SCRIPT, 2 * len(quantities),
+                *self._keys(quantities, 'held', 'sold'), *quantities.values()
+            )
+
+    def release(self, quantities):
+        if quantities:
+            self.redis.eval(
+                self.RELEASE_SCRIPT, 2 * len(quantities),
+                *self._keys(quantities, 'held', 'available'), *quantities.values()
+            )
+
+    def _resync(self, product_id, stock, reset, keep):
+        self.redis.eval(
+            self.RESYNC_SCRIPT, 4,
+            *self._keys([product_id], 'available', 'held', 'sold'), self.TRACKED_KEY,
+            stock, product_id, int(reset), int(keep)
+        )
+
+    def load(self, product_id, stock):
+        self._resync(product_id, stock, reset=False, keep=True)
+
+    def resync(self, product_id, stock, keep=True):
+        self._resync(product_id, stock, reset=True, keep=keep)
+
+    def tracked(self):
+        return sorted(int(product_id) for product_id in self.redis.smembers(self.TRACKED_KEY))
+
+    def take_sold(self, product_id):
+        return int(self.redis.getset(self.key(product_id, 'sold'), 0) or 0)
+
+    def add_sold(self, product_id, sold):
+        self.redis.incrby(self.key(product_id, 'sold'), sold)
+
+
+class LocalStockCounter(StockCounter):
+    """
+    In-process stand-in for RedisStockCounter with the same semantics, for
+    tests and single-process development. Not shared between workers.
+    """
+
+    def __init__(self):
+        # product id -> [available, held, sold]
+        self.counts = {}
+        self.lock = Lock()
+
+    def _reserve(self, quantities):
+        with self.lock:
+            for product_id, quantity in quantities.items():
+                if product_id not in self.counts:
+                    return product_id, False
+                if self.counts[product_id][0] < quantity:
+                    return product_id, True
+            for product_id, quantity in quantities.items():
+                self.counts[product_id][0] -= quantity
+                self.counts[product_id][1] += quantity
+        return None
+
+    def commit(self, quantities):
+        with self.lock:
+            for product_id, quantity in quantities.items():
+                self.counts[product_id][1] -= quantity
+                self.counts[product_id][2] += quantity
+
+    def release(self, quantities):
+        with self.lock:
+            for product_id, quantity in quantities.items():
+                self.counts[product_id][1] -= quantity
+                self.counts[product_id][0] += quantity
+
+    def load(self, product_id, stock):
+        with self.lock:
+            self.counts.setdefault(product_id, [stock, 0, 0])
+
+    def resync(self, product_id, stock, keep=True):
+        with self.lock:
+            _, held, sold = self.counts[product_id]
+            if not keep and not held and not sold:
+                del self.counts[product_id]
+            else:
+                self.counts[product_id][0] = max(stock - held - sold, 0)
+
+    def tracked(self):
+        with self.lock:
+            return sorted(self.counts)
+
+    def take_sold(self, product_id):
+        with self.lock:
+            sold, self.counts[product_id][2] = self.counts[product_id][2], 0
+        return sold
+
+    def add_sold(self, product_id, sold):
+        with self.lock:
+            self.counts[product_id][2] += sold
+
+
+_counter = None
+_counter_lock = Lock()
+
+
+def get_stock_counter():
+    """The configured stock counter, created once per process, or None"""
+    global _counter
+    if _counter is None and STOCK_COUNTER_BACKEND:
+        with _counter_lock:
+            if _counter is None:
+                _counter = import_string(STOCK_COUNTER_BACKEND)()
+    return _counter
+
+
+@contextmanager
+def stock_transaction(quantities):
+    """
+    A transaction that takes {product_id: quantity} out of stock, or raise
+    OutOfStock.
+
+    Hot products are reserved from the stock counter, if one is configured,
+    before the transaction opens, released if the block raises and committed once the transaction
+    has; any other product is decremented in the transaction with
+    take_stock(). The transaction is durable: nested in another one, its
+    commit would not be final and the reservation could outlive a rollback.
+    """
+    counter = get_stock_counter()
+    hot_ids = set() if counter is None else set(Product.objects.filter(
+        pk__in=list(quantities), hot=True
+    ).values_list('id', flat=True))
+    hot = {
+        product_id: quantity
+        for product_id, quantity in quantities.items() if product_id in hot_ids
+    }
+    if hot:
+        counter.reserve(hot)
+    try:
+        with transaction.atomic(durable=True):
+            take_stock({
+                product_id: quantity
+                for product_id, quantity in quantities.items() if product_id not in hot_ids
+            })
+            yield
+    except BaseException:
+        if hot:
+            counter.release(hot)
+        raise
+    if not hot:
+        return
+    try:
+        counter.commit(hot)
+    except Exception as e:
+        # The order is in; leaving the units held undersells but cannot oversell
+        logger.error(f"Failed to commit reserved stock {hot}: {e}")
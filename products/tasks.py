@@ -0,0 +1,123 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.utils import timezone
+
+from . import analytics
+from .models import Product, ProductSubscription
+from .stock import get_stock_counter
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_BATCH_SIZE = getattr(settings, 'SUBSCRIPTION_BATCH_SIZE', 1000)
+
+
+def enqueue_product_event(product_id, kind, price=None):
+    """Hand a price-drop/restock event to the workers without failing the caller"""
+    try:
+        fan_out_product_event.delay(product_id, kind, price)
+    except Exception as e:
+        logger.error(f"Failed to queue {kind} event for product {product_id}: {e}")
+
+
+@shared_task
+def fan_out_product_event(product_id, kind, price=None):
+    """
+    Split the subscribers of a price drop or restock into batches.
+
+    Matching subscriptions are found with one index range query and only
+    their ids are read here; each batch is notified by its own task so a
+    hot product with 100k subscribers spreads across the worker pool.
+    """
+    subscription_ids = list(
+        ProductSubscription.matching(product_id, kind, price)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    for start in range(0, len(subscription_ids), SUBSCRIPTION_BATCH_SIZE):
+        notify_subscribers.delay(
+            subscription_ids[start:start + SUBSCRIPTION_BATCH_SIZE],
+            product_id,
+            kind
+        )
+    return len(subscription_ids)
+
+
+def _message(subscription, product):
+    if subscription.kind == ProductSubscription.Kind.RESTOCK:
+        subject = f"{product.name} is back in stock"
+        body = f"Good news! {product.name} is available again."
+    else:
+        subject = f"Price drop: {product.name}"
+        body = f"{product.name} is now {product.price}."
+    return subject, body, settings.DEFAULT_FROM_EMAIL, [subscription.user.email]
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def notify_subscribers(self, subscription_ids, product_id, kind):
+    """
+    Notify one batch of subscribers.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and deactivated
+    in the same transaction, so overlapping or retried fan-outs for the
+    same event never email a subscriber twice. If sending fails the batch
+    is reactivated and retried; a failure part way through the batch can
+    email some subscribers again.
+    """
+    try:
+        product = Product.objects.only('name', 'price').get(pk=product_id)
+    except Product.DoesNotExist:
+        # Deleted since the fan-out; its subscriptions went with it
+        logger.info(f"Product {product_id} no longer exists, skipping its notifications")
+        return 0
+    with transaction.atomic():
+        claimed = list(
+            ProductSubscription.objects.filter(
+                id__in=subscription_ids,
+                kind=kind,
+                is_active=True
+            ).select_for_update(skip_locked=True, of=('self',))
+            .select_related('user')
+            .only('id', 'kind', 'user__email')
+        )
+        ProductSubscription.objects.filter(
+            id__in=[subscription.id for subscription in claimed]
+        ).update(is_active=False, notified_at=timezone.now())
+
+    if claimed:
+        try:
+            send_mass_mail(
+                [_message(subscription, product) for subscription in claimed],
+                fail_silently=False
+            )
+        except Exception as e:
+            logger.error(f"Failed to notify {len(claimed)} subscribers of product {product_id}: {e}")
+            ProductSubscription.objects.filter(
+                id__in=[subscription.id for subscription in claimed]
+            ).update(is_active=True, notified_at=None)
+            raise self.retry(exc=e)
+    return len(claimed)
+
+
+@shared_task
+def flush_analytics():
+    """Periodic flush of buffered view/search counters (see CELERY_BEAT_SCHEDULE)"""
+    buckets = analytics.flush()
+    if buckets is None:
+        logger.info("Analytics flush already running, skipping")
+    return buckets
+
+
+@shared_task
+def reconcile_stock():
+    """Periodic sync of hot products' stock counters with Product.stock (see CELERY_BEAT_SCHEDULE)"""
+    counter = get_stock_counter()
+    if counter is None:
+        return 0
+    reconciled = counter.reconcile()
+    if reconciled:
+        logger.debug(f"Reconciled stock of {reconciled} hot products")
+    return reconciled
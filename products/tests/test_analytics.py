@@ -0,0 +1,133 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from products import analytics
+from products.models import (
+    Category,
+    CategoryTrend,
+    Product,
+    ProductTrend,
+    ProductViewStat,
+    SearchQueryStat,
+)
+
+User = get_user_model()
+
+
+class AnalyticsPipelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.phones = Category.objects.create(name='Phones')
+        self.laptops = Category.objects.create(name='Laptops')
+        self.phone = Product.objects.create(
+            name='Phone', description='Test description',
+            price=Decimal('100.00'), stock=5, category=self.phones
+        )
+        self.laptop = Product.objects.create(
+            name='Laptop', description='Test description',
+            price=Decimal('500.00'), stock=5, category=self.laptops
+        )
+
+    def _flush(self):
+        return analytics.flush(now=timezone.now() + timedelta(minutes=3))
+
+    def test_views_are_buffered_then_flushed_in_one_batch(self):
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                analytics.record_product_view(self.phone.id)
+        analytics.record_product_view(self.laptop.id)
+        self.assertFalse(ProductViewStat.objects.exists())
+
+        self.assertTrue(self._flush())
+        views = dict(ProductViewStat.objects.values_list('product_id', 'views'))
+        self.assertEqual(views, {self.phone.id: 3, self.laptop.id: 1})
+
+        # Counters are gone once flushed
+        self._flush()
+        self.assertEqual(
+            ProductViewStat.objects.get(product=self.phone).views, 3
+        )
+
+    def test_flush_adds_onto_existing_hour(self):
+        analytics.record_product_view(self.phone.id)
+        self._flush()
+        cache.delete(analytics.FLUSHED_THROUGH_KEY)
+        analytics.record_product_view(self.phone.id)
+        self._flush()
+        self.assertEqual(ProductViewStat.objects.get(product=self.phone).views, 2)
+
+    def test_detail_endpoints_record_views(self):
+        self.client.get(reverse('products:detail', args=[self.phone.slug]))
+        url = reverse('products:products-api:product-detail', args=[self.phone.slug])
+        first = self.client.get(url)
+        # A 304 revalidation is not counted
+        self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self._flush()
+        self.assertEqual(ProductViewStat.objects.get(product=self.phone).views, 2)
+
+    def test_trending_ranks_products_and_categories(self):
+        for _ in range(5):
+            analytics.record_product_view(self.laptop.id)
+        analytics.record_product_view(self.phone.id)
+        self._flush()
+        self.assertGreater(
+            ProductTrend.objects.get(product=self.laptop).score,
+            ProductTrend.objects.get(product=self.phone).score
+        )
+        self.assertTrue(CategoryTrend.objects.filter(category=self.laptops).exists())
+
+        response = self.client.get(reverse('products:products-api:product-trending'))
+        self.assertEqual(
+            [product['name'] for product in response.data], ['Laptop', 'Phone']
+        )
+        self.assertAlmostEqual(response.data[0]['trending_score'], 5, delta=0.5)
+
+        response = self.client.get(
+            reverse('products:products-api:product-trending'),
+            {'category': self.phones.slug}
+        )
+        self.assertEqual([product['name'] for product in response.data], ['Phone'])
+
+        response = self.client.get(reverse('products:products-api:category-trending'))
+        self.assertEqual(
+            [category['name'] for category in response.data], ['Laptops', 'Phones']
+        )
+
+    def test_older_views_decay(self):
+        old = analytics._decay_weight(timezone.now() - analytics.TRENDING_HALF_LIFE)
+        self.assertAlmostEqual(analytics.decayed_score(old), 0.5, places=3)
+
+    def test_searches_and_zero_result_report(self):
+        url = reverse('products:products-api:product-list')
+        self.client.get(url, {'search': 'Phone'})
+        self.client.get(url, {'search': '  TABLET '})
+        self.client.get(url, {'search': 'tablet'})
+        self._flush()
+
+        stats = {
+            row.query: (row.searches, row.zero_results)
+            for row in SearchQueryStat.objects.all()
+        }
+        self.assertEqual(stats, {'phone': (1, 0), 'tablet': (2, 2)})
+
+        report_url = reverse('products:products-api:product-zero-result-searches')
+        self.assertEqual(self.client.get(report_url).status_code, 401)
+        staff = User.objects.create_user(
+            email='staff@example.com', password='testpass123', is_staff=True
+        )
+        client = APIClient()
+        client.force_authenticate(user=staff)
+        response = client.get(report_url)
+        self.assertEqual(
+            response.data['queries'],
+            [{'query': 'tablet', 'searches': 2, 'zero_results': 2}]
+        )
+
+    def test_concurrent_flush_is_skipped(self):
+        cache.add(analytics.FLUSH_LOCK_KEY, 1)
+        self.assertIsNone(self._flush())
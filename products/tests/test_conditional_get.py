@@ -0,0 +1,94 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from products.models import Category, Product, Review
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='reviewer@example.com', password='testpass123'
+        )
+        self.category = Category.objects.create(name='Phones')
+        self.product = Product.objects.create(
+            name='Phone', description='Test description',
+            price=Decimal('100.00'), stock=5, category=self.category
+        )
+        self.list_url = reverse('products:products-api:product-list')
+        self.detail_url = reverse(
+            'products:products-api:product-detail', args=[self.product.slug]
+        )
+
+    def _revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_detail_is_not_modified_without_serializing(self):
+        first = self.client.get(self.detail_url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(1):
+            second = self._revalidate(self.detail_url, first)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_modified_since_is_honoured(self):
+        first = self.client.get(self.detail_url)
+        second = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(second.status_code, 304)
+
+    def test_product_change_invalidates_list_and_detail(self):
+        listing = self.client.get(self.list_url)
+        detail = self.client.get(self.detail_url)
+        self.assertEqual(self._revalidate(self.list_url, listing).status_code, 304)
+
+        self.product.price = Decimal('90.00')
+        self.product.save()
+        self.assertEqual(self._revalidate(self.list_url, listing).status_code, 200)
+        self.assertEqual(self._revalidate(self.detail_url, detail).status_code, 200)
+
+    def test_list_etag_depends_on_filters(self):
+        everything = self.client.get(self.list_url)
+        filtered = self.client.get(self.list_url, {'category': self.category.slug})
+        self.assertNotEqual(everything['ETag'], filtered['ETag'])
+
+    def test_list_can_be_ordered_by_rating(self):
+        first = self.client.get(self.list_url, {'ordering': 'rating'})
+        self.assertEqual(first.status_code, 200)
+        url = f'{self.list_url}?ordering=rating'
+        self.assertEqual(self._revalidate(url, first).status_code, 304)
+
+    def test_new_review_invalidates_product_and_review_list(self):
+        reviews_url = reverse(
+            'products:products-api:product-reviews-list',
+            kwargs={'product_slug': self.product.slug}
+        )
+        detail = self.client.get(self.detail_url)
+        reviews = self.client.get(reviews_url)
+        self.assertEqual(self._revalidate(reviews_url, reviews).status_code, 304)
+
+        Review.objects.create(
+            product=self.product, user=self.user, rating=5, comment='Great'
+        )
+        self.assertEqual(self._revalidate(self.detail_url, detail).status_code, 200)
+        self.assertEqual(self._revalidate(reviews_url, reviews).status_code, 200)
+
+    def test_category_rename_invalidates_category_list(self):
+        url = reverse('products:products-api:category-list')
+        first = self.client.get(url)
+        self.assertEqual(self._revalidate(url, first).status_code, 304)
+
+        self.category.description = 'Smartphones'
+        self.category.save()
+        self.assertEqual(self._revalidate(url, first).status_code, 200)
+
+    def test_missing_product_still_returns_404(self):
+        url = reverse('products:products-api:product-detail', args=['missing'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"anything"')
+        self.assertEqual(response.status_code, 404)
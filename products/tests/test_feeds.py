@@ -0,0 +1,104 @@
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from products import feeds
+from products.models import Category, Product
+
+BASE_URL = 'http://testserver'
+
+
+class ProductFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Laptops')
+        self.in_stock = Product.objects.create(
+            name='HP 14 inch',
+            description='Test description',
+            price=499.99,
+            stock=3,
+            category=self.category
+        )
+        self.sold_out = Product.objects.create(
+            name='HP Monitor',
+            description='Test description',
+            price=199.00,
+            stock=0
+        )
+
+    def test_first_build_renders_every_row(self):
+        _, stats = feeds.rebuild_chunks(BASE_URL)
+        self.assertEqual(stats['rendered_rows'], 2)
+
+    def test_rebuild_only_renders_changed_rows(self):
+        feeds.rebuild_chunks(BASE_URL)
+        _, stats = feeds.rebuild_chunks(BASE_URL)
+        self.assertEqual(stats['rendered_rows'], 0)
+
+        self.sold_out.stock = 10
+        self.sold_out.save()
+        chunks, stats = feeds.rebuild_chunks(BASE_URL)
+        self.assertEqual(stats['rendered_rows'], 1)
+        tsv = ''.join(feeds.iter_feed(chunks, 'tsv'))
+        self.assertNotIn('out of stock', tsv)
+
+    def test_deleted_rows_are_dropped(self):
+        feeds.rebuild_chunks(BASE_URL)
+        self.sold_out.delete()
+        chunks, _ = feeds.rebuild_chunks(BASE_URL)
+        self.assertNotIn('HP Monitor', ''.join(feeds.iter_feed(chunks, 'xml')))
+
+    def test_category_rename_rerenders_its_rows(self):
+        feeds.rebuild_chunks(BASE_URL)
+        self.category.name = 'Notebooks'
+        self.category.save()
+        chunks, _ = feeds.rebuild_chunks(BASE_URL)
+        tsv = ''.join(feeds.iter_feed(chunks, 'tsv'))
+        self.assertIn('\tNotebooks\n', tsv)
+        self.assertNotIn('Laptops', tsv)
+
+    def test_feed_endpoint(self):
+        response = self.client.get(reverse('products:feed', args=['xml']))
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('<g:availability>in stock</g:availability>', content)
+        self.assertIn('<g:product_type>Laptops</g:product_type>', content)
+        self.assertIn(f'/products/products/{self.in_stock.slug}/', content)
+
+        response = self.client.get(reverse('products:feed', args=['tsv']))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split('\t'), feeds.TSV_COLUMNS)
+        self.assertEqual(len(lines), 3)
+
+    def test_feed_endpoint_serves_the_last_build_until_it_is_due(self):
+        url = reverse('products:feed', args=['tsv'])
+        self.client.get(url)
+        Product.objects.create(name='HP Mouse', description='x', price=19.00, stock=4)
+
+        with mock.patch.object(feeds, 'rebuild_chunks', wraps=feeds.rebuild_chunks) as rebuild:
+            content = b''.join(self.client.get(url).streaming_content).decode()
+            rebuild.assert_not_called()
+            self.assertNotIn('HP Mouse', content)
+
+            # Due, but another request holds the rebuild lock
+            later = time.time() + feeds.FEED_REFRESH_INTERVAL
+            with mock.patch('products.feeds.time.time', return_value=later):
+                cache.add(feeds._lock_cache_key(BASE_URL), 1)
+                content = b''.join(self.client.get(url).streaming_content).decode()
+                rebuild.assert_not_called()
+                self.assertNotIn('HP Mouse', content)
+
+                cache.delete(feeds._lock_cache_key(BASE_URL))
+                content = b''.join(self.client.get(url).streaming_content).decode()
+                rebuild.assert_called_once()
+                self.assertIn('HP Mouse', content)
+
+    def test_feed_endpoint_waits_for_a_first_build_in_progress(self):
+        cache.add(feeds._lock_cache_key(BASE_URL), 1)
+        response = self.client.get(reverse('products:feed', args=['xml']))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_unknown_format_returns_404(self):
+        response = self.client.get(reverse('products:feed', args=['csv']))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,65 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from products.models import Category, Product, Review
+
+User = get_user_model()
+
+
+class ProductFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='reviewer@example.com', password='testpass123'
+        )
+        self.category = Category.objects.create(name='Phones')
+        self.product = Product.objects.create(
+            name='Phone', description='Test description',
+            price=Decimal('100.00'), stock=5, category=self.category
+        )
+        self.similar = Product.objects.create(
+            name='Other Phone', description='Test description',
+            price=Decimal('80.00'), stock=5, category=self.category
+        )
+        self.url = reverse('products:detail', args=[self.product.slug])
+
+    def test_warm_detail_page_only_queries_products(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Phone')
+        self.assertContains(response, 'class="product-card"', count=1)
+
+    def test_price_change_invalidates_fragment(self):
+        self.client.get(self.url)
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('90.00'))
+        response = self.client.get(self.url)
+        self.assertContains(response, '$90.00')
+
+    def test_new_review_refreshes_rating(self):
+        self.client.get(self.url)
+        Review.objects.create(
+            product=self.product, user=self.user, rating=4, comment='Good'
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, '4.0 / 5 (1 review)')
+
+    def test_cached_forms_carry_the_visitor_csrf_token(self):
+        self.client.get(self.url)
+        other = self.client_class(enforce_csrf_checks=True)
+        response = other.get(self.url)
+        token = response.cookies['csrftoken'].value
+        self.assertNotContains(response, '__fragment_csrf_token__')
+        self.assertTrue(token)
+
+    def test_home_page_renders_cached_cards_live(self):
+        Product.objects.filter(pk=self.product.pk).update(featured=True)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['featured_products']), 1)
+        self.assertContains(response, 'Featured')
+
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('75.00'))
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '$75.00')
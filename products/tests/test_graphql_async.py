@@ -0,0 +1,78 @@
+import asyncio
+import json
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from products.graphql_async import in_worker_thread
+from products.graphql_views import documents
+from products.models import Category, Product, ProductImage
+
+HOME_QUERY = '''
+{
+  featuredProducts { name averageRating category { name } images { altText } }
+  allCategories(first: 5) { totalCount edges { node { name } } }
+}
+'''
+
+
+@mock.patch('products.graphql_async.GRAPHQL_CONCURRENT_RESOLVERS', False)
+class AsyncGraphQLViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        documents.clear()
+        category = Category.objects.create(name='Phones')
+        product = Product.objects.create(
+            name='Phone', description='Test description',
+            price=Decimal('100.00'), stock=5, category=category, featured=True
+        )
+        ProductImage.objects.create(product=product, image='p.jpg', alt_text='Front')
+
+    async def test_composite_query_resolves_every_root_field(self):
+        response = await self.async_client.post(
+            reverse('graphql-async'),
+            json.dumps({'query': HOME_QUERY}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual(data['featuredProducts'], [{
+            'name': 'Phone',
+            'averageRating': 0.0,
+            'category': {'name': 'Phones'},
+            'images': [{'altText': 'Front'}],
+        }])
+        self.assertEqual(data['allCategories']['totalCount'], 1)
+        self.assertIn('cost', response.json()['extensions'])
+
+    async def test_mutations_require_staff(self):
+        response = await self.async_client.post(
+            reverse('graphql-async'),
+            json.dumps({'query': 'mutation { createCategory(name: "Laptops") { category { name } } }'}),
+            content_type='application/json'
+        )
+        self.assertEqual(
+            response.json()['errors'][0]['message'],
+            'You do not have permission to perform this action'
+        )
+
+
+class ConcurrentRootFieldTests(SimpleTestCase):
+    @mock.patch('products.graphql_async.GRAPHQL_CONCURRENT_RESOLVERS', True)
+    def test_root_resolvers_run_in_parallel(self):
+        def slow(root, info):
+            time.sleep(0.2)
+            return root
+
+        resolver = in_worker_thread(slow)
+        info = SimpleNamespace(context=None, field_nodes=[], fragments={})
+
+        async def resolve_both():
+            return await asyncio.gather(resolver(1, info), resolver(2, info))
+
+        started = time.monotonic()
+        self.assertEqual(asyncio.run(resolve_both()), [1, 2])
+        self.assertLess(time.monotonic() - started, 0.35)
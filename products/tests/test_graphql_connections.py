@@ -0,0 +1,71 @@
+from decimal import Decimal
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from products.models import Category, Product
+from products.schema import schema
+
+PAGE_QUERY = '''
+query ($first: Int, $after: String, $last: Int, $before: String) {
+  allProducts(first: $first, after: $after, last: $last, before: $before) {
+    edges { node { name } }
+    pageInfo { startCursor endCursor hasNextPage hasPreviousPage }
+  }
+}
+'''
+
+
+class KeysetConnectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Phones')
+        for i in range(5):
+            Product.objects.create(
+                name=f'Product {i}', description='Test description',
+                price=Decimal('10.00'), stock=5, category=category
+            )
+        # Ties on the sort key are broken by id
+        Product.objects.update(created_at=timezone.now())
+        cls.expected = [
+            product.name for product in Product.objects.order_by('-created_at', '-pk')
+        ]
+
+    def execute(self, query, **variables):
+        return schema.execute(
+            query,
+            variables=variables,
+            context_value=RequestFactory().post('/graphql/')
+        )
+
+    def page(self, **variables):
+        result = self.execute(PAGE_QUERY, **variables)
+        self.assertIsNone(result.errors)
+        connection = result.data['allProducts']
+        return [edge['node']['name'] for edge in connection['edges']], connection['pageInfo']
+
+    def test_forward_pages_cover_every_row_once(self):
+        names, after = [], None
+        while True:
+            page, info = self.page(first=2, after=after)
+            names.extend(page)
+            if not info['hasNextPage']:
+                break
+            after = info['endCursor']
+        self.assertEqual(names, self.expected)
+
+    def test_backward_page_before_cursor(self):
+        _, info = self.page(first=3)
+        names, info = self.page(last=2, before=info['endCursor'])
+        self.assertEqual(names, self.expected[:2])
+        self.assertFalse(info['hasPreviousPage'])
+        self.assertTrue(info['hasNextPage'])
+
+    def test_total_count_is_only_computed_when_selected(self):
+        with self.assertNumQueries(1):
+            self.page(first=2)
+        with self.assertNumQueries(2):
+            result = self.execute('{ allProducts(first: 2) { totalCount edges { cursor } } }')
+        self.assertEqual(result.data['allProducts']['totalCount'], 5)
+
+    def test_invalid_cursor_is_an_error(self):
+        result = self.execute(PAGE_QUERY, first=2, after='not-a-cursor')
+        self.assertEqual(result.errors[0].message, 'Invalid cursor')
@@ -0,0 +1,80 @@
+import json
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from graphql import get_operation_ast, parse
+from products.graphql_cost import CostAnalyzer
+from products.graphql_views import documents
+from products.schema import schema
+
+User = get_user_model()
+
+
+def analyze(query, **variables):
+    document = parse(query)
+    return CostAnalyzer(schema.graphql_schema, document, variables).analyze(
+        get_operation_ast(document)
+    )
+
+
+class CostAnalyzerTests(TestCase):
+    def test_connections_multiply_by_page_size(self):
+        cost, depth = analyze(
+            '{ allProducts(first: 20) { edges { node { name category { name } } } } }'
+        )
+        # allProducts + 20 * (edges + node + category)
+        self.assertEqual(cost, 1 + 20 * 3)
+        self.assertEqual(depth, 5)
+
+    def test_page_size_comes_from_variables_or_defaults(self):
+        query = 'query ($n: Int = 5) { allReviews(first: $n) { edges { node { rating } } } }'
+        self.assertEqual(analyze(query)[0], 1 + 5 * 2)
+        self.assertEqual(analyze(query, n=50)[0], 1 + 50 * 2)
+
+    def test_fragments_are_expanded(self):
+        cost, _ = analyze('''
+            fragment card on ProductType { name images { altText } }
+            { featuredProducts { ...card } }
+        ''')
+        # featuredProducts and images are lists: 1 + 10 * (images: 1 + 10 * 0)
+        self.assertEqual(cost, 1 + 10 * 1)
+
+    def test_introspection_is_free(self):
+        self.assertEqual(analyze('{ __schema { types { name fields { name } } } }')[0], 0)
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        documents.clear()
+        self.url = reverse('graphql')
+
+    def post(self, query):
+        return self.client.post(
+            self.url, json.dumps({'query': query}), content_type='application/json'
+        )
+
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post('{ allCategories(first: 3) { edges { node { name } } } }')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['extensions']['cost']['cost'], 1 + 3 * 2)
+
+    def test_expensive_query_is_rejected_before_execution(self):
+        page = 'allReviews(first: 100) { edges { node { product { images { altText } } } } }'
+        query = f'{{ a: {page} b: {page} c: {page} }}'
+        with self.assertNumQueries(0):
+            response = self.post(query)
+        self.assertEqual(response.status_code, 400)
+        error = response.json()['errors'][0]
+        self.assertEqual(error['extensions']['code'], 'QUERY_TOO_COMPLEX')
+        self.assertGreater(error['extensions']['cost'], 1000)
+
+    def test_staff_get_a_larger_budget(self):
+        staff = User.objects.create_user(
+            email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.client.force_login(staff)
+        page = 'allReviews(first: 100) { edges { node { product { images { altText } } } } }'
+        query = f'{{ a: {page} b: {page} c: {page} }}'
+        self.assertEqual(self.post(query).status_code, 200)
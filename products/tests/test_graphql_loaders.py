@@ -0,0 +1,86 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from products.models import Category, Product, ProductImage, Review
+from products.schema import schema
+
+User = get_user_model()
+
+PRODUCTS_QUERY = '''
+query ($first: Int) {
+  allProducts(first: $first) {
+    edges { node { name averageRating reviewCount category { name } images { altText } } }
+  }
+}
+'''
+
+REVIEWS_QUERY = '''
+query ($first: Int) {
+  allReviews(first: $first) {
+    edges { node { rating product { name reviewCount category { name } images { altText } } } }
+  }
+}
+'''
+
+
+class GraphQLBatchLoaderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create_user(email=f'user{i}@example.com', password='testpass123')
+            for i in range(2)
+        ]
+        for i in range(6):
+            category = Category.objects.create(name=f'Category {i}')
+            product = Product.objects.create(
+                name=f'Product {i}', description='Test description',
+                price=Decimal('10.00'), stock=5, category=category,
+                featured=i % 2 == 0
+            )
+            ProductImage.objects.create(product=product, image='p.jpg', alt_text=f'Image {i}')
+            for rating, user in enumerate(users, start=3):
+                Review.objects.create(product=product, user=user, rating=rating)
+
+    def execute(self, query, **variables):
+        result = schema.execute(
+            query,
+            variables=variables,
+            context_value=RequestFactory().post('/graphql/')
+        )
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_product_page_query_count_is_independent_of_page_size(self):
+        for first in (2, 6):
+            with self.assertNumQueries(3):
+                data = self.execute(PRODUCTS_QUERY, first=first)
+            self.assertEqual(len(data['allProducts']['edges']), first)
+
+        node = data['allProducts']['edges'][0]['node']
+        self.assertEqual(node['reviewCount'], 2)
+        self.assertEqual(node['averageRating'], 3.5)
+        self.assertEqual(len(node['images']), 1)
+        self.assertTrue(node['category']['name'].startswith('Category'))
+
+    def test_review_page_query_count_is_independent_of_page_size(self):
+        for first in (2, 12):
+            with self.assertNumQueries(3):
+                data = self.execute(REVIEWS_QUERY, first=first)
+            self.assertEqual(len(data['allReviews']['edges']), first)
+        self.assertEqual(data['allReviews']['edges'][0]['node']['product']['reviewCount'], 2)
+
+    def test_featured_and_slug_lookups_are_batched(self):
+        with self.assertNumQueries(3):
+            data = self.execute(
+                '{ featuredProducts { name reviewCount category { name } images { altText } } }'
+            )
+        self.assertEqual(len(data['featuredProducts']), 3)
+
+        slug = Product.objects.get(name='Product 1').slug
+        with self.assertNumQueries(3):
+            data = self.execute(
+                'query ($slug: String!) { productBySlug(slug: $slug) '
+                '{ name averageRating category { name } images { altText } } }',
+                slug=slug
+            )
+        self.assertEqual(data['productBySlug']['category']['name'], 'Category 1')
@@ -0,0 +1,103 @@
+import hashlib
+import json
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from products.graphql_views import documents, persisted_query_key
+from products.models import Category, Product, ProductImage
+
+User = get_user_model()
+
+QUERY = '{ featuredProducts { name price } }'
+QUERY_HASH = hashlib.sha256(QUERY.encode()).hexdigest()
+
+
+class PersistedQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        documents.clear()
+        self.url = reverse('graphql')
+        self.category = Category.objects.create(name='Phones')
+        self.product = Product.objects.create(
+            name='Phone', description='Test description',
+            price=Decimal('100.00'), stock=5, category=self.category,
+            featured=True
+        )
+
+    def post(self, query=None, sha256_hash=QUERY_HASH, **variables):
+        body = {'variables': variables}
+        if query is not None:
+            body['query'] = query
+        if sha256_hash:
+            body['extensions'] = {'persistedQuery': {'version': 1, 'sha256Hash': sha256_hash}}
+        return self.client.post(self.url, json.dumps(body), content_type='application/json')
+
+    def test_unknown_hash_asks_for_the_query(self):
+        response = self.post()
+        self.assertEqual(response.json()['errors'][0]['message'], 'PersistedQueryNotFound')
+
+    def test_registered_hash_runs_without_query_text(self):
+        self.post(QUERY)
+        response = self.post()
+        self.assertEqual(response.json()['data']['featuredProducts'][0]['name'], 'Phone')
+
+    @mock.patch('products.graphql_views.PERSISTED_QUERY_TIMEOUT', 60)
+    def test_registered_documents_expire_unless_used(self):
+        key = persisted_query_key(QUERY_HASH)
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.post(QUERY)
+        add.assert_any_call(key, QUERY, timeout=60)
+        with mock.patch.object(cache, 'touch', wraps=cache.touch) as touch:
+            self.post()
+        touch.assert_any_call(key, 60)
+
+    def test_mismatched_hash_is_rejected_and_not_registered(self):
+        response = self.post('{ featuredProducts { name } }')
+        self.assertIn('errors', response.json())
+        self.assertEqual(self.post().json()['errors'][0]['message'], 'PersistedQueryNotFound')
+
+    def test_invalid_document_is_not_registered(self):
+        query = '{ featuredProducts { missingField } }'
+        sha256_hash = hashlib.sha256(query.encode()).hexdigest()
+        self.assertIn('errors', self.post(query, sha256_hash).json())
+        response = self.post(sha256_hash=sha256_hash)
+        self.assertEqual(response.json()['errors'][0]['message'], 'PersistedQueryNotFound')
+
+    def test_anonymous_response_is_served_from_cache(self):
+        self.post(QUERY)
+        with self.assertNumQueries(0):
+            response = self.post()
+        self.assertEqual(response.json()['data']['featuredProducts'][0]['price'], '100.00')
+
+    def test_product_change_invalidates_cached_response(self):
+        self.post(QUERY)
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('90.00'))
+        response = self.post()
+        self.assertEqual(response.json()['data']['featuredProducts'][0]['price'], '90.00')
+
+    def test_image_change_invalidates_cached_response(self):
+        query = '{ featuredProducts { name images { altText } } }'
+        sha256_hash = hashlib.sha256(query.encode()).hexdigest()
+        self.post(query, sha256_hash=sha256_hash)
+        image = ProductImage.objects.create(
+            product=self.product, image='product_images/front.jpg', alt_text='Front'
+        )
+        response = self.post(sha256_hash=sha256_hash)
+        self.assertEqual(response.json()['data']['featuredProducts'][0]['images'], [{'altText': 'Front'}])
+        image.delete()
+        response = self.post(sha256_hash=sha256_hash)
+        self.assertEqual(response.json()['data']['featuredProducts'][0]['images'], [])
+
+    def test_plain_queries_still_work(self):
+        response = self.post(QUERY, sha256_hash=None)
+        self.assertEqual(response.json()['data']['featuredProducts'][0]['name'], 'Phone')
+
+    def test_authenticated_requests_bypass_response_cache(self):
+        user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.client.force_login(user)
+        self.post(QUERY)
+        with self.assertNumQueries(3):
+            self.post()
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from products.models import PriceHistory, Product
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Redmi Note',
+            description='Test description',
+            price=Decimal('200.00'),
+            stock=5
+        )
+
+    def prices(self, product=None):
+        return list(
+            PriceHistory.objects.filter(
+                product=product or self.product
+            ).values_list('previous_price', 'price')
+        )
+
+    def test_creation_records_initial_price(self):
+        self.assertEqual(self.prices(), [(None, Decimal('200.00'))])
+
+    def test_save_records_only_price_changes(self):
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock = 3
+        product.save()
+        product.price = Decimal('180.00')
+        product.save()
+        self.assertEqual(self.prices(), [
+            (None, Decimal('200.00')),
+            (Decimal('200.00'), Decimal('180.00')),
+        ])
+
+    def test_queryset_update_records_history(self):
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('150.00'))
+        self.assertEqual(self.prices()[-1], (Decimal('200.00'), Decimal('150.00')))
+
+    def test_stock_only_update_is_a_single_statement(self):
+        with self.assertNumQueries(1):
+            Product.objects.filter(pk=self.product.pk).update(stock=F('stock') - 1)
+        self.assertEqual(self.prices(), [(None, Decimal('200.00'))])
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.stock, 4)
+        self.assertGreater(product.updated_at, self.product.updated_at)
+
+    def test_bulk_paths_record_history(self):
+        created = Product.objects.bulk_create([
+            Product(name='Bulk A', slug='bulk-a', description='x', price=Decimal('10.00')),
+        ])
+        self.assertEqual(self.prices(created[0]), [(None, Decimal('10.00'))])
+
+        product = Product.objects.get(pk=self.product.pk)
+        product.price = Decimal('190.00')
+        Product.objects.bulk_update([product], ['price'])
+        self.assertEqual(self.prices()[-1], (Decimal('200.00'), Decimal('190.00')))
+
+    def test_entries_are_append_only(self):
+        entry = PriceHistory.objects.get(product=self.product)
+        entry.price = Decimal('1.00')
+        with self.assertRaises(ValidationError):
+            entry.save()
+
+    def test_price_history_endpoint_downsamples(self):
+        now = timezone.now()
+        PriceHistory.objects.bulk_create([
+            PriceHistory(
+                product=self.product,
+                price=Decimal(100 + hour),
+                recorded_at=now - timedelta(hours=hour)
+            )
+            for hour in range(1, 72)
+        ])
+        url = reverse('products:products-api:product-price-history', args=[self.product.slug])
+        response = APIClient().get(url, {
+            'start': (now - timedelta(days=3)).isoformat(),
+            'points': 10,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['interval'], 'day')
+        self.assertLessEqual(len(response.data['points']), 10)
+        self.assertEqual(response.data['points'][-1]['max'], Decimal('200.00'))
+
+    def test_price_history_endpoint_rejects_impossible_dates(self):
+        url = reverse('products:products-api:product-price-history', args=[self.product.slug])
+        response = APIClient().get(url, {'start': '2024-02-30T00:00'})
+        self.assertEqual(response.status_code, 400)
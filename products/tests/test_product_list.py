@@ -0,0 +1,73 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from products import views
+from products.models import Category, Product
+
+
+class ProductListViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.phones = Category.objects.create(name='Phones')
+        self.laptops = Category.objects.create(name='Laptops')
+        for i in range(5):
+            Product.objects.create(
+                name=f'Phone {i}', description='Test description',
+                price=100, stock=1, category=self.phones
+            )
+            Product.objects.create(
+                name=f'Laptop {i}', description='Test description',
+                price=500, stock=1, category=self.laptops
+            )
+
+    def _names(self, response):
+        return [product.name for product in response.context['products']]
+
+    @mock.patch.object(views, 'PRODUCT_LIST_PAGE_SIZE', 3)
+    def test_cursor_walks_the_filtered_listing(self):
+        url = reverse('products:list')
+        response = self.client.get(url, {'category': self.phones.slug})
+        seen = self._names(response)
+        while response.context['next_query']:
+            self.assertIn(f'category={self.phones.slug}', response.context['next_query'])
+            response = self.client.get(f"{url}?{response.context['next_query']}")
+            seen += self._names(response)
+        self.assertEqual(seen, [f'Phone {i}' for i in reversed(range(5))])
+
+    @mock.patch.object(views, 'PRODUCT_LIST_PAGE_SIZE', 3)
+    def test_query_count_does_not_depend_on_depth(self):
+        url = reverse('products:list')
+        first = self.client.get(url)
+        second_url = f"{url}?{first.context['next_query']}"
+        self.client.get(second_url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(second_url)
+
+    @mock.patch.object(views, 'PRODUCT_LIST_PAGE_SIZE', 4)
+    def test_fragment_returns_next_batch_of_cards(self):
+        response = self.client.get(reverse('products:list-fragment'), {'q': 'Laptop'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'class="product-card"', count=4)
+        self.assertNotContains(response, '<html')
+
+        response = self.client.get(response['X-Next-Url'])
+        self.assertContains(response, 'class="product-card"', count=1)
+        self.assertFalse(response.has_header('X-Next-Url'))
+
+    def test_sidebar_shows_category_changes(self):
+        url = reverse('products:list')
+        self.assertContains(self.client.get(url), f'value="{self.phones.slug}"')
+        self.phones.name = 'Mobiles'
+        self.phones.slug = 'mobiles'
+        self.phones.save()
+        Category.objects.create(name='Tablets')
+        response = self.client.get(url)
+        self.assertContains(response, 'value="mobiles"')
+        self.assertContains(response, 'value="tablets"')
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('products:list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
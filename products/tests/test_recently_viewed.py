@@ -0,0 +1,98 @@
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products import recently_viewed
+from products.models import Category, Product
+
+User = get_user_model()
+
+
+class RecentlyViewedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='viewer@example.com', password='testpass123'
+        )
+        category = Category.objects.create(name='Phones')
+        self.products = [
+            Product.objects.create(
+                name=f'Phone {i}', description='Test description',
+                price=Decimal('100.00'), stock=5, category=category
+            )
+            for i in range(5)
+        ]
+
+    def _view(self, client, product):
+        return client.get(reverse('products:detail', args=[product.slug]))
+
+    def _request(self, client, user=None):
+        request = RequestFactory().get('/')
+        request.COOKIES = {
+            key: morsel.value for key, morsel in client.cookies.items()
+        }
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_list_is_deduplicated_and_newest_first(self):
+        for product in (self.products[0], self.products[1], self.products[0]):
+            self._view(self.client, product)
+        ids = recently_viewed.get_recently_viewed_ids(self._request(self.client))
+        self.assertEqual(ids, [self.products[0].id, self.products[1].id])
+
+    @mock.patch.object(recently_viewed, 'RECENTLY_VIEWED_LIMIT', 3)
+    def test_list_is_capped(self):
+        for product in self.products:
+            self._view(self.client, product)
+        ids = recently_viewed.get_recently_viewed_ids(self._request(self.client))
+        self.assertEqual(ids, [product.id for product in reversed(self.products[2:])])
+
+    def test_detail_page_shows_other_recent_products(self):
+        self._view(self.client, self.products[0])
+        response = self._view(self.client, self.products[1])
+        self.assertEqual(len(response.context['recent_cards']), 1)
+        self.assertIn(self.products[0].name, response.context['recent_cards'][0])
+
+    def test_hydration_is_one_query(self):
+        for product in self.products:
+            self._view(self.client, product)
+        request = self._request(self.client)
+        with self.assertNumQueries(1):
+            products = recently_viewed.get_recently_viewed(request)
+        self.assertEqual(len(products), 5)
+
+    def test_visitor_history_merges_into_account_at_login(self):
+        cache.set('recently_viewed_user_%s' % self.user.pk, [self.products[4].id])
+        self._view(self.client, self.products[0])
+        self._view(self.client, self.products[1])
+
+        user_logged_in.send(
+            sender=User, request=self._request(self.client), user=self.user
+        )
+        ids = recently_viewed.get_recently_viewed_ids(
+            self._request(APIClient(), user=self.user)
+        )
+        self.assertEqual(
+            ids, [self.products[1].id, self.products[0].id, self.products[4].id]
+        )
+
+    def test_api_clients_merge_lazily_and_drop_the_cookie(self):
+        client = APIClient()
+        client.get(reverse('products:products-api:product-detail', args=[self.products[0].slug]))
+        self.assertIn(recently_viewed.VISITOR_COOKIE, client.cookies)
+
+        client.force_authenticate(user=self.user)
+        response = client.get(
+            reverse('products:products-api:product-detail', args=[self.products[1].slug])
+        )
+        self.assertEqual(response.cookies[recently_viewed.VISITOR_COOKIE].value, '')
+
+        response = client.get(reverse('products:products-api:product-recently-viewed'))
+        self.assertEqual(
+            [product['name'] for product in response.data], ['Phone 1', 'Phone 0']
+        )
@@ -0,0 +1,102 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from products import review_ingest
+from products.models import Product, Review
+
+User = get_user_model()
+
+
+class ReviewIngestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(
+            email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        self.phone = Product.objects.create(
+            name='Phone', description='Test description', price=100, stock=5
+        )
+        self.laptop = Product.objects.create(
+            name='Laptop', description='Test description', price=500, stock=5
+        )
+        Review.objects.create(
+            product=self.phone, user=self.users[0], rating=1, comment='Original'
+        )
+        self.url = reverse('products:review-bulk-ingest')
+        self.rows = [
+            {'product': 'phone', 'user': 'user0@example.com', 'rating': 5, 'comment': 'Imported'},
+            {'product': 'phone', 'user': 'user1@example.com', 'rating': 4,
+             'created_at': '2020-01-02T03:04:05Z'},
+            {'product': 'laptop', 'user': 'user2@example.com', 'rating': 3},
+            {'product': 'tablet', 'user': 'user2@example.com', 'rating': 3},
+        ]
+
+    def _post(self, **payload):
+        self.client.force_authenticate(user=self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, payload, format='json')
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(user=self.users[0])
+        response = self.client.post(self.url, {'reviews': self.rows}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_skip_keeps_existing_reviews(self):
+        response = self._post(reviews=self.rows)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['created'], response.data['updated'], response.data['skipped']),
+            (2, 0, 1)
+        )
+        self.assertEqual(response.data['missing'][0]['reason'], 'unknown product')
+        self.assertEqual(
+            Review.objects.get(product=self.phone, user=self.users[0]).comment, 'Original'
+        )
+        imported = Review.objects.get(product=self.phone, user=self.users[1])
+        self.assertEqual(imported.created_at.year, 2020)
+
+    def test_update_overwrites_conflicts(self):
+        response = self._post(reviews=self.rows, on_conflict='update')
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 1))
+        review = Review.objects.get(product=self.phone, user=self.users[0])
+        self.assertEqual((review.rating, review.comment), (5, 'Imported'))
+        self.assertEqual(Review.objects.count(), 3)
+
+    def test_aggregates_recomputed_once_per_batch(self):
+        stats_url = reverse('products:products-api:product-stats', args=['phone'])
+        self.client.get(stats_url)
+        with mock.patch.object(
+            review_ingest, 'bump_review_versions', wraps=review_ingest.bump_review_versions
+        ) as bump:
+            self._post(reviews=self.rows, on_conflict='update')
+        bump.assert_called_once()
+        self.assertEqual(set(bump.call_args[0][0]), {self.phone.id, self.laptop.id})
+
+        stats = self.client.get(stats_url).data
+        self.assertEqual(stats['review_count'], 2)
+        self.assertEqual(stats['average_rating'], 4.5)
+
+    def test_import_command_reads_csv_in_batches(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write('product,user,rating,comment\n')
+            source.write('phone,user1@example.com,4,Nice\n')
+            source.write('laptop,user2@example.com,9,Broken rating\n')
+            source.write('laptop,user1@example.com,2,Meh\n')
+        self.addCleanup(os.unlink, source.name)
+
+        out, err = StringIO(), StringIO()
+        call_command('import_reviews', source.name, '--batch-size', '1', stdout=out, stderr=err)
+        self.assertIn('2 created', out.getvalue())
+        self.assertIn('1 invalid', out.getvalue())
+        self.assertIn('Row 2', err.getvalue())
+        self.assertEqual(Review.objects.count(), 3)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from products.models import Product, Review
+
+User = get_user_model()
+
+
+class ReviewCursorPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name='Phone', description='Test description', price=100, stock=5
+        )
+        now = timezone.now()
+        ratings = [5, 3, 5, 1, 4, 3, 5]
+        for i, rating in enumerate(ratings):
+            review = Review.objects.create(
+                product=self.product,
+                user=User.objects.create_user(
+                    email=f'user{i}@example.com', password='testpass123'
+                ),
+                rating=rating,
+                comment=f'Review {i}'
+            )
+            Review.objects.filter(pk=review.pk).update(
+                created_at=now - timedelta(hours=len(ratings) - i)
+            )
+        self.url = reverse(
+            'products:products-api:product-reviews-list',
+            kwargs={'product_slug': self.product.slug}
+        )
+
+    def _walk(self, **params):
+        response = self.client.get(self.url, {'page_size': 3, **params})
+        self.assertNotIn('count', response.data)
+        seen = [review['comment'] for review in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [review['comment'] for review in response.data['results']]
+        return seen
+
+    def test_newest_first_by_default(self):
+        self.assertEqual(self._walk(), [f'Review {i}' for i in reversed(range(7))])
+
+    def test_rating_sorted_cursor_breaks_ties_by_recency(self):
+        self.assertEqual(
+            self._walk(sort='highest'),
+            ['Review 6', 'Review 2', 'Review 0', 'Review 4',
+             'Review 5', 'Review 1', 'Review 3']
+        )
+        self.assertEqual(
+            self._walk(sort='lowest'),
+            ['Review 3', 'Review 1', 'Review 5', 'Review 4',
+             'Review 0', 'Review 2', 'Review 6']
+        )
+
+    def test_unknown_sort_and_bad_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'sort': 'rating'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'nope'}).status_code, 404)
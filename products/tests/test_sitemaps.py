@@ -0,0 +1,85 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from products import sitemaps
+from products.models import Category, Product
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Phones')
+        self.products = [
+            Product.objects.create(
+                name=f'Phone {i}',
+                description='Test description',
+                price=100 + i,
+                stock=5,
+                category=self.category
+            )
+            for i in range(3)
+        ]
+
+    def _content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_index_lists_product_and_category_chunks(self):
+        response = self.client.get(reverse('sitemap-index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/sitemaps/products-0.xml', response.content.decode())
+        self.assertIn('/sitemaps/categories-0.xml', response.content.decode())
+
+    def test_products_are_split_into_chunks(self):
+        with mock.patch.object(sitemaps, 'SITEMAP_CHUNK_SIZE', 2):
+            chunks = sitemaps.product_chunks()
+        self.assertEqual(sum(count for count, _ in chunks.values()), 3)
+        self.assertTrue(all(count <= 2 for count, _ in chunks.values()))
+
+    def test_chunk_contains_detail_urls_with_lastmod(self):
+        response = self.client.get(reverse('sitemap-products', args=[0]))
+        content = self._content(response)
+        for product in self.products:
+            self.assertIn(f'/products/products/{product.slug}/', content)
+        self.assertIn('<lastmod>', content)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_unavailable_products_are_excluded(self):
+        hidden = self.products[0]
+        hidden.available = False
+        hidden.save()
+        content = self._content(
+            self.client.get(reverse('sitemap-products', args=[0]))
+        )
+        self.assertNotIn(f'/{hidden.slug}/', content)
+
+    def test_chunk_is_regenerated_when_a_product_changes(self):
+        url = reverse('sitemap-products', args=[0])
+        self._content(self.client.get(url))
+        with self.assertNumQueries(1):
+            self._content(self.client.get(url))
+
+        product = self.products[1]
+        product.slug = 'renamed-phone'
+        product.save()
+        self.assertIn('/renamed-phone/', self._content(self.client.get(url)))
+
+    def test_category_chunk_is_regenerated_when_a_category_is_renamed(self):
+        url = reverse('sitemap-categories', args=[0])
+        self.assertIn('?category=phones', self._content(self.client.get(url)))
+
+        self.category.slug = 'mobiles'
+        self.category.save()
+        content = self._content(self.client.get(url))
+        self.assertIn('?category=mobiles', content)
+        self.assertNotIn('?category=phones', content)
+
+    def test_category_chunk_without_a_category_version(self):
+        with mock.patch.object(sitemaps, 'get_versions', return_value=[0]):
+            response = self.client.get(reverse('sitemap-categories', args=[0]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('?category=phones', self._content(response))
+
+    def test_missing_chunk_returns_404(self):
+        response = self.client.get(reverse('sitemap-products', args=[99]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,237 @@
+from decimal import Decimal
+from threading import Thread
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+
+from products.models import Product
+from products.stock import (
+    LocalStockCounter,
+    OutOfStock,
+    RedisStockCounter,
+    restock,
+    stock_transaction,
+    take_stock,
+)
+from products.tests.utils import redis_client
+
+
+class TakeStockTests(TestCase):
+    def setUp(self):
+        self.phone = Product.objects.create(name='Phone', price=Decimal('100.00'), stock=5)
+        self.case = Product.objects.create(name='Case', price=Decimal('10.00'), stock=1)
+
+    def stock(self):
+        return dict(Product.objects.values_list('name', 'stock'))
+
+    def test_takes_every_product_in_one_update(self):
+        take_stock({self.phone.pk: 2, self.case.pk: 1})
+        self.assertEqual(self.stock(), {'Phone': 3, 'Case': 0})
+
+    def test_takes_nothing_when_a_product_is_short(self):
+        with self.assertRaises(OutOfStock) as raised:
+            with transaction.atomic():
+                take_stock({self.phone.pk: 2, self.case.pk: 2})
+        self.assertEqual(raised.exception.products, {self.case.pk: 'Case'})
+        self.assertEqual(self.stock(), {'Phone': 5, 'Case': 1})
+
+    def test_hot_products_are_taken_from_the_database_without_a_counter(self):
+        Product.objects.filter(pk=self.phone.pk).update(hot=True)
+        with mock.patch('products.stock.STOCK_COUNTER_BACKEND', None):
+            with stock_transaction({self.phone.pk: 2}):
+                pass
+        self.assertEqual(self.stock(), {'Phone': 3, 'Case': 1})
+
+    def test_restock_adds_back(self):
+        restock({self.phone.pk: 2, self.case.pk: 3})
+        self.assertEqual(self.stock(), {'Phone': 7, 'Case': 4})
+
+
+class StockCounterTests(TestCase):
+    def setUp(self):
+        self.counter = LocalStockCounter()
+        self.drop = Product.objects.create(
+            name='Sneaker', price=Decimal('200.00'), stock=10, hot=True
+        )
+
+    def counts(self):
+        return self.counter.counts[self.drop.pk]
+
+    def test_reserve_loads_from_the_database(self):
+        self.counter.reserve({self.drop.pk: 3})
+        self.assertEqual(self.counts(), [7, 3, 0])
+
+    def test_reserve_is_all_or_nothing(self):
+        other = Product.objects.create(name='Hoodie', price=Decimal('80.00'), stock=1, hot=True)
+        with self.assertRaises(OutOfStock) as raised:
+            self.counter.reserve({self.drop.pk: 3, other.pk: 2})
+        self.assertEqual(raised.exception.products, {other.pk: 'Hoodie'})
+        self.assertEqual(self.counts(), [10, 0, 0])
+
+    def test_commit_and_release(self):
+        self.counter.reserve({self.drop.pk: 4})
+        self.counter.commit({self.drop.pk: 3})
+        self.counter.release({self.drop.pk: 1})
+        self.assertEqual(self.counts(), [7, 0, 3])
+
+    def test_never_oversells_under_contention(self):
+        self.counter.load(self.drop.pk, 10)
+        sold = []
+
+        def buy():
+            # The atomic step of reserve(), without its database lookups
+            if self.counter._reserve({self.drop.pk: 1}) is None:
+                sold.append(1)
+
+        threads = [Thread(target=buy) for _ in range(25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(sold), 10)
+        self.assertEqual(self.counts(), [0, 10, 0])
+
+    def test_reconcile_writes_sales_and_picks_up_restocks(self):
+        self.counter.reserve({self.drop.pk: 4})
+        self.counter.commit({self.drop.pk: 3})
+        Product.objects.filter(pk=self.drop.pk).update(stock=15)
+
+        self.assertEqual(self.counter.reconcile(), 1)
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 12)
+        # One unit is still held by a checkout in progress
+        self.assertEqual(self.counts(), [11, 1, 0])
+
+    def test_reconcile_reports_stock_lowered_below_sales(self):
+        self.counter.reserve({self.drop.pk: 4})
+        self.counter.commit({self.drop.pk: 4})
+        Product.objects.filter(pk=self.drop.pk).update(stock=3)
+
+        with self.assertLogs('products.stock', 'ERROR') as logs:
+            self.counter.reconcile()
+        self.assertIn('oversold by 1', logs.output[0])
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 0)
+        self.assertEqual(self.counts(), [0, 0, 0])
+
+    def test_reconcile_drops_products_no_longer_hot(self):
+        self.counter.reserve({self.drop.pk: 2})
+        self.counter.commit({self.drop.pk: 2})
+        Product.objects.filter(pk=self.drop.pk).update(hot=False)
+
+        self.counter.reconcile()
+        self.assertEqual(self.counter.tracked(), [])
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 8)
+
+    def test_stock_transaction_commits_hot_and_takes_others(self):
+        plain = Product.objects.create(name='Socks', price=Decimal('5.00'), stock=4)
+        with mock.patch('products.stock._counter', self.counter):
+            with stock_transaction({self.drop.pk: 2, plain.pk: 1}):
+                pass
+        self.assertEqual(self.counts(), [8, 0, 2])
+        plain.refresh_from_db()
+        self.assertEqual(plain.stock, 3)
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 10)
+
+    def test_stock_transaction_releases_when_the_rest_runs_out(self):
+        plain = Product.objects.create(name='Socks', price=Decimal('5.00'), stock=0)
+        with mock.patch('products.stock._counter', self.counter):
+            with self.assertRaises(OutOfStock):
+                with stock_transaction({self.drop.pk: 2, plain.pk: 1}):
+                    pass
+        self.assertEqual(self.counts(), [10, 0, 0])
+
+    def test_stock_transaction_releases_when_the_transaction_fails(self):
+        plain = Product.objects.create(name='Socks', price=Decimal('5.00'), stock=4)
+        with mock.patch('products.stock._counter', self.counter):
+            with self.assertRaises(RuntimeError):
+                with stock_transaction({self.drop.pk: 2, plain.pk: 1}):
+                    raise RuntimeError
+        self.assertEqual(self.counts(), [10, 0, 0])
+        plain.refresh_from_db()
+        self.assertEqual(plain.stock, 4)
+
+
+class RedisStockCounterTests(TestCase):
+    def setUp(self):
+        redis = redis_client(self, 'stock:*')
+        with mock.patch('django_redis.get_redis_connection', return_value=redis):
+            self.counter = RedisStockCounter()
+        self.redis = redis
+        self.drop = Product.objects.create(
+            name='Sneaker', price=Decimal('200.00'), stock=10, hot=True
+        )
+
+    def counts(self, product=None):
+        product_id = (product or self.drop).pk
+        return [
+            int(self.redis.get(RedisStockCounter.key(product_id, count)) or 0)
+            for count in ('available', 'held', 'sold')
+        ]
+
+    def test_reserve_loads_from_the_database(self):
+        self.counter.reserve({self.drop.pk: 3})
+        self.assertEqual(self.counts(), [7, 3, 0])
+        self.assertEqual(self.counter.tracked(), [self.drop.pk])
+
+    def test_reserve_is_all_or_nothing(self):
+        other = Product.objects.create(name='Hoodie', price=Decimal('80.00'), stock=1, hot=True)
+        self.counter.load(other.pk, 1)
+        with self.assertRaises(OutOfStock) as raised:
+            self.counter.reserve({self.drop.pk: 3, other.pk: 2})
+        self.assertEqual(raised.exception.products, {other.pk: 'Hoodie'})
+        self.assertEqual(self.counts(), [10, 0, 0])
+        self.assertEqual(self.counts(other), [1, 0, 0])
+
+    def test_commit_and_release(self):
+        self.counter.reserve({self.drop.pk: 4})
+        self.counter.commit({self.drop.pk: 3})
+        self.counter.release({self.drop.pk: 1})
+        self.assertEqual(self.counts(), [7, 0, 3])
+
+    def test_release_leaves_an_unloaded_count_to_the_next_load(self):
+        self.counter.reserve({self.drop.pk: 4})
+        self.redis.delete(RedisStockCounter.key(self.drop.pk, 'available'))
+        self.counter.release({self.drop.pk: 4})
+        self.assertIsNone(self.redis.get(RedisStockCounter.key(self.drop.pk, 'available')))
+        self.counter.load(self.drop.pk, 10)
+        self.assertEqual(self.counts(), [10, 0, 0])
+
+    def test_load_keeps_a_count_another_worker_loaded(self):
+        self.counter.reserve({self.drop.pk: 4})
+        self.counter.load(self.drop.pk, 10)
+        self.assertEqual(self.counts(), [6, 4, 0])
+
+    def test_reconcile_writes_sales_and_picks_up_restocks(self):
+        self.counter.reserve({self.drop.pk: 4})
+        self.counter.commit({self.drop.pk: 3})
+        Product.objects.filter(pk=self.drop.pk).update(stock=15)
+
+        self.assertEqual(self.counter.reconcile(), 1)
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 12)
+        self.assertEqual(self.counts(), [11, 1, 0])
+
+    def test_reconcile_drops_products_no_longer_hot(self):
+        self.counter.reserve({self.drop.pk: 2})
+        self.counter.commit({self.drop.pk: 2})
+        Product.objects.filter(pk=self.drop.pk).update(hot=False)
+
+        self.counter.reconcile()
+        self.assertEqual(self.counter.tracked(), [])
+        self.assertEqual(list(self.redis.scan_iter('stock:*')), [])
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 8)
+
+    def test_stock_transaction_commits_after_the_transaction(self):
+        with mock.patch('products.stock._counter', self.counter):
+            with self.assertRaises(RuntimeError):
+                with stock_transaction({self.drop.pk: 2}):
+                    raise RuntimeError
+            self.assertEqual(self.counts(), [10, 0, 0])
+            with stock_transaction({self.drop.pk: 2}):
+                self.assertEqual(self.counts(), [8, 2, 0])
+        self.assertEqual(self.counts(), [8, 0, 2])
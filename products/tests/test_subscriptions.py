@@ -0,0 +1,112 @@
+from decimal import Decimal
+from smtplib import SMTPException
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products import tasks
+from products.models import Product, ProductSubscription
+from products.stock import restock
+
+User = get_user_model()
+
+
+class ProductSubscriptionTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Galaxy S24',
+            description='Test description',
+            price=Decimal('1000.00'),
+            stock=0
+        )
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', password='pass1234')
+            for i in range(3)
+        ]
+
+    def subscribe(self, user, kind, target_price=None):
+        return ProductSubscription.objects.create(
+            user=user, product=self.product, kind=kind, target_price=target_price
+        )
+
+    def test_price_drop_matches_with_range_query(self):
+        self.subscribe(self.users[0], ProductSubscription.Kind.PRICE_DROP, Decimal('900.00'))
+        self.subscribe(self.users[1], ProductSubscription.Kind.PRICE_DROP, Decimal('800.00'))
+        matched = ProductSubscription.matching(
+            self.product.id, ProductSubscription.Kind.PRICE_DROP, Decimal('850.00')
+        )
+        self.assertEqual([s.user for s in matched], [self.users[0]])
+
+    def test_events_are_queued_after_commit(self):
+        with mock.patch.object(tasks, 'enqueue_product_event') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                product = Product.objects.get(pk=self.product.pk)
+                product.price = Decimal('900.00')
+                product.stock = 5
+                product.save()
+        kinds = [call.args[1] for call in enqueue.call_args_list]
+        self.assertEqual(kinds, [
+            ProductSubscription.Kind.PRICE_DROP,
+            ProductSubscription.Kind.RESTOCK,
+        ])
+
+    def test_bulk_restock_queues_event(self):
+        with mock.patch.object(tasks, 'enqueue_product_event') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                restock({self.product.pk: 3})
+        enqueue.assert_called_once_with(self.product.id, ProductSubscription.Kind.RESTOCK)
+
+    def test_fan_out_notifies_each_subscriber_once(self):
+        for user in self.users:
+            self.subscribe(user, ProductSubscription.Kind.RESTOCK)
+
+        with mock.patch.object(tasks, 'SUBSCRIPTION_BATCH_SIZE', 2), \
+                mock.patch.object(tasks.notify_subscribers, 'delay',
+                                  side_effect=tasks.notify_subscribers) as delay:
+            self.assertEqual(
+                tasks.fan_out_product_event(self.product.id, ProductSubscription.Kind.RESTOCK), 3
+            )
+            self.assertEqual(delay.call_count, 2)
+            # A duplicate event finds no active subscriptions left
+            tasks.fan_out_product_event(self.product.id, ProductSubscription.Kind.RESTOCK)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(ProductSubscription.objects.filter(is_active=True).exists())
+
+    def test_failed_send_reactivates_the_batch(self):
+        subscriptions = [
+            self.subscribe(user, ProductSubscription.Kind.RESTOCK) for user in self.users
+        ]
+        ids = [subscription.id for subscription in subscriptions]
+        with mock.patch.object(tasks, 'send_mass_mail', side_effect=SMTPException):
+            with self.assertRaises(SMTPException):
+                tasks.notify_subscribers(ids, self.product.id, ProductSubscription.Kind.RESTOCK)
+        self.assertEqual(ProductSubscription.objects.filter(is_active=True).count(), 3)
+
+        # The retry notifies everyone
+        tasks.notify_subscribers(ids, self.product.id, ProductSubscription.Kind.RESTOCK)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_product_deleted_before_sending_is_skipped(self):
+        ids = [self.subscribe(self.users[0], ProductSubscription.Kind.RESTOCK).id]
+        product_id = self.product.id
+        self.product.delete()
+        with mock.patch.object(tasks.notify_subscribers, 'retry') as retry:
+            self.assertEqual(
+                tasks.notify_subscribers(ids, product_id, ProductSubscription.Kind.RESTOCK), 0
+            )
+        retry.assert_not_called()
+        self.assertEqual(mail.outbox, [])
+
+    def test_subscribe_endpoint_defaults_target_price(self):
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+        response = client.post(
+            reverse('products:products-api:subscription-list'),
+            {'product': self.product.slug, 'kind': 'PRICE_DROP'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['target_price'], '999.99')
@@ -0,0 +1,31 @@
+from django.conf import settings
+
+
+def redis_client(test_case, *patterns):
+    """
+    A Redis connection for tests of the Redis backends, with the keys
+    matching `patterns` cleared before and after the test.
+
+    This is the cache's server when the cache is Redis (as in CI) and
+    fakeredis otherwise; the test is skipped when neither is available.
+    """
+    if 'django_redis' in settings.CACHES['default']['BACKEND']:
+        from django_redis import get_redis_connection
+        client = get_redis_connection('default')
+    else:
+        try:
+            import fakeredis
+            import lupa  # noqa: F401 -- fakeredis runs the Lua scripts with it
+        except ImportError:
+            test_case.skipTest('Needs a Redis cache, or fakeredis and lupa')
+        client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+    def clear():
+        for pattern in patterns:
+            keys = list(client.scan_iter(pattern))
+            if keys:
+                client.delete(*keys)
+
+    clear()
+    test_case.addCleanup(clear)
+    return client
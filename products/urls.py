@@ -4,9 +4,13 @@ from .views import (
     ProductViewSet, 
     CategoryViewSet, 
     ReviewViewSet,
+    ProductSubscriptionViewSet,
+    ReviewBulkIngestView,
     product_list_view,
+    product_list_fragment_view,
     product_detail_view,
     home_view,
+    product_feed_view,
 )
 
 app_name = 'products'
@@ -14,6 +18,7 @@ app_name = 'products'
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'products', ProductViewSet, basename='product')
+router.register(r'subscriptions', ProductSubscriptionViewSet, basename='subscription')
 router.register(
     r'products/(?P<product_slug>[^/.]+)/reviews',
     ReviewViewSet,
@@ -24,9 +29,12 @@ urlpatterns = [
     # HTML interface
     path('', home_view, name='home'),
     path('products/', product_list_view, name='list'),
+    path('list/fragment/', product_list_fragment_view, name='list-fragment'),
+    path('feed.<str:fmt>', product_feed_view, name='feed'),
     path('products/<slug:slug>/', product_detail_view, name='detail'),
     
     # API endpoints
+    path('api/reviews/bulk/', ReviewBulkIngestView.as_view(), name='review-bulk-ingest'),
     path('api/', include((router.urls, 'products-api'))),
     
     # Additional ID-based product endpoint
@@ -1,17 +1,49 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.cache import cache
-from django.db.models import Prefetch, Avg, Count, Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import http_date, urlencode
+from django.db.models import Prefetch, Avg, Count, Q, Min, Max, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
 from django.contrib.admin.views.decorators import staff_member_required
-from django.views.decorators.cache import cache_page
-from rest_framework import viewsets, generics, permissions, status, filters
+from rest_framework import viewsets, generics, permissions, status, filters, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
-from .models import Product, Category, Review
-from .serializers import ProductSerializer, CategorySerializer, ReviewSerializer
+from .models import (
+    Product,
+    Category,
+    Review,
+    PriceHistory,
+    ProductSubscription,
+    ProductTrend,
+    CategoryTrend,
+    SearchQueryStat,
+)
+from .serializers import (
+    ProductSerializer,
+    CategorySerializer,
+    ReviewSerializer,
+    ProductSubscriptionSerializer,
+    ReviewIngestSerializer,
+)
 from .filters import ProductFilter
+from . import analytics, feeds, recently_viewed, review_ingest, sitemaps
+from .pagination import InvalidCursor, KeysetPagination, paginate_keyset
+from .fragments import render_product_cards, render_product_fragments
+from .caching import (
+    CATEGORY_VERSION_KEY,
+    REVIEWS_VERSION_KEY,
+    get_versions,
+    review_version_key,
+    version_time,
+)
+from .conditional import ConditionalGetMixin
 
 # ======================
 # Template Views (HTML)
@@ -38,13 +70,32 @@ def dashboard(request):
     }
     return render(request, 'products/dashboard.html', context)
 
-def product_list_view(request):
-    """Optimized product listing with category filtering"""
+PRODUCT_LIST_PAGE_SIZE = 24
+PRODUCT_LIST_ORDERING = ('-created_at', '-id')
+
+def _category_nav():
+    """
+    Categories for the listing filter, cached under the category
+    version like the category API's validators, so changes show at once
+    """
+    (categories,) = get_versions([CATEGORY_VERSION_KEY])
+    return cache.get_or_set(
+        f'category_nav_{categories}',
+        lambda: list(Category.objects.values('name', 'slug')),
+        60 * 15
+    )
+
+def _product_list_page(request):
+    """
+    One keyset page of the filtered product listing.
+
+    Returns (products, next_url_params); the query count is constant no
+    matter how deep the cursor points into the catalogue.
+    """
     category_slug = request.GET.get('category')
     search_query = request.GET.get('q', '')
-    
-    products = Product.objects.select_related('category').order_by('-created_at')
-    
+
+    products = Product.objects.select_related('category')
     if category_slug:
         products = products.filter(category__slug=category_slug)
     if search_query:
@@ -52,62 +103,200 @@ def product_list_view(request):
             Q(name__icontains=search_query) |
             Q(description__icontains=search_query)
         )
-    
+
+    try:
+        page, next_cursor = paginate_keyset(
+            products,
+            PRODUCT_LIST_ORDERING,
+            cursor=request.GET.get('cursor'),
+            page_size=PRODUCT_LIST_PAGE_SIZE
+        )
+    except InvalidCursor:
+        raise Http404('Invalid cursor')
+
+    next_params = None
+    if next_cursor:
+        next_params = {
+            key: value for key, value in (
+                ('category', category_slug),
+                ('q', search_query),
+                ('cursor', next_cursor),
+            ) if value
+        }
+    return page, next_params
+
+def product_list_view(request):
+    """Keyset-paginated product listing with category and search filters"""
+    products, next_params = _product_list_page(request)
     return render(request, 'products/list.html', {
         'products': products,
-        'categories': Category.objects.all(),
-        'current_category': category_slug,
-        'search_query': search_query
+        'cards': render_product_cards(request, products),
+        'categories': _category_nav(),
+        'current_category': request.GET.get('category'),
+        'search_query': request.GET.get('q', ''),
+        'next_query': urlencode(next_params) if next_params else '',
+    })
+
+def product_list_fragment_view(request):
+    """Next batch of product cards for infinite scroll"""
+    products, next_params = _product_list_page(request)
+    response = render(request, 'products/_product_cards.html', {
+        'cards': render_product_cards(request, products),
     })
+    if next_params:
+        response['X-Next-Cursor'] = next_params['cursor']
+        response['X-Next-Url'] = f"{reverse('products:list-fragment')}?{urlencode(next_params)}"
+    return response
 
 def product_detail_view(request, slug=None, pk=None):
     """
-    Product detail page supporting both slug and ID lookups
-    with related products and reviews
+    Product detail page supporting both slug and ID lookups.
+
+    The product body (with its reviews) and the similar product cards are
+    cached fragments fetched in one multi-get; only the shell around them
+    is rendered per request.
     """
+    products = Product.objects.select_related('category')
     if pk:
-        product = get_object_or_404(
-            Product.objects.select_related('category'),
-            pk=pk
-        )
+        product = get_object_or_404(products, pk=pk)
     else:
-        product = get_object_or_404(
-            Product.objects.select_related('category'),
-            slug=slug
-        )
-    
-    reviews = product.reviews.select_related('user')[:5]
-    similar_products = Product.objects.filter(
-        category=product.category
-    ).exclude(id=product.id)[:4]
-    
-    return render(request, 'products/detail.html', {
+        product = get_object_or_404(products, slug=slug)
+    analytics.record_product_view(product.id)
+
+    similar_products = list(
+        products.filter(
+            category=product.category
+        ).exclude(id=product.id)[:4]
+    ) if product.category_id else []
+    recent_products = recently_viewed.get_recently_viewed(request, exclude=product.id)
+
+    fragments = render_product_fragments(
+        request,
+        [('detail', product)]
+        + [('card', similar) for similar in similar_products]
+        + [('card', recent) for recent in recent_products]
+    )
+    similar_end = 1 + len(similar_products)
+    response = render(request, 'products/detail.html', {
         'product': product,
-        'reviews': reviews,
-        'similar_products': similar_products,
-        'average_rating': product.reviews.aggregate(
-            avg_rating=Avg('rating')
-        )['avg_rating']
+        'detail': fragments[0],
+        'similar_cards': fragments[1:similar_end],
+        'recent_cards': fragments[similar_end:],
     })
+    recently_viewed.remember_view(request, response, product.id)
+    return response
+
+HOME_SECTIONS_TIMEOUT = 60 * 15
+
+def _home_section_ids():
+    """Product ids for each home page section, refreshed every 15 minutes"""
+    return cache.get_or_set(
+        'home_section_ids',
+        lambda: {
+            'featured_products': list(
+                Product.objects.filter(featured=True).values_list('id', flat=True)[:4]
+            ),
+            'recent_products': list(
+                Product.objects.order_by('-created_at').values_list('id', flat=True)[:8]
+            ),
+            'top_rated': list(
+                Product.objects.annotate(
+                    avg_rating=Avg('reviews__rating')
+                ).filter(
+                    avg_rating__isnull=False
+                ).order_by('-avg_rating').values_list('id', flat=True)[:3]
+            ),
+        },
+        HOME_SECTIONS_TIMEOUT
+    )
 
-@cache_page(60 * 15)  # Cache for 15 minutes
 def home_view(request):
-    """Optimized homepage with cached queries"""
+    """
+    Homepage rendered live around cached product cards.
+
+    Section membership is cached for 15 minutes, but the cards themselves
+    follow each product's updated_at and review version, so price edits
+    show up immediately and the navbar always reflects the current user.
+    """
+    sections = _home_section_ids()
+    all_ids = {product_id for ids in sections.values() for product_id in ids}
+    products = Product.objects.select_related('category').in_bulk(all_ids)
+
+    specs = [
+        ('card', products[product_id])
+        for ids in sections.values()
+        for product_id in ids if product_id in products
+    ]
+    cards = iter(render_product_fragments(request, specs))
+
     context = {
-        'featured_products': Product.objects.filter(
-            featured=True
-        ).select_related('category')[:4],
-        'recent_products': Product.objects.order_by('-created_at')[
-            :8
-        ].select_related('category'),
-        'top_rated': Product.objects.annotate(
-            avg_rating=Avg('reviews__rating')
-        ).filter(
-            avg_rating__isnull=False
-        ).order_by('-avg_rating')[:3]
+        name: [next(cards) for product_id in ids if product_id in products]
+        for name, ids in sections.items()
     }
     return render(request, 'home.html', context)
 
+# ==================
+# Sitemaps (XML)
+# ==================
+
+def _site_url(request):
+    return request.build_absolute_uri('/').rstrip('/')
+
+def sitemap_index_view(request):
+    """Sitemap index listing every product and category chunk"""
+    return HttpResponse(
+        sitemaps.render_index(_site_url(request)),
+        content_type='application/xml'
+    )
+
+def _sitemap_chunk_response(request, kind, chunk, chunks, entries):
+    if chunk not in chunks:
+        raise Http404('No such sitemap')
+    fingerprint = chunks[chunk]
+    base_url = _site_url(request)
+    response = StreamingHttpResponse(
+        sitemaps.stream_chunk(
+            kind, chunk, base_url, fingerprint, entries(base_url, chunk)
+        ),
+        content_type='application/xml'
+    )
+    if fingerprint[1]:
+        response['Last-Modified'] = http_date(fingerprint[1].timestamp())
+    return response
+
+def product_sitemap_view(request, chunk):
+    """One chunk (up to 50k URLs) of product detail pages"""
+    return _sitemap_chunk_response(
+        request, 'products', chunk,
+        sitemaps.product_chunks(), sitemaps.iter_product_urls
+    )
+
+def category_sitemap_view(request, chunk):
+    """One chunk of category listing pages"""
+    return _sitemap_chunk_response(
+        request, 'categories', chunk,
+        sitemaps.category_chunks(), sitemaps.iter_category_urls
+    )
+
+def product_feed_view(request, fmt):
+    """Shopping-channel product feed (XML or TSV) served from the chunk cache"""
+    if fmt not in feeds.FEED_FORMATS:
+        raise Http404('Unsupported feed format')
+    chunks = feeds.cached_chunks(_site_url(request))
+    if chunks is None:
+        # First build still running in another request
+        response = HttpResponse('Feed is being built', status=503, content_type='text/plain')
+        response['Retry-After'] = '30'
+        return response
+    content_type = (
+        'application/xml' if fmt == 'xml'
+        else 'text/tab-separated-values; charset=utf-8'
+    )
+    return StreamingHttpResponse(
+        feeds.iter_feed(chunks, fmt),
+        content_type=content_type
+    )
+
 # ==================
 # API Views (JSON)
 # ==================
@@ -118,19 +307,85 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
     last_page_strings = ('last',)
 
+class ReviewPagination(KeysetPagination):
+    """Review cursors by recency or rating, each served by a (product, ...) index"""
+    page_size = 10
+    orderings = {
+        'newest': ('-created_at', '-id'),
+        'oldest': ('created_at', 'id'),
+        'highest': ('-rating', '-created_at', '-id'),
+        'lowest': ('rating', 'created_at', 'id'),
+    }
+
+PRICE_SERIES_INTERVALS = [
+    ('hour', timedelta(hours=1)),
+    ('day', timedelta(days=1)),
+    ('week', timedelta(weeks=1)),
+    ('month', timedelta(days=31)),
+    ('year', timedelta(days=366)),
+]
+
+def downsample_price_history(product, start, end, points):
+    """
+    Bucket a product's price history between start and end into at most
+    `points` intervals, returning min/max/avg per bucket plus the price in
+    effect when the range opens.
+    """
+    span = end - start
+    interval = next(
+        (name for name, length in PRICE_SERIES_INTERVALS if span / length <= points),
+        PRICE_SERIES_INTERVALS[-1][0]
+    )
+    history = PriceHistory.objects.filter(product=product)
+    opening_price = history.filter(
+        recorded_at__lt=start
+    ).order_by('-recorded_at').values_list('price', flat=True).first()
+    buckets = history.filter(
+        recorded_at__gte=start, recorded_at__lte=end
+    ).annotate(
+        bucket=Trunc('recorded_at', interval)
+    ).order_by('bucket').values('bucket').annotate(
+        min=Min('price'),
+        max=Max('price'),
+        avg=Avg('price')
+    )
+    return {
+        'interval': interval,
+        'start': start,
+        'end': end,
+        'opening_price': opening_price,
+        'points': [
+            {
+                'time': row['bucket'],
+                'min': row['min'],
+                'max': row['max'],
+                'avg': round(row['avg'], 2),
+            }
+            for row in buckets
+        ]
+    }
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
         return obj.user == request.user
 
-class ProductViewSet(viewsets.ModelViewSet):
+def _int_param(request, name, default, maximum):
+    """Clamp an integer query parameter, raising ValueError if malformed"""
+    return min(max(int(request.query_params.get(name, default)), 1), maximum)
+
+def _latest(*moments):
+    return max((moment for moment in moments if moment), default=None)
+
+class ProductViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     Enhanced Product API with:
     - Dual lookup (ID/slug)
     - Advanced filtering
     - Optimized queries
     - Cached statistics
+    - Conditional GET (ETag/Last-Modified)
     """
     serializer_class = ProductSerializer
     lookup_field = 'slug'
@@ -148,7 +403,9 @@ class ProductViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in [
+            'create', 'update', 'partial_update', 'destroy', 'zero_result_searches'
+        ]:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
@@ -169,6 +426,62 @@ class ProductViewSet(viewsets.ModelViewSet):
             return get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
         return super().get_object()
 
+    def get_list_validators(self):
+        # Ordering changes neither the count nor the latest change (and may
+        # need the annotations of get_queryset), so only filters apply here
+        queryset = Product.objects.all()
+        for backend in self.filter_backends:
+            if not issubclass(backend, filters.OrderingFilter):
+                queryset = backend().filter_queryset(self.request, queryset, self)
+        # Products embed their reviews and category, so those versions count too
+        stats = queryset.order_by().aggregate(
+            count=Count('id', distinct=True),
+            last_modified=Max('updated_at')
+        )
+        reviews, categories = get_versions([REVIEWS_VERSION_KEY, CATEGORY_VERSION_KEY])
+        return (
+            (stats['count'], stats['last_modified'], reviews, categories),
+            _latest(stats['last_modified'], version_time(reviews), version_time(categories))
+        )
+
+    def get_object_validators(self):
+        if 'pk' in self.kwargs:
+            lookup = {'pk': self.kwargs['pk']}
+        else:
+            lookup = {'slug': self.kwargs['slug']}
+        row = Product.objects.filter(**lookup).values_list('id', 'updated_at').first()
+        if row is None:
+            return None
+        product_id, updated_at = row
+        reviews, categories = get_versions([
+            review_version_key(product_id), CATEGORY_VERSION_KEY
+        ])
+        return (
+            (product_id, updated_at, reviews, categories),
+            _latest(updated_at, version_time(reviews), version_time(categories))
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        # Revalidations answered with 304 are polling, not views
+        if response.status_code == status.HTTP_200_OK:
+            analytics.record_product_view(response.data['id'])
+            recently_viewed.remember_view(request, response, response.data['id'])
+        return response
+
+    @action(
+        detail=False, methods=['get'],
+        url_path='recently-viewed', url_name='recently-viewed'
+    )
+    def recently_viewed_products(self, request):
+        """Products the current user or visitor viewed last, newest first"""
+        ids = recently_viewed.get_recently_viewed_ids(request)
+        products = self.get_queryset().in_bulk(ids)
+        return Response(self.get_serializer(
+            [products[product_id] for product_id in ids if product_id in products],
+            many=True
+        ).data)
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
@@ -198,23 +511,119 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def stats(self, request, slug=None):
-        cache_key = f'product_stats_{slug}'
+        cache_key = review_ingest.product_stats_key(slug)
         stats = cache.get(cache_key)
         
         if not stats:
             product = self.get_object()
-            stats = {
-                'review_count': product.reviews.count(),
-                'average_rating': product.reviews.aggregate(
-                    avg=Avg('rating'))['avg'] or 0,
-                'rating_distribution': product.reviews.values(
-                    'rating').annotate(count=Count('id'))
-            }
-            cache.set(cache_key, stats, timeout=3600)
+            stats = review_ingest.review_stats([product.id])[product.id]
+            cache.set(cache_key, stats, timeout=review_ingest.PRODUCT_STATS_TIMEOUT)
         
         return Response(stats)
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='start', type=str, description='ISO 8601 start (default: 90 days ago)'),
+            OpenApiParameter(name='end', type=str, description='ISO 8601 end (default: now)'),
+            OpenApiParameter(name='points', type=int, description='Maximum number of buckets (default: 100)'),
+        ]
+    )
+    @action(detail=True, methods=['get'], url_path='price-history')
+    def price_history(self, request, slug=None):
+        """Downsampled price series for a product"""
+        product = get_object_or_404(Product.objects.only('id'), slug=slug)
+        try:
+            end = parse_datetime(request.query_params.get('end', '')) or timezone.now()
+            start = (
+                parse_datetime(request.query_params.get('start', ''))
+                or end - timedelta(days=90)
+            )
+        except ValueError:
+            # Well formed but impossible, e.g. February 30th
+            return Response(
+                {'error': 'start and end must be valid datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end)
+        if start >= end:
+            return Response(
+                {'error': 'start must be before end'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            points = min(max(int(request.query_params.get('points', 100)), 1), 1000)
+        except ValueError:
+            return Response(
+                {'error': 'points must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        series = downsample_price_history(product, start, end, points)
+        series['product'] = slug
+        return Response(series)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='category', type=str, description='Only products in this category slug'),
+            OpenApiParameter(name='limit', type=int, description='Number of products (default: 10, max: 50)'),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Products ranked by time-decayed views"""
+        try:
+            limit = _int_param(request, 'limit', 10, 50)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        trends = ProductTrend.objects.order_by('-score')
+        if request.query_params.get('category'):
+            trends = trends.filter(product__category__slug=request.query_params['category'])
+        trends = list(trends.values_list('product_id', 'score')[:limit])
+        products = self.get_queryset().in_bulk([product_id for product_id, _ in trends])
+
+        now = timezone.now()
+        results = []
+        for product_id, score in trends:
+            if product_id in products:
+                data = self.get_serializer(products[product_id]).data
+                data['trending_score'] = round(analytics.decayed_score(score, now), 3)
+                results.append(data)
+        return Response(results)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='days', type=int, description='Look-back window in days (default: 7, max: 90)'),
+            OpenApiParameter(name='limit', type=int, description='Number of queries (default: 50, max: 500)'),
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path='zero-result-searches')
+    def zero_result_searches(self, request):
+        """Most frequent searches that matched no products (staff only)"""
+        try:
+            days = _int_param(request, 'days', 7, 90)
+            limit = _int_param(request, 'limit', 50, 500)
+        except ValueError:
+            return Response(
+                {'error': 'days and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        since = timezone.now() - timedelta(days=days)
+        queries = SearchQueryStat.objects.filter(
+            hour__gte=since
+        ).values('query').annotate(
+            searches=Sum('searches'),
+            zero_results=Sum('zero_results')
+        ).filter(
+            zero_results__gt=0
+        ).order_by('-zero_results', 'query')[:limit]
+        return Response({'since': since, 'queries': list(queries)})
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.annotate(
         product_count=Count('products')
     ).prefetch_related(
@@ -233,9 +642,50 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['name', 'product_count']
     ordering = ['name']
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    def get_list_validators(self):
+        # Ordering by product_count depends on product assignments
+        stats = Product.objects.aggregate(
+            count=Count('id'),
+            last_modified=Max('updated_at')
+        )
+        (categories,) = get_versions([CATEGORY_VERSION_KEY])
+        return (
+            (categories, stats['count'], stats['last_modified']),
+            _latest(version_time(categories), stats['last_modified'])
+        )
+
+    def get_object_validators(self):
+        (categories,) = get_versions([CATEGORY_VERSION_KEY])
+        return (categories,), version_time(categories)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='limit', type=int, description='Number of categories (default: 10, max: 50)'),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Categories ranked by the time-decayed views of their products"""
+        try:
+            limit = _int_param(request, 'limit', 10, 50)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        now = timezone.now()
+        trends = CategoryTrend.objects.select_related('category').order_by('-score')[:limit]
+        return Response([
+            {
+                **CategorySerializer(trend.category).data,
+                'trending_score': round(analytics.decayed_score(trend.score, now), 3),
+            }
+            for trend in trends
+        ])
+
+class ReviewViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = ReviewPagination
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly, 
         IsOwnerOrReadOnly
@@ -246,6 +696,17 @@ class ReviewViewSet(viewsets.ModelViewSet):
             product__slug=self.kwargs['product_slug']
         ).select_related('user', 'product')
 
+    def get_list_validators(self):
+        product_id = Product.objects.filter(
+            slug=self.kwargs['product_slug']
+        ).values_list('id', flat=True).first()
+        if product_id is None:
+            return None
+        (reviews,) = get_versions([review_version_key(product_id)])
+        return (product_id, reviews), version_time(reviews)
+
+    get_object_validators = get_list_validators
+
     def perform_create(self, serializer):
         product = get_object_or_404(
             Product, 
@@ -254,4 +715,56 @@ class ReviewViewSet(viewsets.ModelViewSet):
         serializer.save(
             product=product, 
             user=self.request.user
-        )
\ No newline at end of file
+        )
+
+class ReviewBulkIngestView(generics.GenericAPIView):
+    """
+    Staff-only bulk import of reviews, e.g. when migrating from another
+    platform. Rows are written in batches with one aggregate refresh per
+    batch; unknown products or users are reported back, not fatal.
+    """
+    serializer_class = ReviewIngestSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = review_ingest.ingest_reviews(
+            serializer.validated_data['reviews'],
+            on_conflict=serializer.validated_data['on_conflict']
+        )
+        return Response(result)
+
+class ProductSubscriptionViewSet(mixins.CreateModelMixin,
+                                 mixins.ListModelMixin,
+                                 mixins.DestroyModelMixin,
+                                 viewsets.GenericViewSet):
+    """Price-drop and back-in-stock alerts for the current user"""
+    serializer_class = ProductSubscriptionSerializer
+    pagination_class = StandardResultsSetPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ProductSubscription.objects.filter(
+            user=self.request.user
+        ).select_related('product')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # Re-subscribing reactivates a previously notified alert
+        subscription, created = ProductSubscription.objects.update_or_create(
+            user=request.user,
+            product=data['product'],
+            kind=data['kind'],
+            defaults={
+                'target_price': data['target_price'],
+                'is_active': True,
+                'notified_at': None,
+            }
+        )
+        return Response(
+            self.get_serializer(subscription).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
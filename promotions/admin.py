@@ -0,0 +1,25 @@
+from django.contrib import admin
+from .models import Coupon, Promotion
+
+
+class CouponInline(admin.TabularInline):
+    model = Coupon
+    extra = 0
+    readonly_fields = ('redemptions',)
+
+
+@admin.register(Promotion)
+class PromotionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'value', 'is_active', 'starts_at', 'ends_at')
+    list_filter = ('kind', 'is_active')
+    search_fields = ('name',)
+    filter_horizontal = ('products', 'categories')
+    inlines = [CouponInline]
+
+
+@admin.register(Coupon)
+class CouponAdmin(admin.ModelAdmin):
+    list_display = ('code', 'promotion', 'redemptions', 'max_redemptions', 'is_active')
+    list_select_related = ('promotion',)
+    search_fields = ('code',)
+    readonly_fields = ('redemptions',)
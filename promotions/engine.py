@@ -0,0 +1,215 @@
+import time
+from collections import defaultdict, namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from products.caching import VERSION_TIMEOUT, get_versions
+
+PROMOTION_VERSION_KEY = 'promotion_version'
+# Seconds a worker trusts its compiled rules before checking the version
+PROMOTION_CHECK_INTERVAL = getattr(settings, 'PROMOTION_CHECK_INTERVAL', 5)
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+Rule = namedtuple(
+    'Rule',
+    'id name kind value buy get product_ids category_ids minimum_subtotal starts_at ends_at'
+)
+# One cart line as the engine sees it
+Line = namedtuple('Line', 'product_id category_id quantity price')
+Evaluation = namedtuple('Evaluation', 'discount line_discounts applied')
+
+
+def _cents(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def line_discount(rule, line):
+    """What `rule` takes off one matching line"""
+    if rule.kind == 'percentage':
+        return _cents(line.price * line.quantity * rule.value / HUNDRED)
+    if rule.kind == 'fixed':
+        return _cents(min(rule.value, line.price) * line.quantity)
+    # buy_x_get_y: whole groups, plus the discounted part of the last one
+    group = rule.buy + rule.get
+    groups, rest = divmod(line.quantity, group)
+    discounted = groups * rule.get + max(rest - rule.buy, 0)
+    return _cents(line.price * discounted * rule.value / HUNDRED)
+
+
+def _in_effect(rule, now, subtotal):
+    return (
+        (rule.starts_at is None or rule.starts_at <= now)
+        and (rule.ends_at is None or now < rule.ends_at)
+        and subtotal >= rule.minimum_subtotal
+    )
+
+
+def _matches(rule, line):
+    if not rule.product_ids and not rule.category_ids:
+        return True
+    return line.product_id in rule.product_ids or line.category_id in rule.category_ids
+
+
+class RuleIndex:
+    """
+    Active promotions compiled for evaluation without queries.
+
+    Automatic rules are indexed by product and by category, so a line
+    only looks at the rules that can apply to it. Rules behind coupons are
+    kept per coupon id. Each line gets the single best line discount; an
+    unscoped fixed rule takes its amount off the cart as a whole.
+    """
+
+    def __init__(self, rules, coupon_rules):
+        self.by_product = defaultdict(list)
+        self.by_category = defaultdict(list)
+        self.everywhere = []
+        self.cart_wide = []
+        for rule in rules:
+            if rule.product_ids or rule.category_ids:
+                for product_id in rule.product_ids:
+                    self.by_product[product_id].append(rule)
+                for category_id in rule.category_ids:
+                    self.by_category[category_id].append(rule)
+            elif rule.kind == 'fixed':
+                self.cart_wide.append(rule)
+            else:
+                self.everywhere.append(rule)
+        # coupon id -> Rule
+        self.coupon_rules = coupon_rules
+
+    def evaluate(self, lines, coupon_id=None, now=None):
+        now = now or timezone.now()
+        subtotal = sum((line.price * line.quantity for line in lines), ZERO)
+        coupon_rule = self.coupon_rules.get(coupon_id)
+        if coupon_rule is not None and not _in_effect(coupon_rule, now, subtotal):
+            coupon_rule = None
+        coupon_is_cart_wide = (
+            coupon_rule is not None and coupon_rule.kind == 'fixed'
+            and not coupon_rule.product_ids and not coupon_rule.category_ids
+        )
+
+        line_discounts = {}
+        applied = set()
+        for line in lines:
+            candidates = (
+                self.by_product.get(line.product_id, [])
+                + self.by_category.get(line.category_id, [])
+                + self.everywhere
+            )
+            if coupon_rule is not None and not coupon_is_cart_wide and _matches(coupon_rule, line):
+                candidates = candidates + [coupon_rule]
+            best, best_rule = ZERO, None
+            for rule in candidates:
+                if not _in_effect(rule, now, subtotal):
+                    continue
+                amount = line_discount(rule, line)
+                if amount > best:
+                    best, best_rule = amount, rule
+            if best_rule is not None:
+                line_discounts[line.product_id] = best
+                applied.add(best_rule.name)
+
+        cart_wide = [rule for rule in self.cart_wide if _in_effect(rule, now, subtotal)]
+        if coupon_is_cart_wide:
+            cart_wide.append(coupon_rule)
+        order_discount = ZERO
+        if cart_wide:
+            rule = max(cart_wide, key=lambda rule: rule.value)
+            order_discount = _cents(rule.value)
+            applied.add(rule.name)
+
+        discount = min(subtotal, sum(line_discounts.values(), ZERO) + order_discount)
+        return Evaluation(discount, line_discounts, sorted(applied))
+
+
+def compile_rules():
+    """Read every active promotion and coupon (four queries) into a RuleIndex"""
+    from .models import Coupon, Promotion
+
+    promotions = list(Promotion.objects.filter(is_active=True).values(
+        'id', 'name', 'kind', 'value', 'buy_quantity', 'get_quantity',
+        'minimum_subtotal', 'starts_at', 'ends_at'
+    ))
+    product_ids, category_ids = defaultdict(set), defaultdict(set)
+    for promotion_id, product_id in Promotion.products.through.objects.filter(
+        promotion__is_active=True
+    ).values_list('promotion_id', 'product_id'):
+        product_ids[promotion_id].add(product_id)
+    for promotion_id, category_id in Promotion.categories.through.objects.filter(
+        promotion__is_active=True
+    ).values_list('promotion_id', 'category_id'):
+        category_ids[promotion_id].add(category_id)
+    coupons = list(Coupon.objects.filter(promotion__is_active=True).values_list(
+        'id', 'promotion_id', 'is_active'
+    ))
+
+    rules = {
+        promotion['id']: Rule(
+            promotion['id'],
+            promotion['name'],
+            promotion['kind'],
+            promotion['value'],
+            promotion['buy_quantity'],
+            promotion['get_quantity'],
+            frozenset(product_ids[promotion['id']]),
+            frozenset(category_ids[promotion['id']]),
+            promotion['minimum_subtotal'],
+            promotion['starts_at'],
+            promotion['ends_at'],
+        )
+        for promotion in promotions
+    }
+    # Promotions with coupons only apply through them
+    behind_coupons = {promotion_id for _, promotion_id, _ in coupons}
+    return RuleIndex(
+        [rule for promotion_id, rule in rules.items() if promotion_id not in behind_coupons],
+        {
+            coupon_id: rules[promotion_id]
+            for coupon_id, promotion_id, is_active in coupons if is_active
+        }
+    )
+
+
+_index = None
+_index_version = None
+_checked_at = 0
+_index_lock = Lock()
+
+
+def get_rule_index():
+    """
+    This worker's compiled rules. The shared promotion version is checked
+    at most every PROMOTION_CHECK_INTERVAL seconds and the rules are
+    recompiled when it moved.
+    """
+    global _index, _index_version, _checked_at
+    if _index is not None and time.monotonic() - _checked_at < PROMOTION_CHECK_INTERVAL:
+        return _index
+    with _index_lock:
+        # Read before compiling, so changes made meanwhile recompile again
+        version = get_versions([PROMOTION_VERSION_KEY])[0]
+        if _index is None or version != _index_version:
+            _index = compile_rules()
+            _index_version = version
+        _checked_at = time.monotonic()
+    return _index
+
+
+def bump_promotion_version():
+    """Mark promotions as changed; this worker rechecks right away"""
+    global _checked_at
+    cache.set(PROMOTION_VERSION_KEY, time.time_ns(), timeout=VERSION_TIMEOUT)
+    _checked_at = 0
+
+
+def evaluate_cart(lines, coupon_id=None):
+    """Discounts for an iterable of Line, with the applied coupon if any"""
+    return get_rule_index().evaluate(list(lines), coupon_id)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_hot'),
+        ('promotions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='promotion',
+            constraint=models.CheckConstraint(condition=models.Q(('kind', 'fixed'), ('value__lte', 100), _connector='OR'), name='promotion_percentage_at_most_100'),
+        ),
+    ]
@@ -0,0 +1,124 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.db import models
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .engine import bump_promotion_version
+
+
+class Promotion(models.Model):
+    """
+    A discount rule. Without products or categories it applies to the
+    whole cart; promotions with coupons only apply once one of their
+    coupons is applied to the cart.
+    """
+
+    class Kind(models.TextChoices):
+        # `value` percent off the matching lines
+        PERCENTAGE = 'percentage', 'Percentage off'
+        # `value` off each matching unit, or off the cart when unscoped
+        FIXED = 'fixed', 'Fixed amount off'
+        # For every `buy_quantity` units of a product, the next
+        # `get_quantity` are `value` percent off (100 = free)
+        BUY_X_GET_Y = 'buy_x_get_y', 'Buy X get Y'
+
+    name = models.CharField(max_length=200)
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    value = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(0)]
+    )
+    buy_quantity = models.PositiveIntegerField(null=True, blank=True)
+    get_quantity = models.PositiveIntegerField(null=True, blank=True)
+    products = models.ManyToManyField(
+        'products.Product',
+        blank=True,
+        related_name='promotions'
+    )
+    categories = models.ManyToManyField(
+        'products.Category',
+        blank=True,
+        related_name='promotions'
+    )
+    minimum_subtotal = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00')
+    )
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.CheckConstraint(
+                check=~Q(kind='buy_x_get_y') | Q(buy_quantity__gte=1, get_quantity__gte=1),
+                name='buy_x_get_y_quantities'
+            ),
+            # Percentages past 100 would discount more than the line
+            models.CheckConstraint(
+                check=Q(kind='fixed') | Q(value__lte=100),
+                name='promotion_percentage_at_most_100'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if self.kind != self.Kind.FIXED and self.value is not None and self.value > 100:
+            raise ValidationError({'value': 'A percentage cannot be more than 100.'})
+
+
+class Coupon(models.Model):
+    code = models.CharField(max_length=50, unique=True)
+    promotion = models.ForeignKey(
+        Promotion,
+        on_delete=models.CASCADE,
+        related_name='coupons'
+    )
+    # None for unlimited
+    max_redemptions = models.PositiveIntegerField(null=True, blank=True)
+    redemptions = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.code
+
+    def save(self, *args, **kwargs):
+        self.code = self.code.strip().upper()
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def redeemable():
+        return Q(is_active=True) & (
+            Q(max_redemptions__isnull=True) | Q(redemptions__lt=F('max_redemptions'))
+        )
+
+    def redeem(self):
+        """
+        Count one redemption if any are left, as a single conditional
+        UPDATE, so concurrent checkouts cannot exceed max_redemptions.
+        """
+        return Coupon.objects.filter(
+            Coupon.redeemable(), pk=self.pk
+        ).update(redemptions=F('redemptions') + 1) == 1
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+@receiver(m2m_changed, sender=Promotion.products.through)
+@receiver(m2m_changed, sender=Promotion.categories.through)
+def promotions_changed(sender, **kwargs):
+    """Make every worker recompile its promotion rules"""
+    bump_promotion_version()
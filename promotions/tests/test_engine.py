@@ -0,0 +1,142 @@
+from decimal import Decimal
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from cart.models import Cart, CartItem
+from products.models import Category, Product
+from promotions.engine import Line, bump_promotion_version, evaluate_cart, get_rule_index
+from promotions.models import Coupon, Promotion
+
+User = get_user_model()
+
+
+class PromotionEngineTests(TestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name='Phones')
+        self.phone = Product.objects.create(
+            name='Phone', price=Decimal('100.00'), stock=10, category=self.phones
+        )
+        self.case = Product.objects.create(name='Case', price=Decimal('10.00'), stock=10)
+
+    def tearDown(self):
+        # The compiled rules outlive the test's transaction
+        bump_promotion_version()
+
+    def lines(self, phones=1, cases=1):
+        return [
+            Line(self.phone.id, self.phones.id, phones, Decimal('100.00')),
+            Line(self.case.id, None, cases, Decimal('10.00')),
+        ]
+
+    def test_category_percentage(self):
+        promotion = Promotion.objects.create(name='Phones -10%', kind='percentage', value=10)
+        promotion.categories.add(self.phones)
+        evaluation = evaluate_cart(self.lines(phones=2))
+        self.assertEqual(evaluation.discount, Decimal('20.00'))
+        self.assertEqual(evaluation.line_discounts, {self.phone.id: Decimal('20.00')})
+        self.assertEqual(evaluation.applied, ['Phones -10%'])
+
+    def test_best_line_discount_wins(self):
+        percentage = Promotion.objects.create(name='-10%', kind='percentage', value=10)
+        fixed = Promotion.objects.create(name='-15', kind='fixed', value=15)
+        percentage.products.add(self.phone)
+        fixed.products.add(self.phone)
+        self.assertEqual(evaluate_cart(self.lines()).applied, ['-15'])
+
+    def test_buy_x_get_y(self):
+        promotion = Promotion.objects.create(
+            name='3 for 2', kind='buy_x_get_y', value=100, buy_quantity=2, get_quantity=1
+        )
+        promotion.products.add(self.case)
+        # 7 cases: two full groups and one of the last group's
+        self.assertEqual(evaluate_cart(self.lines(phones=0, cases=7)).discount, Decimal('20.00'))
+        self.assertEqual(evaluate_cart(self.lines(phones=0, cases=2)).discount, Decimal('0.00'))
+
+    def test_coupon_promotions_only_apply_with_their_coupon(self):
+        promotion = Promotion.objects.create(
+            name='5 off', kind='fixed', value=5, minimum_subtotal=50
+        )
+        coupon = Coupon.objects.create(code='five', promotion=promotion)
+        self.assertEqual(coupon.code, 'FIVE')
+        self.assertEqual(evaluate_cart(self.lines()).discount, Decimal('0.00'))
+        self.assertEqual(evaluate_cart(self.lines(), coupon.id).discount, Decimal('5.00'))
+        # Below the minimum subtotal
+        self.assertEqual(
+            evaluate_cart(self.lines(phones=0), coupon.id).discount, Decimal('0.00')
+        )
+
+    def test_promotions_outside_their_window_do_not_apply(self):
+        Promotion.objects.create(
+            name='Later', kind='percentage', value=50,
+            starts_at=timezone.now() + timedelta(days=1)
+        )
+        self.assertEqual(evaluate_cart(self.lines()).discount, Decimal('0.00'))
+
+    def test_evaluation_needs_no_queries(self):
+        Promotion.objects.create(name='-10%', kind='percentage', value=10)
+        get_rule_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(evaluate_cart(self.lines()).discount, Decimal('11.00'))
+
+    def test_changes_recompile_the_rules(self):
+        promotion = Promotion.objects.create(name='-10%', kind='percentage', value=10)
+        self.assertEqual(evaluate_cart(self.lines()).discount, Decimal('11.00'))
+        promotion.is_active = False
+        promotion.save()
+        self.assertEqual(evaluate_cart(self.lines()).discount, Decimal('0.00'))
+
+    def test_redemptions_stop_at_the_limit(self):
+        promotion = Promotion.objects.create(name='5 off', kind='fixed', value=5)
+        coupon = Coupon.objects.create(code='ONCE', promotion=promotion, max_redemptions=1)
+        self.assertTrue(coupon.redeem())
+        self.assertFalse(coupon.redeem())
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.redemptions, 1)
+
+    def test_percentages_are_capped_at_100(self):
+        promotion = Promotion(
+            name='Too much', kind='buy_x_get_y', value=150, buy_quantity=1, get_quantity=1
+        )
+        with self.assertRaises(ValidationError):
+            promotion.full_clean()
+        Promotion(name='150 off', kind='fixed', value=150).full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Promotion.objects.create(name='Too much', kind='percentage', value=150)
+
+
+class CartCouponTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        product = Product.objects.create(name='Phone', price=Decimal('100.00'), stock=10)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+        promotion = Promotion.objects.create(name='-20%', kind='percentage', value=20)
+        Coupon.objects.create(code='SAVE20', promotion=promotion, max_redemptions=0)
+        Coupon.objects.create(code='TAKE20', promotion=promotion)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('cart:cart-coupon')
+
+    def tearDown(self):
+        bump_promotion_version()
+
+    def test_apply_and_remove_coupon(self):
+        response = self.client.post(self.url, {'code': 'take20'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['coupon'], 'TAKE20')
+        self.assertEqual(response.data['discount'], '20.00')
+        self.assertEqual(response.data['total'], '80.00')
+        self.assertEqual(response.data['items'][0]['discount'], '20.00')
+
+        response = self.client.delete(self.url)
+        self.assertIsNone(response.data['coupon'])
+        self.assertEqual(response.data['total'], '100.00')
+
+    def test_exhausted_coupon_is_rejected(self):
+        response = self.client.post(self.url, {'code': 'SAVE20'}, format='json')
+        self.assertEqual(response.status_code, 400)